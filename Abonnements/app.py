@@ -1,23 +1,128 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, request, jsonify
 from flask_cors import CORS
 import pandas as pd
-import joblib
+import numpy as np
+import json
+import os
+import sys
 from datetime import datetime
+from functools import lru_cache
+
+# Shared root modules (model registry)
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(HERE))
+
+from model_registry import ModelValidationError, load_joblib, registry
+from fast_predictor import CompiledPricePredictor, parse_date, quote_features
+from price_table import PriceTable
+
+# Routes are mounted as-is by the gateway (gateway.py)
+bp = Blueprint('price', __name__)
+
+# The trained model, resolved next to this file so the service runs from any directory
+MODEL_PATH = os.path.join(HERE, "gym_price_predictor.joblib")
+
+# Inference path for /predict: "compiled" (no DataFrame, see fast_predictor.py) or "sklearn"
+INFERENCE_BACKEND = os.environ.get("PRICE_INFERENCE_BACKEND", "compiled")
+# Precomputed price grid served before any model call (see price_table.py)
+PRICE_TABLE_ENABLED = os.environ.get("PRICE_TABLE", "1") != "0"
+
+
+# Hot reload: a new joblib must do about as well as the current one on the
+# quotes train.py kept out of every fit (written next to the model)
+HOLDOUT_PATH = os.environ.get("PRICE_HOLDOUT_CSV", os.path.splitext(MODEL_PATH)[0] + ".holdout.csv")
+# Models trained before train.py wrote a holdout: every 20th training row instead.
+# Those rows were fitted on, so that check only catches broken models
+IN_SAMPLE_PATH = os.path.join(HERE, "gym_subscriptions.csv")
+IN_SAMPLE_STEP = 20
+MAX_MAE_RATIO = float(os.environ.get("PRICE_RELOAD_MAX_MAE_RATIO", 1.25))
+
+
+def _load_compiled():
+    return CompiledPricePredictor.from_pipeline(registry.get("price.pipeline"))
+
+
+def _load_price_table():
+    # The grid itself is memory-mapped from the .npy sidecar
+    return PriceTable.load_or_build(MODEL_PATH, registry.get("price.compiled"))
+
+
+def _holdout():
+    """Validation quotes (features, actual prices): the holdout file, else the in-sample rows"""
+    if os.path.exists(HOLDOUT_PATH):
+        # Keyed by mtime: train.py rewrites the holdout along with the model
+        return _validation_sample(HOLDOUT_PATH, os.path.getmtime(HOLDOUT_PATH), 1)
+    return _validation_sample(IN_SAMPLE_PATH, None, IN_SAMPLE_STEP)
+
+
+@lru_cache(maxsize=2)
+def _validation_sample(path, mtime, step):
+    if step > 1:
+        print(f"⚠️ No holdout at {HOLDOUT_PATH}: validating price models on training rows of {path}")
+    rows = pd.read_csv(path).iloc[::step]
+    features_df, _ = engineer_features(rows[REQUIRED_FIELDS].to_dict('records'))
+    # features_df is indexed by position in `rows` and only holds the valid quotes
+    prices = rows['prix'].to_numpy()[features_df.index.to_numpy()]
+    return features_df.reset_index(drop=True), prices
+
+
+def _holdout_mae(pipeline):
+    features_df, prices = _holdout()
+    predicted = pipeline.predict(features_df)
+    if not np.isfinite(predicted).all():
+        raise ModelValidationError("non-finite predictions on the validation quotes")
+    return float(np.abs(predicted - prices).mean())
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for Angular
 
-# Load the trained model
-MODEL_PATH = "gym_price_predictor.joblib"
-try:
-    model = joblib.load(MODEL_PATH)
-    print(f"✅ Model loaded successfully from {MODEL_PATH}")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    model = None
+def _validate_pipeline(candidate, current):
+    mae = _holdout_mae(candidate)
+    if current is not None:
+        baseline = _holdout_mae(current)
+        if mae > baseline * MAX_MAE_RATIO:
+            raise ModelValidationError(f"validation MAE {mae:.2f} vs {baseline:.2f} for the current model")
+    print(f"✅ New price model validated (validation MAE {mae:.2f})")
 
 
-@app.route('/predict', methods=['POST'])
+def _validate_compiled(candidate, current):
+    """The compiled trees must reproduce the (new) pipeline on the validation quotes"""
+    features_df, _ = _holdout()
+    expected = registry.get("price.pipeline").predict(features_df)
+    fast = np.array([candidate.predict_one(row['type'], row) for row in features_df.to_dict('records')])
+    if not np.allclose(fast, expected, rtol=0, atol=1e-6):
+        raise ModelValidationError("compiled predictor does not match the pipeline")
+
+
+# Artefacts are loaded lazily, on the first request that needs them, and
+# reloaded in the background when the joblib file changes (see model_registry.py)
+registry.register("price.pipeline", lambda: load_joblib(MODEL_PATH), paths=(MODEL_PATH,),
+                  validate=_validate_pipeline)
+registry.register("price.compiled", _load_compiled, depends_on=("price.pipeline",),
+                  validate=_validate_compiled)
+if PRICE_TABLE_ENABLED:
+    registry.register("price.table", _load_price_table, depends_on=("price.compiled",))
+
+
+def get_model():
+    """The sklearn pipeline, or None if it could not be loaded"""
+    return registry.try_get("price.pipeline")
+
+
+def get_compiled_model():
+    return registry.try_get("price.compiled")
+
+
+def get_price_table():
+    return registry.try_get("price.table") if PRICE_TABLE_ENABLED else None
+
+
+REQUIRED_FIELDS = ['type', 'date_debut', 'date_fin']
+MAX_BATCH_SIZE = 50_000
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+FEATURE_COLUMNS = ['type', 'period_days', 'start_month', 'start_year', 'start_weekday']
+INVALID_JSON = object()
+
+
+@bp.route('/predict', methods=['POST'])
 def predict():
     """
     Predict subscription price based on:
@@ -25,6 +130,7 @@ def predict():
     - Date de début (start date)
     - Date de fin (end date)
     """
+    model = get_model()
     if model is None:
         return jsonify({"error": "Model not loaded"}), 500
     
@@ -33,8 +139,7 @@ def predict():
         data = request.get_json()
         
         # Validate required fields
-        required_fields = ['type', 'date_debut', 'date_fin']
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in data:
                 return jsonify({"error": f"Missing required field: {field}"}), 400
         
@@ -45,32 +150,41 @@ def predict():
         
         # Parse dates
         try:
-            date_debut = pd.to_datetime(date_debut_str)
-            date_fin = pd.to_datetime(date_fin_str)
+            date_debut = parse_date(date_debut_str)
+            date_fin = parse_date(date_fin_str)
         except Exception as e:
             return jsonify({"error": f"Invalid date format: {str(e)}"}), 400
         
         # Feature engineering (same as in the notebook)
-        period_days = (date_fin - date_debut).days
-        start_month = date_debut.month
-        start_year = date_debut.year
-        start_weekday = date_debut.weekday()  # 0=Monday, 6=Sunday
+        features = quote_features(date_debut, date_fin)
+        period_days = features['period_days']
+        start_month = features['start_month']
+        start_year = features['start_year']
+        start_weekday = features['start_weekday']
         
         # Validate period_days
         if period_days < 0:
             return jsonify({"error": "End date must be after start date"}), 400
         
-        # Create DataFrame with the same structure as training data
-        features_df = pd.DataFrame({
-            'type': [subscription_type],
-            'period_days': [period_days],
-            'start_month': [start_month],
-            'start_year': [start_year],
-            'start_weekday': [start_weekday]
-        })
-        
-        # Make prediction
-        predicted_price = model.predict(features_df)[0]
+        # Make prediction: table lookup first, model only for out-of-grid quotes
+        predicted_price = None
+        price_table = get_price_table()
+        if price_table is not None:
+            predicted_price = price_table.lookup(subscription_type, features)
+        if predicted_price is None:
+            compiled_model = get_compiled_model() if INFERENCE_BACKEND == "compiled" else None
+            if compiled_model is not None:
+                predicted_price = compiled_model.predict_one(subscription_type, features)
+            else:
+                # Create DataFrame with the same structure as training data
+                features_df = pd.DataFrame({
+                    'type': [subscription_type],
+                    'period_days': [period_days],
+                    'start_month': [start_month],
+                    'start_year': [start_year],
+                    'start_weekday': [start_weekday]
+                })
+                predicted_price = model.predict(features_df)[0]
         
         # Return prediction
         return jsonify({
@@ -88,6 +202,177 @@ def predict():
     except Exception as e:
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
+
+def _read_quotes():
+    """
+    Read the batch payload: a JSON array, a {"quotes": [...]} object,
+    or an NDJSON body (one quote per line).
+    Returns (quotes, error). Unparseable NDJSON lines are kept as
+    INVALID_JSON so that they still get a per-row error at the right index.
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        quotes = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                quotes.append(json.loads(line))
+            except json.JSONDecodeError:
+                quotes.append(INVALID_JSON)
+        return quotes, None
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('quotes')
+    if not isinstance(data, list):
+        return None, "Expected a JSON array of quotes, a {\"quotes\": [...]} object or an NDJSON body"
+    return data, None
+
+
+def _parse_dates(values):
+    """
+    Vectorised date parsing: fast ISO pass, then a tolerant pass for the leftovers.
+    Values with a UTC offset are converted to UTC and made naive (as parse_date
+    does), so a batch mixing aware and naive dates still gets per-row results.
+    """
+    values = pd.Series(values, dtype=object)
+    parsed = pd.to_datetime(values, format="ISO8601", errors="coerce", utc=True)
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format="mixed", errors="coerce", utc=True)
+    return parsed.dt.tz_localize(None)
+
+
+def engineer_features(quotes):
+    """
+    Feature engineering (same as in the notebook) over a whole batch.
+    Returns (features_df, errors) where features_df only holds the valid
+    rows (indexed by their position in the batch) and errors maps a
+    batch position to its validation message.
+    """
+    errors = {}
+    records = []
+    positions = []
+    for i, quote in enumerate(quotes):
+        if quote is INVALID_JSON:
+            errors[i] = "Invalid JSON line"
+            continue
+        if not isinstance(quote, dict):
+            errors[i] = "Quote must be a JSON object"
+            continue
+        missing = [field for field in REQUIRED_FIELDS if quote.get(field) is None]
+        if missing:
+            errors[i] = f"Missing required field: {missing[0]}"
+            continue
+        records.append((quote['type'], quote['date_debut'], quote['date_fin']))
+        positions.append(i)
+
+    if not records:
+        return pd.DataFrame(columns=FEATURE_COLUMNS), errors
+
+    frame = pd.DataFrame.from_records(records, columns=REQUIRED_FIELDS, index=positions)
+    date_debut = _parse_dates(frame['date_debut'].to_numpy())
+    date_fin = _parse_dates(frame['date_fin'].to_numpy())
+    date_debut.index = frame.index
+    date_fin.index = frame.index
+
+    invalid_dates = date_debut.isna() | date_fin.isna()
+    for i in frame.index[invalid_dates]:
+        errors[i] = "Invalid date format"
+
+    period_days = (date_fin - date_debut).dt.days
+    negative = ~invalid_dates & (period_days < 0)
+    for i in frame.index[negative]:
+        errors[i] = "End date must be after start date"
+
+    valid = ~(invalid_dates | negative)
+    date_debut = date_debut[valid]
+    features_df = pd.DataFrame({
+        'type': frame['type'][valid],
+        'period_days': period_days[valid].astype(np.int64),
+        'start_month': date_debut.dt.month.astype(np.int64),
+        'start_year': date_debut.dt.year.astype(np.int64),
+        'start_weekday': date_debut.dt.weekday.astype(np.int64)  # 0=Monday, 6=Sunday
+    })
+    return features_df, errors
+
+
+@bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict subscription prices for many quotes in one request.
+    Accepts a JSON array of {type, date_debut, date_fin} objects (or an
+    NDJSON stream) and returns one result per quote, in order; invalid
+    quotes get an "error" entry instead of failing the whole batch.
+    """
+    model = get_model()
+    if model is None:
+        return jsonify({"error": "Model not loaded"}), 500
+
+    quotes, error = _read_quotes()
+    if error:
+        return jsonify({"error": error}), 400
+    if len(quotes) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Batch too large: {len(quotes)} quotes (max {MAX_BATCH_SIZE})"}), 413
+
+    try:
+        features_df, errors = engineer_features(quotes)
+
+        # One model call for the whole batch
+        if len(features_df):
+            prices = model.predict(features_df)
+        else:
+            prices = np.empty(0)
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
+
+    results = [None] * len(quotes)
+    for i, message in errors.items():
+        results[i] = {"index": i, "error": message}
+
+    records = features_df.to_dict('records')
+    for i, row, price in zip(features_df.index, records, prices):
+        results[i] = {
+            "index": int(i),
+            "predicted_price": round(float(price), 2),
+            "features": {
+                "type": row['type'],
+                "period_days": int(row['period_days']),
+                "start_month": int(row['start_month']),
+                "start_year": int(row['start_year']),
+                "start_weekday": int(row['start_weekday'])
+            }
+        }
+
+    return jsonify({
+        "results": results,
+        "count": len(results),
+        "succeeded": len(features_df),
+        "failed": len(errors),
+        "currency": "EUR"
+    }), 200
+
+
+@bp.route('/health', methods=['GET'])
+def health_check():
+    """Model status, load time/memory and price table cache counters (without forcing a load)"""
+    compiled_ready = INFERENCE_BACKEND == "compiled" and registry.is_loaded("price.compiled")
+    price_table = registry.try_get("price.table") if registry.is_loaded("price.table") else None
+    return jsonify({
+        "status": "running",
+        "model_loaded": registry.is_loaded("price.pipeline"),
+        "inference_backend": "compiled" if compiled_ready else "sklearn",
+        "price_table": price_table.stats() if price_table is not None else None,
+        "models": {name: info for name, info in registry.stats()["models"].items() if name.startswith("price.")},
+        "timestamp": datetime.now().isoformat()
+    }), 200
+
+
+# Standalone app (the gateway mounts the blueprint directly)
+app = Flask(__name__)
+CORS(app)  # Enable CORS for Angular
+app.register_blueprint(bp)
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5552)
-
@@ -1,11 +1,42 @@
 #!/usr/bin/env python3
+"""
+Synthetic gym subscription generator.
 
+    python data_generation.py -n 10000000 --chunk-size 1000000 --workers 4 -o subs.parquet
+    python data_generation.py -o subs.arrow        # Arrow IPC (Feather v2) file
+    python data_generation.py --check              # compare against the row-by-row generator
 
+make_row() is the original row-by-row generator, kept as the reference.
+generate_chunk() draws the same distributions as whole NumPy arrays; each
+chunk gets its own seed derived from --seed, so the output does not depend
+on the number of worker processes.
+
+Output is written chunk by chunk (CSV, Parquet or Arrow IPC, picked from
+the file extension or --format). Rows are shuffled, as the original
+script did, out of core, so memory stays bounded by --chunk-size whatever
+the number of rows; --no-shuffle skips that pass and keeps ids in order.
+Parquet and Arrow need the optional pyarrow package.
+"""
+
+import argparse
+import os
 import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV output only
+    pa = pq = None
+
 random.seed(42)
 np.random.seed(42)
 
@@ -110,18 +141,322 @@ def make_row(i: int):
         "statut": statut,
     }
 
+# -------------------------------------------------
+# 2) VECTORISED GENERATOR (same distributions, whole chunks at once)
+# -------------------------------------------------
+COLUMNS = ["id", "type", "prix", "date_debut", "date_fin", "statut"]
+
+# Chunks are fixed-width records: categories as codes into TYPES/STATUTS and
+# dates as days since 1970-01-01, so they can be spilled to disk as raw bytes
+RECORD_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("type", np.int8),
+    ("prix", np.float64),
+    ("date_debut", np.int32),
+    ("date_fin", np.int32),
+    ("statut", np.int8),
+])
+
+_TYPES = np.array(TYPES, dtype=object)
+_STATUTS = np.array(STATUTS, dtype=object)
+_BASE_PRICE = np.array([BASE_PRICE[t] for t in TYPES])
+_BASE_DURATION = np.array([base_duration_days(t) for t in TYPES])
+_IS_MONTHLY = np.array(["Mensuel" in t for t in TYPES])
+_IS_WEEKLY = np.array(["Hebdomadaire" in t for t in TYPES])
+_IS_YEARLY = np.array(["Annuel" in t for t in TYPES])
+
+# statut draws: (codes into STATUTS, cumulative weights) before 2024 / from 2024 on
+_STATUT_OLD = (np.array([STATUTS.index(s) for s in ["EXPIRE", "ACTIVE", "SUSPENDU"]]), np.cumsum([0.6, 0.3, 0.1]))
+_STATUT_NEW = (np.array([STATUTS.index(s) for s in ["ACTIVE", "EXPIRE", "SUSPENDU"]]), np.cumsum([0.65, 0.2, 0.15]))
+
+
+def _pick(codes_cum, u):
+    codes, cum = codes_cum
+    return codes[np.minimum(np.searchsorted(cum, u * cum[-1], side="right"), len(codes) - 1)]
+
+
+def generate_records(first_id, n, seed):
+    """n rows with ids first_id.., drawn from the make_row() distributions,
+    as a RECORD_DTYPE array. `seed` is anything np.random.default_rng accepts."""
+    rng = np.random.default_rng(seed)
+
+    t = rng.integers(0, len(TYPES), n)
+    year = rng.integers(2023, 2027, n)
+    month = rng.integers(1, 13, n)
+    day = rng.integers(1, 29, n)
+    start = ((year - 1970) * 12 + month - 1).astype("datetime64[M]").astype("datetime64[D]") + (day - 1)
+
+    # base duration + small random variation so ML can use "period" too
+    base = _BASE_DURATION[t]
+    dur = base.copy()
+    monthly_d, weekly_d, yearly_d = base == 30, base == 7, base == 365
+    dur[monthly_d] += rng.integers(-4, 6, monthly_d.sum())
+    dur[weekly_d] += rng.integers(-1, 3, weekly_d.sum())
+    dur[yearly_d] += rng.integers(-7, 11, yearly_d.sum())
+
+    # seasonality: jan & sept promos, summer is expensive
+    season_coef = np.where(np.isin(month, (1, 9)), 0.94, np.where(np.isin(month, (6, 7)), 1.04, 1.0))
+
+    # longer-than-usual subscriptions → slight increase
+    len_bonus = np.zeros(n)
+    len_bonus[_IS_MONTHLY[t] & (dur > 32)] = 2.5
+    len_bonus[_IS_WEEKLY[t] & (dur > 7)] = 1.0
+    len_bonus[_IS_YEARLY[t] & (dur > 370)] = 10.0
+
+    noise = rng.normal(0.0, 1.8, n)
+
+    # statut distribution: older subs more likely to be expired
+    u = rng.random(n)
+    old = year < 2024
+    statut = np.empty(n, dtype=np.int8)
+    statut[old] = _pick(_STATUT_OLD, u[old])
+    statut[~old] = _pick(_STATUT_NEW, u[~old])
+
+    records = np.empty(n, dtype=RECORD_DTYPE)
+    records["id"] = np.arange(first_id, first_id + n)
+    records["type"] = t
+    records["prix"] = np.maximum(10.0, np.round(_BASE_PRICE[t] * season_coef + len_bonus + noise, 2))
+    records["date_debut"] = start.astype(np.int64)
+    records["date_fin"] = start.astype(np.int64) + dur
+    records["statut"] = statut
+    return records
+
+
+def records_to_frame(records):
+    """Same columns and values as make_row() rows (labels and ISO date strings)"""
+    return pd.DataFrame({
+        "id": records["id"],
+        "type": _TYPES[records["type"]],
+        "prix": records["prix"],
+        "date_debut": np.datetime_as_string(records["date_debut"].astype("datetime64[D]"), unit="D"),
+        "date_fin": np.datetime_as_string(records["date_fin"].astype("datetime64[D]"), unit="D"),
+        "statut": _STATUTS[records["statut"]],
+    }, columns=COLUMNS)
+
+
+def generate_chunk(first_id, n, seed):
+    """generate_records() as a DataFrame with the same columns as make_row()"""
+    return records_to_frame(generate_records(first_id, n, seed))
+
+
+def _chunk_task(args):
+    return generate_records(*args)
+
+
+def generate(n, chunk_size=1_000_000, seed=42, workers=1):
+    """Yield RECORD_DTYPE chunks for ids 1..n, in order.
+
+    Chunk k is seeded with SeedSequence(seed).spawn(...)[k], so the rows are
+    identical whatever `workers` is. With workers > 1 chunks are generated
+    in a process pool, at most 2 * workers ahead of the consumer.
+    """
+    n_chunks = -(-n // chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    tasks = [(1 + k * chunk_size, min(chunk_size, n - k * chunk_size), seeds[k]) for k in range(n_chunks)]
+
+    if workers <= 1:
+        for task in tasks:
+            yield _chunk_task(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_chunk_task, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# -------------------------------------------------
+# 3) STREAMED OUTPUT AND OUT-OF-CORE SHUFFLE
+# -------------------------------------------------
+def shuffle_out_of_core(chunks, n, chunk_size, seed, tmp_dir=None):
+    """Yield the rows of `chunks` in a uniformly random order, one bucket at a time.
+
+    Pass 1 sends every row to a random bucket file (raw RECORD_DTYPE bytes);
+    pass 2 loads each bucket (about chunk_size rows) and permutes it in
+    memory. Random bucket + in-bucket permutation is an exact uniform
+    shuffle (Rao-Sandelius), and peak memory is one chunk plus one bucket.
+    """
+    n_buckets = max(1, -(-n // chunk_size))
+    rng = np.random.default_rng(np.random.SeedSequence([seed, 0x5F]))
+    directory = tempfile.mkdtemp(prefix="gym_shuffle_", dir=tmp_dir)
+    try:
+        paths = [os.path.join(directory, f"bucket_{b:05d}.bin") for b in range(n_buckets)]
+        files = [open(path, "wb") for path in paths]
+        try:
+            for records in chunks:
+                bucket = rng.integers(0, n_buckets, len(records))
+                order = np.argsort(bucket, kind="stable")
+                bounds = np.searchsorted(bucket[order], np.arange(n_buckets + 1))
+                for b in range(n_buckets):
+                    if bounds[b] < bounds[b + 1]:
+                        files[b].write(records[order[bounds[b]:bounds[b + 1]]].tobytes())
+        finally:
+            for f in files:
+                f.close()
+
+        for path in paths:
+            records = np.fromfile(path, dtype=RECORD_DTYPE)
+            os.remove(path)
+            yield records[rng.permutation(len(records))]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def output_format(path, explicit=None):
+    if explicit:
+        return explicit
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return "parquet"
+    if ext in (".arrow", ".feather", ".ipc"):
+        return "arrow"
+    return "csv"
+
+
+def arrow_schema():
+    categories = pa.dictionary(pa.int8(), pa.string())
+    return pa.schema([
+        ("id", pa.int64()),
+        ("type", categories),
+        ("prix", pa.float64()),
+        ("date_debut", pa.date32()),
+        ("date_fin", pa.date32()),
+        ("statut", categories),
+    ])
+
+
+def records_to_arrow(records, schema):
+    """Arrow table: type/statut as dictionary (categorical) columns, dates as date32"""
+    return pa.Table.from_arrays([
+        pa.array(records["id"]),
+        pa.DictionaryArray.from_arrays(pa.array(records["type"]), pa.array(TYPES)),
+        pa.array(records["prix"]),
+        pa.array(records["date_debut"], type=pa.int32()).cast(pa.date32()),
+        pa.array(records["date_fin"], type=pa.int32()).cast(pa.date32()),
+        pa.DictionaryArray.from_arrays(pa.array(records["statut"]), pa.array(STATUTS)),
+    ], schema=schema)
+
+
+def write_chunks(chunks, path, fmt):
+    """Stream chunks to `path`: one Parquet row group / Arrow record batch /
+    CSV block per chunk. Returns the number of rows written."""
+    rows = 0
+    if fmt == "csv":
+        with open(path, "w", newline="") as f:
+            for k, records in enumerate(chunks):
+                records_to_frame(records).to_csv(f, header=k == 0, index=False)
+                rows += len(records)
+        return rows
+
+    if pa is None:
+        raise SystemExit(f"❌ {fmt} output needs pyarrow (pip install pyarrow), or write a .csv")
+    schema = arrow_schema()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(path, schema, compression="snappy")
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    try:
+        for records in chunks:
+            writer.write_table(records_to_arrow(records, schema))
+            rows += len(records)
+    finally:
+        writer.close()
+    return rows
+
+
+def compare_with_reference(n=50_000, seed=42):
+    """Distribution check: make_row() vs generate_chunk() on n rows each.
+    Returns a list of (check, reference, vectorised, ok)."""
+    from scipy import stats
+
+    random.seed(seed)
+    np.random.seed(seed)
+    ref = pd.DataFrame([make_row(i) for i in range(1, n + 1)])
+    new = generate_chunk(1, n, seed)
+
+    checks = []
+    for frame in (ref, new):
+        start = pd.to_datetime(frame["date_debut"])
+        frame["period_days"] = (pd.to_datetime(frame["date_fin"]) - start).dt.days
+        frame["year"] = start.dt.year
+        frame["month"] = start.dt.month
+
+    # categorical shares (3 sigma of a binomial proportion)
+    tolerance = 3 * np.sqrt(0.25 / n) * 2
+    for column in ("type", "statut", "year", "month"):
+        a = ref[column].value_counts(normalize=True)
+        b = new[column].value_counts(normalize=True).reindex(a.index, fill_value=0)
+        diff = float((a - b).abs().max())
+        checks.append((f"{column} shares (max diff)", 0.0, round(diff, 4), diff < tolerance))
+
+    # per-type price and duration distributions (two-sample KS test)
+    for t in TYPES:
+        for column in ("prix", "period_days"):
+            a = ref.loc[ref["type"] == t, column]
+            b = new.loc[new["type"] == t, column]
+            p = stats.ks_2samp(a, b).pvalue
+            checks.append((f"{t} {column} mean (KS p={p:.3f})", round(a.mean(), 2), round(b.mean(), 2), p > 0.001))
+
+    # statut given start year
+    for old in (True, False):
+        a = ref.loc[(ref["year"] < 2024) == old, "statut"].value_counts(normalize=True)
+        b = new.loc[(new["year"] < 2024) == old, "statut"].value_counts(normalize=True).reindex(a.index, fill_value=0)
+        diff = float((a - b).abs().max())
+        label = "before 2024" if old else "from 2024"
+        checks.append((f"statut shares {label} (max diff)", 0.0, round(diff, 4), diff < 2 * tolerance))
+    return checks
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+
 def main():
-    N = 10_000
-    rows = [make_row(i) for i in range(1, N + 1)]
-    df = pd.DataFrame(rows)
+    parser = argparse.ArgumentParser(description="Synthetic gym subscription generator")
+    parser.add_argument("-n", "--rows", type=int, default=10_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=1, help="generator processes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", default="gym_subscriptions_10k_expensive.csv")
+    parser.add_argument("--format", choices=["csv", "parquet", "arrow"],
+                        help="output format (default: from the file extension)")
+    parser.add_argument("--shuffle", action=argparse.BooleanOptionalAction, default=True,
+                        help="shuffle row order out of core (--no-shuffle keeps ids in order)")
+    parser.add_argument("--tmp-dir", help="directory for the shuffle buckets (default: system temp)")
+    parser.add_argument("--check", action="store_true",
+                        help="compare distributions with the row-by-row generator and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        checks = compare_with_reference(seed=args.seed)
+        for label, ref, new, ok in checks:
+            print(f"{'✅' if ok else '❌'} {label:50s} reference={ref:<10} vectorised={new}")
+        sys.exit(0 if all(ok for *_, ok in checks) else 1)
+
+    fmt = output_format(args.output, args.format)
+    if fmt != "csv" and pa is None:
+        sys.exit(f"❌ {fmt} output needs pyarrow (pip install pyarrow), or write a .csv")
+
+    started = time.perf_counter()
+    chunks = generate(args.rows, args.chunk_size, args.seed, args.workers)
+    if args.shuffle:
+        chunks = shuffle_out_of_core(chunks, args.rows, args.chunk_size, args.seed, args.tmp_dir)
+    rows = write_chunks(chunks, args.output, fmt)
 
-    # optional: shuffle
-    df = df.sample(frac=1.0, random_state=42).reset_index(drop=True)
+    elapsed = time.perf_counter() - started
+    peak = _peak_rss_mb()
+    print(f"✅ Generated {rows} rows → {args.output} ({fmt}) in {elapsed:.1f}s "
+          f"({rows / max(elapsed, 1e-9):,.0f} rows/s"
+          + (f", peak RSS {peak:.0f} MB)" if peak else ")"))
 
-    out_path = "gym_subscriptions_10k_expensive.csv"
-    df.to_csv(out_path, index=False)
-    print(f"✅ Generated {len(df)} rows → {out_path}")
-    print(df.head(10))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,236 @@
+"""
+DataFrame-free inference for the subscription price pipeline.
+
+The fitted ColumnTransformer (numeric passthrough + OneHotEncoder on
+`type`) and the GradientBoostingRegressor are unpacked once into plain
+Python lists, so a single quote is scored without pandas or sklearn
+input validation. Run this file to check parity against model.predict
+on the whole training CSV:
+
+    python fast_predictor.py [gym_price_predictor.joblib] [gym_subscriptions.csv]
+"""
+import sys
+import csv
+from datetime import datetime, timezone
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.preprocessing import OneHotEncoder, FunctionTransformer
+
+NUMERIC_FEATURES = ['period_days', 'start_month', 'start_year', 'start_weekday']
+
+
+def parse_date(value):
+    """
+    Cheap ISO date parsing, falling back to pandas for anything else.
+    Dates with a UTC offset are converted to naive UTC, so they can be
+    compared with naive ones.
+    """
+    parsed = None
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    if parsed is None:
+        import pandas as pd
+        parsed = pd.to_datetime(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def quote_features(date_debut, date_fin):
+    """Feature engineering (same as in the notebook) for one quote"""
+    return {
+        'period_days': (date_fin - date_debut).days,
+        'start_month': date_debut.month,
+        'start_year': date_debut.year,
+        'start_weekday': date_debut.weekday()  # 0=Monday, 6=Sunday
+    }
+
+
+def _is_passthrough(transformer):
+    if transformer == 'passthrough':
+        return True
+    # Fitted ColumnTransformers replace 'passthrough' by an identity FunctionTransformer
+    return isinstance(transformer, FunctionTransformer) and transformer.func is None
+
+
+class CompiledPricePredictor:
+    """Scores quotes straight from Python values with the fitted pipeline's parameters"""
+
+    def __init__(self, numeric_slots, type_slots, n_features, init_raw, learning_rate, trees):
+        self.numeric_slots = numeric_slots  # feature name -> column index
+        self.type_slots = type_slots        # category -> column index of its one-hot bit
+        self.n_features = n_features
+        self.init_raw = init_raw
+        self.learning_rate = learning_rate
+        self.trees = trees                  # (left, right, feature, threshold, value) lists
+        self._arrays = None
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Build from the fitted Pipeline saved by the notebook.
+        Raises ValueError if the pipeline does not have the expected
+        preprocess/model layout, so callers can keep the sklearn path.
+        """
+        preprocessor = pipeline.named_steps.get('preprocess')
+        regressor = pipeline.steps[-1][1]
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise ValueError("Expected a ColumnTransformer 'preprocess' step")
+        if not isinstance(regressor, GradientBoostingRegressor):
+            raise ValueError("Expected a GradientBoostingRegressor as final step")
+
+        numeric_slots = {}
+        type_slots = {}
+        offset = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop':
+                continue
+            if _is_passthrough(transformer):
+                for column in columns:
+                    if column not in NUMERIC_FEATURES:
+                        raise ValueError(f"Unsupported passthrough column: {column}")
+                    numeric_slots[column] = offset
+                    offset += 1
+            elif isinstance(transformer, OneHotEncoder) and list(columns) == ['type']:
+                if transformer.drop is not None or transformer.handle_unknown != 'ignore':
+                    raise ValueError("OneHotEncoder must use drop=None and handle_unknown='ignore'")
+                for category in transformer.categories_[0]:
+                    type_slots[category] = offset
+                    offset += 1
+            else:
+                raise ValueError(f"Unsupported transformer '{name}'")
+
+        if set(numeric_slots) != set(NUMERIC_FEATURES):
+            raise ValueError("Preprocessor does not expose all numeric features")
+        if regressor.estimators_.shape[1] != 1:
+            raise ValueError("Only single-output regressors are supported")
+
+        # Initial raw prediction (mean of the training target for squared error)
+        if regressor.init_ == 'zero':
+            init_raw = 0.0
+        else:
+            init_raw = float(np.ravel(regressor.init_.predict(np.zeros((1, offset))))[0])
+
+        trees = []
+        for estimator in regressor.estimators_[:, 0]:
+            tree = estimator.tree_
+            trees.append((
+                tree.children_left.tolist(),
+                tree.children_right.tolist(),
+                tree.feature.tolist(),
+                tree.threshold.tolist(),
+                tree.value[:, 0, 0].tolist()
+            ))
+
+        return cls(numeric_slots, type_slots, offset, init_raw,
+                   float(regressor.learning_rate), trees)
+
+    def encode(self, subscription_type, features):
+        """Preprocessed feature vector, as the ColumnTransformer would output it"""
+        x = [0.0] * self.n_features
+        for name, slot in self.numeric_slots.items():
+            x[slot] = float(features[name])
+        slot = self.type_slots.get(subscription_type)
+        if slot is not None:  # unknown types are all-zero, like handle_unknown='ignore'
+            x[slot] = 1.0
+        return x
+
+    def predict_one(self, subscription_type, features):
+        x = self.encode(subscription_type, features)
+        raw = self.init_raw
+        scale = self.learning_rate
+        for left, right, feature, threshold, value in self.trees:
+            node = 0
+            while left[node] != -1:
+                if x[feature[node]] <= threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+            raw += scale * value[node]
+        return raw
+
+    def _tree_arrays(self):
+        """
+        Trees as NumPy arrays where leaves point to themselves, so every row
+        can take the same fixed number of steps without per-step masking.
+        """
+        if self._arrays is None:
+            arrays = []
+            for left, right, feature, threshold, value in self.trees:
+                left = np.asarray(left, dtype=np.intp)
+                right = np.asarray(right, dtype=np.intp)
+                leaves = left == -1
+                nodes = np.arange(len(left))
+                left = np.where(leaves, nodes, left)
+                right = np.where(leaves, nodes, right)
+                feature = np.where(leaves, 0, feature)
+                threshold = np.where(leaves, np.inf, threshold)
+                depth = _tree_depth(left, right)
+                arrays.append((left, right, feature, threshold, np.asarray(value), depth))
+            self._arrays = arrays
+        return self._arrays
+
+    def predict_matrix(self, X):
+        """Vectorised scoring of an (n, n_features) preprocessed matrix"""
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))
+        raw = np.full(len(X), self.init_raw)
+        for left, right, feature, threshold, value, depth in self._tree_arrays():
+            node = np.zeros(len(X), dtype=np.intp)
+            for _ in range(depth):
+                go_left = X[rows, feature[node]] <= threshold[node]
+                node = np.where(go_left, left[node], right[node])
+            raw += self.learning_rate * value[node]
+        return raw
+
+
+def _tree_depth(left, right):
+    depth = 0
+    level = np.array([0])
+    while True:
+        children = np.concatenate([left[level], right[level]])
+        children = np.unique(children[children != np.concatenate([level, level])])
+        if not len(children):
+            return depth
+        depth += 1
+        level = children
+
+
+def check_parity(pipeline, csv_path, tolerance=1e-9):
+    """Compare predict_one against pipeline.predict on every row of csv_path"""
+    import pandas as pd
+
+    compiled = CompiledPricePredictor.from_pipeline(pipeline)
+    rows = []
+    fast = []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for record in csv.DictReader(f):
+            features = quote_features(parse_date(record['date_debut']),
+                                      parse_date(record['date_fin']))
+            rows.append({'type': record['type'], **features})
+            fast.append(compiled.predict_one(record['type'], features))
+
+    reference = pipeline.predict(pd.DataFrame(rows, columns=['type'] + NUMERIC_FEATURES))
+    diff = np.abs(np.asarray(fast) - reference)
+    return {
+        "rows": len(rows),
+        "max_abs_diff": float(diff.max()) if len(diff) else 0.0,
+        "mismatches": int((diff > tolerance).sum())
+    }
+
+
+if __name__ == '__main__':
+    import joblib
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "gym_price_predictor.joblib"
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else "gym_subscriptions.csv"
+    report = check_parity(joblib.load(model_path), csv_path)
+    print(f"Parity on {report['rows']} rows: max |diff| = {report['max_abs_diff']:.3e}, "
+          f"mismatches = {report['mismatches']}")
+    sys.exit(1 if report['mismatches'] else 0)
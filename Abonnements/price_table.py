@@ -0,0 +1,189 @@
+"""
+Precomputed price table for the subscription predictor.
+
+The model only sees (type, period_days, start_month, start_year,
+start_weekday), so every prediction on a realistic grid of those values
+is materialised once into a NumPy array and /predict becomes an index
+lookup. Quotes outside the grid fall back to the model.
+
+The table is stored next to the joblib as <model>.table.npy plus a
+<model>.table.json describing the grid and the model it was built from.
+Build it ahead of deploys with:
+
+    python price_table.py [gym_price_predictor.joblib]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+import numpy as np
+
+from fast_predictor import CompiledPricePredictor
+
+# Grid bounds (inclusive). Training data covers 6-375 days and 2023-2026.
+PERIOD_MIN = int(os.environ.get("PRICE_TABLE_PERIOD_MIN", 0))
+PERIOD_MAX = int(os.environ.get("PRICE_TABLE_PERIOD_MAX", 400))
+YEAR_MIN = int(os.environ.get("PRICE_TABLE_YEAR_MIN", 2023))
+YEAR_MAX = int(os.environ.get("PRICE_TABLE_YEAR_MAX", 2027))
+
+
+def model_fingerprint(model_path):
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sidecar_paths(model_path):
+    base, _ = os.path.splitext(model_path)
+    return base + ".table.npy", base + ".table.json"
+
+
+def _write_atomic(path, mode, write):
+    """
+    Write through a private temp file in the same directory, then os.replace.
+    Workers that memory-mapped the old file keep reading the old inode, and
+    workers saving at the same moment never write into each other's file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+            write(f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class PriceTable:
+    """Dense lookup table indexed by [type, period_days, month, year, weekday]"""
+
+    def __init__(self, values, types, period_min, year_min, source="built"):
+        self.values = values
+        self.types = list(types)
+        self.type_index = {t: i for i, t in enumerate(self.types)}
+        self.period_min = period_min
+        self.year_min = year_min
+        self.source = source
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def grid(self):
+        n_types, n_periods, _, n_years, _ = self.values.shape
+        return {
+            "types": self.types,
+            "period_min": self.period_min,
+            "period_max": self.period_min + n_periods - 1,
+            "year_min": self.year_min,
+            "year_max": self.year_min + n_years - 1
+        }
+
+    @classmethod
+    def build(cls, compiled, period_min=PERIOD_MIN, period_max=PERIOD_MAX,
+              year_min=YEAR_MIN, year_max=YEAR_MAX):
+        """Score the full grid with the compiled model, one type at a time"""
+        types = sorted(compiled.type_slots, key=compiled.type_slots.get)
+        periods = np.arange(period_min, period_max + 1)
+        months = np.arange(1, 13)
+        years = np.arange(year_min, year_max + 1)
+        weekdays = np.arange(7)
+        shape = (len(periods), len(months), len(years), len(weekdays))
+
+        grid = np.stack(np.meshgrid(periods, months, years, weekdays, indexing='ij'), axis=-1)
+        grid = grid.reshape(-1, 4)
+
+        numeric = np.zeros((len(grid), compiled.n_features), dtype=np.float32)
+        for column, name in enumerate(['period_days', 'start_month', 'start_year', 'start_weekday']):
+            numeric[:, compiled.numeric_slots[name]] = grid[:, column]
+
+        values = np.empty((len(types),) + shape, dtype=np.float64)
+        for i, subscription_type in enumerate(types):
+            X = numeric.copy()
+            X[:, compiled.type_slots[subscription_type]] = 1.0
+            values[i] = compiled.predict_matrix(X).reshape(shape)
+        return cls(values, types, period_min, year_min)
+
+    def save(self, model_path, fingerprint=None):
+        table_path, meta_path = sidecar_paths(model_path)
+        meta = dict(self.grid, model_sha256=fingerprint or model_fingerprint(model_path))
+        # Table first, meta last: a meta file only ever describes a complete table
+        _write_atomic(table_path, 'wb', lambda f: np.save(f, self.values))
+        _write_atomic(meta_path, 'w', lambda f: json.dump(meta, f, indent=2))
+
+    @classmethod
+    def load(cls, model_path, fingerprint=None, mmap_mode='r'):
+        """Load the sidecar if it exists and was built from this exact model, else None"""
+        table_path, meta_path = sidecar_paths(model_path)
+        if not (os.path.exists(table_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("model_sha256") != (fingerprint or model_fingerprint(model_path)):
+            return None
+        values = np.load(table_path, mmap_mode=mmap_mode)
+        table = cls(values, meta["types"], meta["period_min"], meta["year_min"], source="sidecar")
+        if table.grid != {k: meta[k] for k in table.grid}:
+            return None
+        return table
+
+    @classmethod
+    def load_or_build(cls, model_path, compiled):
+        """Warm-up: reuse a matching sidecar, otherwise build the grid and try to save it"""
+        fingerprint = model_fingerprint(model_path)
+        table = cls.load(model_path, fingerprint)
+        if table is not None:
+            return table
+        table = cls.build(compiled)
+        try:
+            table.save(model_path, fingerprint)
+        except OSError as e:
+            print(f"⚠️ Could not save price table next to {model_path}: {e}")
+        return table
+
+    def lookup(self, subscription_type, features):
+        """Predicted price for an in-grid quote, or None on a miss"""
+        t = self.type_index.get(subscription_type)
+        p = features['period_days'] - self.period_min
+        y = features['start_year'] - self.year_min
+        _, n_periods, _, n_years, _ = self.values.shape
+        if t is None or not (0 <= p < n_periods and 0 <= y < n_years):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return float(self.values[t, p, features['start_month'] - 1, y, features['start_weekday']])
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "source": self.source,
+            "shape": list(self.values.shape),
+            "size_mb": round(self.values.nbytes / 1e6, 2),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None,
+            "grid": self.grid
+        }
+
+
+if __name__ == '__main__':
+    import joblib
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "gym_price_predictor.joblib"
+    start = time.perf_counter()
+    table = PriceTable.build(CompiledPricePredictor.from_pipeline(joblib.load(model_path)))
+    table.save(model_path)
+    print(f"✅ Built price table {table.values.shape} in {time.perf_counter() - start:.1f}s "
+          f"→ {sidecar_paths(model_path)[0]}")
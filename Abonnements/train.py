@@ -0,0 +1,276 @@
+"""
+Reproducible training of the subscription price model (the steps of
+modeling.ipynb as a script).
+
+    python train.py                                   # gym_subscriptions.csv -> gym_price_predictor.joblib
+    python train.py -d subs.parquet --hist --jobs 4 -o candidate.joblib
+
+Each candidate is tuned with a cross-validated grid search (folds run in
+parallel with --jobs); the fitted ColumnTransformer is cached through
+Pipeline(memory=...) so it is fitted once per fold instead of once per
+candidate and parameter set. The winner (lowest CV MAE) is refitted on
+all rows and saved, with a <output>.metrics.json report: CV and held-out
+metrics for every candidate, fit time and single-quote / batch latency.
+
+A --holdout-size share of the rows is set aside before any fit (search,
+test split and final refit never see it) and written to
+<output>.holdout.csv: the app validates a hot-reloaded model on it.
+
+The model is written to a temp file and renamed over the served joblib
+(atomic), so the running app's hot reload only ever sees a complete file
+and still validates the new model before swapping it in.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import GridSearchCV, KFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from fast_predictor import CompiledPricePredictor, NUMERIC_FEATURES
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# -------------------------------------------------
+# 1) DATA (explicit dtypes, no inference pass over the file)
+# -------------------------------------------------
+CSV_DTYPES = {
+    "id": "int64",
+    "type": "category",
+    "prix": "float64",
+    "date_debut": "string",
+    "date_fin": "string",
+    "statut": "category",
+}
+DATE_FORMAT = "%Y-%m-%d"
+CATEGORICAL_FEATURES = ["type"]
+FEATURE_COLUMNS = CATEGORICAL_FEATURES + NUMERIC_FEATURES
+TARGET = "prix"
+
+
+def load_dataset(path):
+    """Subscriptions from a CSV (or the Parquet / Arrow files written by data_generation.py)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        df = pd.read_parquet(path)
+    elif ext in (".arrow", ".feather", ".ipc"):
+        df = pd.read_feather(path)
+    else:
+        df = pd.read_csv(path, dtype=CSV_DTYPES)
+    df["date_debut"] = pd.to_datetime(df["date_debut"], format=DATE_FORMAT)
+    df["date_fin"] = pd.to_datetime(df["date_fin"], format=DATE_FORMAT)
+    return df
+
+
+def engineer_features(df):
+    """Same features as the notebook and the API (see fast_predictor.quote_features)"""
+    return pd.DataFrame({
+        "type": df["type"].astype("category"),
+        "period_days": (df["date_fin"] - df["date_debut"]).dt.days.astype("int64"),
+        "start_month": df["date_debut"].dt.month.astype("int64"),
+        "start_year": df["date_debut"].dt.year.astype("int64"),
+        "start_weekday": df["date_debut"].dt.weekday.astype("int64"),
+    }, columns=FEATURE_COLUMNS)
+
+
+# -------------------------------------------------
+# 2) CANDIDATES
+# -------------------------------------------------
+def make_preprocessor():
+    # Same layout as the notebook: fast_predictor.py compiles exactly this
+    return ColumnTransformer(transformers=[
+        ("num", "passthrough", NUMERIC_FEATURES),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES),
+    ])
+
+
+def candidates(seed, include_hist=False):
+    """name -> (regressor, parameter grid)"""
+    models = {
+        "LinearRegression": (LinearRegression(), {}),
+        "RandomForest": (
+            RandomForestRegressor(n_estimators=200, random_state=seed),
+            {"model__max_depth": [None, 12], "model__min_samples_leaf": [1, 5]},
+        ),
+        "GradientBoosting": (
+            GradientBoostingRegressor(random_state=seed),
+            {"model__n_estimators": [100, 300], "model__max_depth": [3, 4], "model__learning_rate": [0.1]},
+        ),
+    }
+    if include_hist:
+        models["HistGradientBoosting"] = (
+            HistGradientBoostingRegressor(random_state=seed),
+            {"model__max_iter": [200, 500], "model__learning_rate": [0.05, 0.1], "model__max_leaf_nodes": [31]},
+        )
+    return models
+
+
+# -------------------------------------------------
+# 3) EVALUATION
+# -------------------------------------------------
+def regression_metrics(y_true, y_pred):
+    return {
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "r2": float(r2_score(y_true, y_pred)),
+    }
+
+
+def _best_time(fn, number, repeat=5):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def measure_latency(pipeline, X, batch_size=10_000):
+    """Per-quote latency of the served paths: pipeline.predict on a one-row
+    DataFrame, the compiled trees when the model supports it, and a batch"""
+    one = X.iloc[:1]
+    latency = {"sklearn_single_us": round(_best_time(lambda: pipeline.predict(one), 50) * 1e6, 1)}
+
+    try:
+        compiled = CompiledPricePredictor.from_pipeline(pipeline)
+    except ValueError:
+        compiled = None
+    latency["compiled"] = compiled is not None
+    if compiled is not None:
+        row = one.iloc[0]
+        features = {name: row[name] for name in NUMERIC_FEATURES}
+        latency["compiled_single_us"] = round(
+            _best_time(lambda: compiled.predict_one(row["type"], features), 200) * 1e6, 1)
+
+    batch = X.iloc[:batch_size]
+    latency["batch_rows"] = len(batch)
+    latency["batch_per_row_us"] = round(_best_time(lambda: pipeline.predict(batch), 3) / len(batch) * 1e6, 3)
+    return latency
+
+
+def search(name, regressor, grid, X_train, y_train, cv, jobs, cache_dir):
+    pipeline = Pipeline(steps=[
+        ("preprocess", make_preprocessor()),
+        ("model", regressor),
+    ], memory=cache_dir)
+    grid_search = GridSearchCV(pipeline, grid or {}, scoring="neg_mean_absolute_error",
+                               cv=cv, n_jobs=jobs, refit=True, error_score="raise")
+    start = time.perf_counter()
+    grid_search.fit(X_train, y_train)
+    elapsed = time.perf_counter() - start
+    print(f"   {name:22s} CV MAE {-grid_search.best_score_:8.3f}  "
+          f"({len(grid_search.cv_results_['params'])} settings, {elapsed:.1f}s)")
+    return grid_search, elapsed
+
+
+# -------------------------------------------------
+# 4) MAIN
+# -------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Train the subscription price model")
+    parser.add_argument("-d", "--data", default=os.path.join(HERE, "gym_subscriptions.csv"))
+    parser.add_argument("-o", "--output", default=os.path.join(HERE, "gym_price_predictor.joblib"))
+    parser.add_argument("--report", help="metrics JSON (default: <output>.metrics.json)")
+    parser.add_argument("--hist", action="store_true", help="also try HistGradientBoostingRegressor")
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel CV fits (-1 = all cores)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--holdout-size", type=float, default=0.05,
+                        help="rows never fitted on, written to <output>.holdout.csv for the reload check")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-dir", help="preprocessor cache (default: a temporary directory)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    df = load_dataset(args.data)
+    df, holdout = train_test_split(df, test_size=args.holdout_size, random_state=args.seed)
+    X, y = engineer_features(df), df[TARGET].to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size, random_state=args.seed)
+    print(f"📂 {len(df) + len(holdout)} rows from {args.data}"
+          f" (train {len(X_train)}, test {len(X_test)}, holdout {len(holdout)})")
+
+    baseline = DummyRegressor(strategy="mean").fit(X_train, y_train)
+    results = {"DummyRegressor": {"test": regression_metrics(y_test, baseline.predict(X_test))}}
+
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="price_train_cache_")
+    cv = KFold(n_splits=args.folds, shuffle=True, random_state=args.seed)
+    searches = {}
+    try:
+        print(f"🔎 Grid search ({args.folds}-fold CV, jobs={args.jobs})")
+        for name, (regressor, grid) in candidates(args.seed, args.hist).items():
+            grid_search, elapsed = search(name, regressor, grid, X_train, y_train, cv, args.jobs, cache_dir)
+            searches[name] = grid_search
+            best = grid_search.best_estimator_
+            results[name] = {
+                "cv_mae": float(-grid_search.best_score_),
+                "best_params": {k.replace("model__", ""): v for k, v in grid_search.best_params_.items()},
+                "search_time_s": round(elapsed, 2),
+                "test": regression_metrics(y_test, best.predict(X_test)),
+                "latency": measure_latency(best, X_test),
+            }
+    finally:
+        if not args.cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    winner = min(searches, key=lambda name: results[name]["cv_mae"])
+    print(f"\n=== BEST MODEL: {winner} (test MAE {results[winner]['test']['mae']:.3f}) ===")
+
+    # Re-fit on all rows, like the notebook, without the training cache
+    final_pipe = searches[winner].best_estimator_
+    final_pipe.set_params(memory=None)
+    start = time.perf_counter()
+    final_pipe.fit(X, y)
+    fit_time = time.perf_counter() - start
+    # Holdout first: the hot reload of the new model validates it on its own holdout
+    holdout_path = os.path.splitext(args.output)[0] + ".holdout.csv"
+    holdout[["type", "date_debut", "date_fin", TARGET]].to_csv(
+        holdout_path + ".tmp", index=False, date_format=DATE_FORMAT)
+    os.replace(holdout_path + ".tmp", holdout_path)
+    # Temp file + os.replace: the hot reload never sees a half-written model
+    joblib.dump(final_pipe, args.output + ".tmp")
+    os.replace(args.output + ".tmp", args.output)
+    print(f"✅ Saved best model to {args.output}")
+
+    report = {
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "data": os.path.abspath(args.data),
+        "rows": len(df),
+        "holdout_rows": len(holdout),
+        "holdout": os.path.abspath(holdout_path),
+        "test_size": args.test_size,
+        "folds": args.folds,
+        "seed": args.seed,
+        "sklearn_version": sklearn.__version__,
+        "winner": winner,
+        "final_fit_time_s": round(fit_time, 2),
+        "total_time_s": round(time.perf_counter() - started, 2),
+        "final_latency": measure_latency(final_pipe, X_test),
+        "candidates": results,
+    }
+    report_path = args.report or os.path.splitext(args.output)[0] + ".metrics.json"
+    with open(report_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(report_path + ".tmp", report_path)
+    print(f"📊 Metrics written to {report_path}")
+
+    for name, result in results.items():
+        latency = result.get("latency", {})
+        single = latency.get("compiled_single_us", latency.get("sklearn_single_us"))
+        print(f"   {name:22s} test MAE {result['test']['mae']:8.3f}  RMSE {result['test']['rmse']:8.3f}"
+              + (f"  single quote {single} µs" if single is not None else ""))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,34 @@
-from flask import Flask, request, jsonify
-import joblib
-import numpy as np
-import pandas as pd
+from flask import Blueprint, Flask, request, jsonify
+import os
+import sys
+
+# Modules partagés de la racine (registre des modèles)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import registry
+from fitness_engine import FEATURES, register_models
+
+# === 1️⃣ Blueprint (monté tel quel par la passerelle, gateway.py) ===
+bp = Blueprint("fitness_raw", __name__)
+
+# === 2️⃣ Modèle et scaler, partagés avec Client/chatbot.py et chargés à la
+# première prédiction ; scaler et modèle repliés en un seul produit scalaire ===
+register_models(registry)
 
-# === 1️⃣ Initialisation de Flask ===
-app = Flask(__name__)
 
-# === 2️⃣ Chargement du modèle et du scaler ===
-model = joblib.load("fitness_model.pkl")
-scaler = joblib.load("scaler.pkl")
+def to_feature_value(value):
+    """Valeur d'une feature telle que l'encodait l'ancien chemin pandas :
+    une colonne texte d'une seule ligne devenait son code de catégorie (0),
+    une valeur nulle -1"""
+    if isinstance(value, str):
+        return 0.0
+    if value is None:
+        return -1.0
+    return float(value)
 
-# === 3️⃣ Définition des features attendues ===
-FEATURES = [
-    "age", "gender", "height_cm", "weight_kg", "activity_type",
-    "duration_minutes", "intensity", "calories_burned", "avg_heart_rate",
-    "hours_sleep", "stress_level", "daily_steps", "hydration_level", "bmi",
-    "resting_heart_rate", "blood_pressure_systolic", "blood_pressure_diastolic",
-    "health_condition", "smoking_status"
-]
 
 # === 4️⃣ Route de prédiction ===
-@app.route("/predict", methods=["POST"])
+@bp.route("/predict", methods=["POST"])
 def predict():
     try:
         data = request.get_json()
@@ -29,18 +37,11 @@ def predict():
         if not all(feature in data for feature in FEATURES):
             return jsonify({"error": "Certaines features manquent"}), 400
 
-        # Conversion en DataFrame
-        input_data = pd.DataFrame([data])
+        # Conversion des valeurs dans l'ordre des features
+        values = [to_feature_value(data[feature]) for feature in FEATURES]
 
-        # Conversion des valeurs texte en numériques si besoin
-        for col in input_data.select_dtypes(include=['object']).columns:
-            input_data[col] = input_data[col].astype('category').cat.codes
-
-        # Normalisation
-        input_scaled = scaler.transform(input_data)
-
-        # Prédiction
-        prediction = model.predict(input_scaled)[0]
+        # Normalisation + prédiction
+        prediction = registry.get("fitness.scorer").predict_one(values)
 
         # 🔹 Interprétation simple de la prédiction
         if prediction < 0:
@@ -61,5 +62,8 @@ def predict():
 
 
 # === 5️⃣ Lancement du serveur ===
+app = Flask(__name__)
+app.register_blueprint(bp)
+
 if __name__ == "__main__":
     app.run(port=5001, debug=True)
@@ -1,14 +1,31 @@
-from flask import Flask, request, jsonify
-import pandas as pd
-import joblib
+from flask import Blueprint, Flask, request, jsonify, Response, stream_with_context
+import json
+import os
+import sys
 from flask_cors import CORS
 
-app = Flask(__name__)
-CORS(app)
+# Modules partagés de la racine (registre des modèles)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import registry
+from fitness_engine import read_ndjson, register_models
+
+# Routes montées telles quelles par la passerelle (gateway.py)
+bp = Blueprint('fitness', __name__)
+
+# === 1️⃣ Modèle et scaler, chargés à la première prédiction ===
+# Scaler replié dans les coefficients : un produit scalaire par requête,
+# un produit matrice-vecteur par lot
+register_models(registry)
+
+
+def get_scorer():
+    return registry.get("fitness.scorer")
+
 
-# === 1️⃣ Charger le modèle et le scaler ===
-model = joblib.load('fitness_model.pkl')
-scaler = joblib.load('scaler.pkl')
+MAX_BATCH_SIZE = 50_000
+BATCH_CHUNK_SIZE = 5_000
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
 
 # === 2️⃣ Définir les features ===
 features = [
@@ -58,7 +75,7 @@ def generate_message(score):
 
 
 # === 4️⃣ Route pour obtenir les questions ===
-@app.route('/questions', methods=['GET'])
+@bp.route('/questions', methods=['GET'])
 def get_questions():
     questions = [
         {"key": "age", "question": "Quel est votre âge ?"},
@@ -85,7 +102,7 @@ def get_questions():
 
 
 # === 5️⃣ Route de prédiction robuste ===
-@app.route('/predict', methods=['POST'])
+@bp.route('/predict', methods=['POST'])
 def predict():
     try:
         input_data = request.get_json()
@@ -124,14 +141,8 @@ def predict():
         if height > 0 and weight > 0 and cleaned_data[bmi_index] == 0:
             cleaned_data[bmi_index] = round(weight / ((height / 100) ** 2), 2)
 
-        # Création du DataFrame
-        df = pd.DataFrame([cleaned_data], columns=features)
-
-        # Normalisation
-        df_scaled = scaler.transform(df)
-
-        # Prédiction brute
-        raw_prediction = float(model.predict(df_scaled)[0])
+        # Prédiction brute : normalisation et modèle repliés en un produit scalaire
+        raw_prediction = get_scorer().predict_one(cleaned_data)
 
         # Mise à l’échelle [0, 100]
         score = (raw_prediction - (-1)) / (1 - (-1)) * 100
@@ -149,5 +160,66 @@ def predict():
         return jsonify({'error': str(e)}), 500
 
 
+# === 6️⃣ Route de prédiction par lot ===
+def _batch_result(index, score, error):
+    if error is not None:
+        return {"index": index, "error": error}
+    return {"index": index, "predicted_fitness_level": score, "message": generate_message(score)}
+
+
+@bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Score de forme pour plusieurs utilisateurs en une requête.
+    Accepte un tableau JSON, un objet {"users": [...]} ou un corps NDJSON
+    (un utilisateur par ligne). En NDJSON, les résultats sont renvoyés au
+    fil de l'eau, une ligne par utilisateur, par paquets de BATCH_CHUNK_SIZE ;
+    sinon une seule réponse JSON. Une ligne invalide reçoit une erreur
+    sans faire échouer le lot.
+    """
+    try:
+        scorer = get_scorer()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if request.mimetype in NDJSON_MIMETYPES:
+        # Corps lu ligne à ligne pendant la réponse : mémoire bornée par paquet
+        lines = (line.decode('utf-8') for line in request.stream)
+
+        def generate():
+            for index, score, error in scorer.score_stream(read_ndjson(lines), BATCH_CHUNK_SIZE):
+                yield json.dumps(_batch_result(index, score, error), ensure_ascii=False) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    users = request.get_json(silent=True)
+    if isinstance(users, dict):
+        users = users.get('users')
+    if not isinstance(users, list):
+        return jsonify({'error': 'Tableau JSON, objet {"users": [...]} ou corps NDJSON attendu.'}), 400
+    if len(users) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Lot trop grand : {len(users)} utilisateurs (max {MAX_BATCH_SIZE})'}), 413
+
+    try:
+        results = [_batch_result(*row) for row in scorer.score_stream(users, BATCH_CHUNK_SIZE)]
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    failed = sum(1 for r in results if "error" in r)
+    return jsonify({
+        "results": results,
+        "count": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed
+    })
+
+
+# === 7️⃣ Application autonome (la passerelle monte directement le blueprint) ===
+app = Flask(__name__)
+CORS(app)
+app.register_blueprint(bp)
+
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    # 5000 est le port du chatbot de réservation
+    app.run(debug=True, port=5002)
@@ -0,0 +1,270 @@
+import csv
+import json
+import os
+from operator import mul
+
+import numpy as np
+
+# === Features attendues, dans l'ordre du scaler ===
+FEATURES = [
+    "age", "gender", "height_cm", "weight_kg", "activity_type",
+    "duration_minutes", "intensity", "calories_burned", "avg_heart_rate",
+    "hours_sleep", "stress_level", "daily_steps", "hydration_level", "bmi",
+    "resting_heart_rate", "blood_pressure_systolic", "blood_pressure_diastolic",
+    "health_condition", "smoking_status"
+]
+
+HEIGHT = FEATURES.index("height_cm")
+WEIGHT = FEATURES.index("weight_kg")
+BMI = FEATURES.index("bmi")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(HERE, "fitness_model.pkl")
+SCALER_PATH = os.path.join(HERE, "scaler.pkl")
+
+# Rechargement à chaud : échantillon de validation facultatif (features déjà
+# encodées comme à l'entraînement + colonne fitness_level)
+HOLDOUT_PATH = os.environ.get("FITNESS_HOLDOUT_CSV")
+MAX_MAE_RATIO = float(os.environ.get("FITNESS_RELOAD_MAX_MAE_RATIO", 1.25))
+
+INVALID_JSON = object()   # ligne NDJSON illisible, gardée pour signaler l'erreur au bon index
+
+
+def to_score(raw):
+    """Prédiction brute [-1, 1] -> score de forme [0, 100], arrondi à 2 décimales"""
+    return np.round(np.clip((np.asarray(raw) + 1) / 2 * 100, 0, 100), 2)
+
+
+def _column_to_float(values):
+    """Conversion d'une colonne en float64 ; retourne (colonne, {ligne: valeur invalide})"""
+    try:
+        return np.array(values, dtype=np.float64), {}
+    except (TypeError, ValueError):
+        pass
+    # Colonne avec au moins une valeur non numérique : on repasse cellule par cellule
+    column = np.zeros(len(values))
+    invalid = {}
+    for i, value in enumerate(values):
+        try:
+            column[i] = float(value)
+        except (TypeError, ValueError):
+            invalid[i] = value
+    return column, invalid
+
+
+def prepare_batch(users):
+    """
+    Validation et nettoyage d'un lot d'utilisateurs, avec les mêmes règles
+    que /predict : champs obligatoires, valeur vide -> 0, conversion en
+    float, IMC recalculé depuis la taille et le poids s'il vaut 0.
+    Retourne (X, positions, errors) : X ne contient que les lignes valides
+    (positions donne leur index dans le lot) et errors associe un index
+    du lot à son message d'erreur.
+    """
+    errors = {}
+    rows = []
+    positions = []
+    for i, user in enumerate(users):
+        if user is INVALID_JSON:
+            errors[i] = "Ligne JSON invalide"
+            continue
+        if not isinstance(user, dict):
+            errors[i] = "Format invalide : objet JSON attendu"
+            continue
+        missing = [f for f in FEATURES if f not in user]
+        if missing:
+            errors[i] = f"Champs manquants : {missing}"
+            continue
+        rows.append([user[f] for f in FEATURES])
+        positions.append(i)
+
+    if not rows:
+        return np.empty((0, len(FEATURES))), np.empty(0, dtype=np.int64), errors
+
+    # Valeurs vides ou nulles -> 0, puis conversion colonne par colonne
+    cells = np.empty((len(rows), len(FEATURES)), dtype=object)
+    cells[:] = rows
+    cells[(cells == '') | np.equal(cells, None)] = 0
+    X = np.empty(cells.shape)
+    bad_rows = {}
+    for j, feature in enumerate(FEATURES):
+        X[:, j], invalid = _column_to_float(cells[:, j])
+        for row, value in invalid.items():
+            bad_rows.setdefault(row, f"Valeur invalide pour '{feature}': {value}")
+
+    positions = np.asarray(positions, dtype=np.int64)
+    if bad_rows:
+        for row, message in bad_rows.items():
+            errors[int(positions[row])] = message
+        keep = np.ones(len(X), dtype=bool)
+        keep[list(bad_rows)] = False
+        X, positions = X[keep], positions[keep]
+
+    # Recalcul du BMI si possible
+    height, weight = X[:, HEIGHT], X[:, WEIGHT]
+    recompute = (height > 0) & (weight > 0) & (X[:, BMI] == 0)
+    X[recompute, BMI] = np.round(weight[recompute] / (height[recompute] / 100) ** 2, 2)
+    return X, positions, errors
+
+
+class FitnessScorer:
+    """
+    StandardScaler + LinearRegression ramenés à un seul produit scalaire :
+    ((x - mean) / scale) · coef + intercept = x · (coef / scale) + bias,
+    avec bias = intercept - Σ coef * mean / scale.
+    """
+
+    def __init__(self, weights, bias):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        # Copie en floats Python pour predict_one : pas d'aller-retour NumPy par requête
+        self._weights = self.weights.tolist()
+
+    @classmethod
+    def from_estimators(cls, model, scaler):
+        coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+        mean = scaler.mean_ if scaler.with_mean else np.zeros_like(coef)
+        scale = scaler.scale_ if scaler.with_std else np.ones_like(coef)
+        weights = coef / scale
+        bias = float(np.ravel(model.intercept_)[0]) - float(np.dot(weights, mean))
+        return cls(weights, bias)
+
+    @classmethod
+    def from_files(cls, model_path, scaler_path):
+        import joblib
+        return cls.from_estimators(joblib.load(model_path), joblib.load(scaler_path))
+
+    def predict_one(self, values):
+        """Prédiction brute pour un utilisateur : `values` est la liste des 19
+        floats validés, dans l'ordre de FEATURES"""
+        return sum(map(mul, self._weights, values), self.bias)
+
+    def predict_raw(self, X):
+        """Prédictions brutes pour une matrice (n, 19) déjà nettoyée"""
+        return X @ self.weights + self.bias
+
+    def score_batch(self, users):
+        """
+        Score de forme pour un lot d'utilisateurs.
+        Retourne (scores, positions, errors), comme prepare_batch().
+        """
+        X, positions, errors = prepare_batch(users)
+        scores = to_score(self.predict_raw(X)) if len(X) else np.empty(0)
+        return scores, positions, errors
+
+    def score_stream(self, users, chunk_size=10_000):
+        """
+        Score un flux d'utilisateurs par paquets de `chunk_size` : la mémoire
+        reste bornée quelle que soit la taille du flux. Produit, dans l'ordre,
+        (index, score, erreur) avec score None si la ligne est invalide.
+        """
+        offset = 0
+        for chunk in iter_chunks(users, chunk_size):
+            scores, positions, errors = self.score_batch(chunk)
+            by_position = dict(zip(positions.tolist(), scores.tolist()))
+            for i in range(len(chunk)):
+                yield offset + i, by_position.get(i), errors.get(i)
+            offset += len(chunk)
+
+
+def _holdout_mae(scorer, X, y):
+    return float(np.abs(scorer.predict_raw(X) - y).mean())
+
+
+def validate_scorer(candidate, current):
+    """Refuse une nouvelle version incohérente (mauvais nombre de features,
+    coefficients non finis) ou nettement moins précise sur l'échantillon de
+    validation, s'il y en a un"""
+    if candidate.weights.shape != (len(FEATURES),):
+        raise ValueError(f"{candidate.weights.size} coefficients pour {len(FEATURES)} features")
+    if not (np.isfinite(candidate.weights).all() and np.isfinite(candidate.bias)):
+        raise ValueError("coefficients non finis")
+    if not HOLDOUT_PATH:
+        return
+    with open(HOLDOUT_PATH, encoding="utf-8", newline="") as f:
+        rows = list(read_csv(f))
+    X, positions, _ = prepare_batch(rows)
+    y = np.array([float(rows[i]["fitness_level"]) for i in positions])
+    mae = _holdout_mae(candidate, X, y)
+    if current is not None:
+        baseline = _holdout_mae(current, X, y)
+        if mae > baseline * MAX_MAE_RATIO:
+            raise ValueError(f"MAE de validation {mae:.3f} contre {baseline:.3f} pour le modèle actuel")
+
+
+def register_models(registry):
+    """Déclare le modèle de forme (scaler + régression repliés) dans le registre
+    partagé ; il est chargé à la première prédiction et rechargé à chaud quand
+    fitness_model.pkl ou scaler.pkl change"""
+    registry.register("fitness.scorer", lambda: FitnessScorer.from_files(MODEL_PATH, SCALER_PATH),
+                      paths=(MODEL_PATH, SCALER_PATH), validate=validate_scorer)
+
+
+def iter_chunks(items, chunk_size):
+    """Découpe un itérable en listes d'au plus `chunk_size` éléments"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_ndjson(lines):
+    """Utilisateurs d'un flux NDJSON (une ligne = un objet), lus au fil de l'eau"""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield INVALID_JSON
+
+
+def read_csv(lines):
+    """Utilisateurs d'un CSV avec en-tête (cellules vides -> 0 comme en JSON)"""
+    yield from csv.DictReader(lines)
+
+
+def _sklearn_predict(model, scaler, values):
+    """Chemin d'origine de /predict : DataFrame d'une ligne, scaler puis modèle"""
+    import pandas as pd
+    df = pd.DataFrame([values], columns=FEATURES)
+    return float(model.predict(scaler.transform(df))[0])
+
+
+if __name__ == "__main__":
+    # Parité avec sklearn et latence par requête :  python fitness_engine.py [n]
+    import sys
+    import timeit
+
+    import joblib
+
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    scorer = FitnessScorer.from_estimators(model, scaler)
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = np.random.default_rng(42)
+    X = rng.uniform(0, 1, (n, len(FEATURES))) * (scaler.mean_ * 3 + 1)
+    rows = X.tolist()
+
+    import pandas as pd
+    reference = model.predict(scaler.transform(pd.DataFrame(X, columns=FEATURES)))
+    single = np.array([scorer.predict_one(row) for row in rows])
+    batch = scorer.predict_raw(X)
+    print(f"📊 parité sur {n} utilisateurs (écart absolu max) :")
+    print(f"   predict_one : {np.abs(single - reference).max():.2e}")
+    print(f"   predict_raw : {np.abs(batch - reference).max():.2e}")
+    mismatched = int((to_score(single) != to_score(reference)).sum())
+    print(f"   scores 0-100 différents : {mismatched}")
+
+    sample = rows[: min(n, 200)]
+    for label, fn in [
+        ("pandas + sklearn", lambda row: _sklearn_predict(model, scaler, row)),
+        ("fusionné (Python)", scorer.predict_one),
+    ]:
+        best = min(timeit.repeat(lambda: [fn(row) for row in sample], number=5, repeat=3))
+        print(f"⏱️  {label:18s}: {best / (5 * len(sample)) * 1e6:9.2f} µs/requête")
@@ -0,0 +1,89 @@
+"""
+Score de forme de tous les adhérents, depuis un CSV ou un fichier NDJSON.
+
+    python score_members.py adherents.csv -o scores.csv
+    python score_members.py adherents.ndjson --chunk-size 20000 > scores.ndjson
+
+Les adhérents sont lus et notés par paquets : la mémoire reste bornée
+quelle que soit la taille du fichier. Une ligne invalide reçoit une erreur
+dans la sortie sans interrompre le traitement.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import joblib
+
+from fitness_engine import FitnessScorer, iter_chunks, read_csv, read_ndjson
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _format_of(path, explicit):
+    if explicit:
+        return explicit
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="fichier CSV ou NDJSON ('-' pour l'entrée standard)")
+    parser.add_argument("-o", "--output", default="-", help="fichier de sortie (défaut : sortie standard)")
+    parser.add_argument("--input-format", choices=["csv", "ndjson"])
+    parser.add_argument("--output-format", choices=["csv", "ndjson"])
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--id-column", default="participant_id",
+                        help="colonne recopiée dans la sortie pour identifier l'adhérent")
+    parser.add_argument("--model", default=os.path.join(HERE, "fitness_model.pkl"))
+    parser.add_argument("--scaler", default=os.path.join(HERE, "scaler.pkl"))
+    args = parser.parse_args()
+
+    scorer = FitnessScorer.from_estimators(joblib.load(args.model), joblib.load(args.scaler))
+
+    input_format = _format_of(args.input, args.input_format)
+    output_format = _format_of(args.output, args.output_format)
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+
+    started = time.perf_counter()
+    scored = failed = 0
+    try:
+        users = read_csv(source) if input_format == "csv" else read_ndjson(source)
+        writer = None
+        if output_format == "csv":
+            writer = csv.writer(target)
+            writer.writerow(["index", args.id_column, "predicted_fitness_level", "error"])
+
+        index = 0
+        for chunk in iter_chunks(users, args.chunk_size):
+            scores, positions, errors = scorer.score_batch(chunk)
+            by_position = dict(zip(positions.tolist(), scores.tolist()))
+            scored += len(by_position)
+            failed += len(errors)
+            for i, user in enumerate(chunk):
+                member_id = user.get(args.id_column) if isinstance(user, dict) else None
+                score, error = by_position.get(i), errors.get(i)
+                if writer:
+                    writer.writerow([index, member_id, "" if score is None else score, error or ""])
+                else:
+                    row = {"index": index, args.id_column: member_id}
+                    row.update({"error": error} if error else {"predicted_fitness_level": score})
+                    target.write(json.dumps(row, ensure_ascii=False) + "\n")
+                index += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    elapsed = time.perf_counter() - started
+    total = scored + failed
+    print(f"✅ {total} adhérents traités en {elapsed:.2f} s ({total / max(elapsed, 1e-9):,.0f}/s) — "
+          f"{scored} notés, {failed} en erreur", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from booking_parser import JOURS, fold
+from slots import next_slots
+
+
+class IntervalSet:
+    """Créneaux [début, fin) d'un coach, triés par début.
+
+    La recherche de chevauchement est en O(log n + k) : seuls les
+    créneaux commençant après `début - durée maximale` et avant `fin`
+    peuvent chevaucher, ce qui reste vrai même si des créneaux déjà
+    en base se chevauchent entre eux.
+
+    Copie à l'écriture : add() construit de nouvelles listes et remplace
+    d'un bloc le tuple (débuts, fins, durée maximale). Une lecture en
+    cours (between() est paresseux) garde la version qu'elle a prise,
+    sans décalage d'indices si une séance est ajoutée entre-temps.
+    """
+
+    def __init__(self, intervals=()):
+        intervals = sorted(intervals)
+        self._data = (
+            [start for start, _ in intervals],
+            [end for _, end in intervals],
+            max((end - start for start, end in intervals), default=timedelta(0)),
+        )
+
+    def __len__(self):
+        return len(self._data[0])
+
+    def add(self, start, end):
+        """Ajout d'un créneau (appelants sérialisés par le verrou d'écriture de l'index)"""
+        starts, ends, max_length = self._data
+        i = bisect.bisect_right(starts, start)
+        self._data = (
+            starts[:i] + [start] + starts[i:],
+            ends[:i] + [end] + ends[i:],
+            max(max_length, end - start),
+        )
+
+    def overlapping(self, start, end):
+        """Premier créneau qui chevauche [start, end), ou None"""
+        starts, ends, max_length = self._data
+        lo = bisect.bisect_right(starts, start - max_length)
+        hi = bisect.bisect_left(starts, end)
+        for i in range(lo, hi):
+            if ends[i] > start:
+                return starts[i], ends[i]
+        return None
+
+    def between(self, start, end):
+        """Créneaux qui chevauchent [start, end), triés par début (générateur :
+        la suite n'est lue que si on la demande, dans la version prise à l'appel)"""
+        starts, ends, max_length = self._data
+        lo = bisect.bisect_right(starts, start - max_length)
+        for i in range(lo, bisect.bisect_left(starts, end)):
+            if ends[i] > start:
+                yield starts[i], ends[i]
+
+
+class _Snapshot:
+    """Vue figée des coachs et de leurs séances à venir, remplacée d'un bloc"""
+
+    def __init__(self, coachs, plannings):
+        self.coachs = {c["id"]: c for c in coachs}
+
+        # Coachs regroupés par spécialité normalisée (sans accents, minuscules)
+        self.by_specialty = defaultdict(list)
+        for c in sorted(coachs, key=lambda c: c["id"]):
+            self.by_specialty[fold(c["specialite"] or "")].append(c["id"])
+
+        # coach_id -> jour de la semaine -> débuts de séance triés
+        self.starts = defaultdict(lambda: defaultdict(list))
+        # coach_id -> créneaux occupés, pour la détection de conflits
+        by_coach = defaultdict(list)
+        for coach_id, date_debut, date_fin in sorted(plannings, key=lambda p: p[1]):
+            self.starts[coach_id][date_debut.weekday()].append(date_debut)
+            by_coach[coach_id].append((date_debut, date_fin))
+        self.intervals = defaultdict(IntervalSet, {
+            coach_id: IntervalSet(intervals) for coach_id, intervals in by_coach.items()
+        })
+        self.planning_count = len(plannings)
+
+
+class AvailabilityIndex:
+    """Index en mémoire de la disponibilité des coachs.
+
+    `loader()` retourne (coachs, plannings) depuis la base, ou None si
+    elle est indisponible : coachs est une liste de dicts (id, nom,
+    specialite, telephone) et plannings une liste de (coach_id,
+    date_debut, date_fin) pour les séances qui ne sont pas encore
+    terminées (depuis le début de la journée). L'index est
+    réconcilié avec la base toutes les `reconcile_interval` secondes et
+    mis à jour immédiatement quand le chatbot enregistre une séance.
+    """
+
+    def __init__(self, loader, reconcile_interval=60):
+        self._loader = loader
+        self.reconcile_interval = reconcile_interval
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.queries = 0
+
+    def refresh(self):
+        """Recharge tout depuis la base ; retourne False si elle est indisponible"""
+        data = self._loader()
+        if data is None:
+            self.refresh_failures += 1
+            return False
+        snapshot = _Snapshot(*data)
+        with self._write_lock:
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+            self.refreshes += 1
+        return True
+
+    def _current(self):
+        """Snapshot courant ; une seule requête à la fois relance la réconciliation"""
+        stale = time.monotonic() - self._loaded_at >= self.reconcile_interval
+        if stale and self._refresh_lock.acquire(blocking=self._snapshot is None):
+            try:
+                if time.monotonic() - self._loaded_at >= self.reconcile_interval:
+                    if not self.refresh():
+                        # On garde l'ancienne vue et on réessaie un peu plus tard
+                        self._loaded_at = time.monotonic() - self.reconcile_interval + 5
+            finally:
+                self._refresh_lock.release()
+        return self._snapshot
+
+    def warm(self):
+        """Charge ou réconcilie l'index si besoin ; False s'il n'a pas pu être chargé"""
+        return self._current() is not None
+
+    def available(self, activite=None, jour=None, now=None):
+        """Coachs disponibles, comme l'ancienne requête SQL ; None si l'index n'a pas pu être chargé"""
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        self.queries += 1
+        now = now or datetime.now()
+        ids = self._coach_ids(snapshot, activite)
+
+        weekday = JOURS.index(jour.lower()) if jour and jour.lower() in JOURS else None
+        if weekday is not None:
+            # Exclus : les coachs ayant une séance à venir ce jour de la semaine
+            ids = [
+                coach_id for coach_id in ids
+                if not self._has_future(snapshot.starts.get(coach_id, {}).get(weekday, []), now)
+            ]
+
+        result = []
+        for coach_id in ids:
+            c = snapshot.coachs[coach_id]
+            result.append({
+                "id": c["id"],
+                "nom": c["nom"],
+                "specialite": c["specialite"],
+                "telephone": c["telephone"]
+            })
+        return result
+
+    @staticmethod
+    def _coach_ids(snapshot, activite):
+        if not activite:
+            return sorted(snapshot.coachs)
+        needle = fold(activite)
+        return sorted(
+            coach_id
+            for specialty, coach_ids in snapshot.by_specialty.items()
+            if needle in specialty
+            for coach_id in coach_ids
+        )
+
+    def slots(self, activite, start, end, duration, hours, step=None, limit=10):
+        """Prochaines séances libres (début, fin, coach) entre start et end ;
+        None si l'index n'a pas pu être chargé"""
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        self.queries += 1
+        busy = {}
+        for coach_id in self._coach_ids(snapshot, activite):
+            intervals = snapshot.intervals.get(coach_id)
+            busy[coach_id] = intervals.between(start, end) if intervals is not None else ()
+        return [(slot_start, slot_end, snapshot.coachs[coach_id])
+                for slot_start, slot_end, coach_id in next_slots(busy, start, end, duration, hours, step, limit)]
+
+    def conflict(self, coach_id, date_debut, date_fin):
+        """Créneau du coach qui chevauche [date_debut, date_fin) ; None si libre.
+        Retourne aussi None si l'index n'est pas chargé : la base reste l'arbitre."""
+        snapshot = self._current()
+        if snapshot is None or coach_id not in snapshot.intervals:
+            return None
+        return snapshot.intervals[coach_id].overlapping(date_debut, date_fin)
+
+    @staticmethod
+    def _has_future(starts, now):
+        return bisect.bisect_right(starts, now) < len(starts)
+
+    def add_planning(self, coach_id, date_debut, date_fin):
+        """Prise en compte immédiate d'une séance que l'on vient d'enregistrer"""
+        with self._write_lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            bisect.insort(snapshot.starts[coach_id][date_debut.weekday()], date_debut)
+            snapshot.intervals[coach_id].add(date_debut, date_fin)
+            snapshot.planning_count += 1
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "loaded": snapshot is not None,
+            "coachs": len(snapshot.coachs) if snapshot else 0,
+            "specialites": len(snapshot.by_specialty) if snapshot else 0,
+            "plannings": snapshot.planning_count if snapshot else 0,
+            "age_s": round(time.monotonic() - self._loaded_at, 1) if snapshot else None,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "queries": self.queries,
+        }
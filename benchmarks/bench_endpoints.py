@@ -0,0 +1,346 @@
+"""
+Benchmark hors ligne des routes de la passerelle : prix (/price/predict),
+score de forme (/fitness/predict), chatbot (/booking/chat) et coachs
+(/booking/coachs), par le client de test Flask et par appel direct des
+fonctions qu'elles utilisent.
+
+    python benchmarks/bench_endpoints.py -n 2000 --output results.json
+    python benchmarks/bench_endpoints.py --compare results.json     # écarts avec un passage précédent
+    python benchmarks/bench_endpoints.py --only booking_stress --stress-threads 32
+
+Aucun service externe : MySQL est remplacé par une base SQLite temporaire
+et Ollama par un modèle simulé (benchmarks/offline_backends.py, délais
+réglables avec --llm-latency-ms et --db-latency-ms). Les devis viennent de
+Abonnements/gym_subscriptions.csv et les messages du chatbot de
+benchmarks/chat_corpus.txt. Pour chaque scénario : p50/p95/p99, moyenne
+et débit (appels successifs dans un seul thread).
+
+Le scénario booking_stress lance des réservations simultanées sur les
+mêmes créneaux (save_booking, donc index en mémoire puis reserve_slot) et
+vérifie qu'aucune séance d'un même coach ne se chevauche en base.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(0, ROOT)
+# Pas de thread de surveillance des modèles pendant les mesures
+os.environ.setdefault("MODEL_WATCH_SECONDS", "0")
+
+import joblib  # noqa: E402
+
+import gateway  # noqa: E402
+from benchmarks.offline_backends import CLIENTS, COACHS, SQLiteDatabase, StubOllama  # noqa: E402
+from booking_parser import JOURS, extract_booking  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+from fitness_engine import FEATURES  # noqa: E402
+from fast_predictor import parse_date, quote_features  # noqa: E402
+from model_registry import registry  # noqa: E402
+
+booking = gateway.booking
+CORPUS_PATH = os.path.join(ROOT, "benchmarks", "chat_corpus.txt")
+PRICES_PATH = os.path.join(ROOT, "Abonnements", "gym_subscriptions.csv")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+# ---------------------------------------------------------------------------
+# Données de test
+# ---------------------------------------------------------------------------
+def price_quotes(limit=5000):
+    with open(PRICES_PATH, encoding="utf-8", newline="") as f:
+        rows = csv.DictReader(f)
+        return [{k: row[k] for k in ("type", "date_debut", "date_fin")} for _, row in zip(range(limit), rows)]
+
+
+def fitness_users(n=1000, seed=42):
+    """Profils tirés autour des moyennes du scaler (mêmes encodages qu'à l'entraînement)"""
+    stats = joblib.load(os.path.join(ROOT, "Client", "scaler.pkl"))
+    rng = random.Random(seed)
+    users = []
+    for _ in range(n):
+        user = {}
+        for name, mean, scale in zip(FEATURES, stats.mean_, stats.scale_):
+            user[name] = round(max(0.0, rng.gauss(mean, scale)), 1)
+        user["bmi"] = 0  # recalculé par la route depuis la taille et le poids
+        users.append(user)
+    return users
+
+
+def chat_messages():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def coach_filters():
+    activites = [None, "yoga", "musculation", "cardio", "pilates", "crossfit"]
+    return [(a, j) for a in activites for j in [None] + JOURS]
+
+
+# ---------------------------------------------------------------------------
+# Mesure
+# ---------------------------------------------------------------------------
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q / 100 * len(values)))], 3)
+
+
+def measure(name, call, n, warmup):
+    """Appelle `call(i)` n fois ; `call` retourne un statut (code HTTP, True...)"""
+    for i in range(warmup):
+        call(i)
+    latencies = []
+    statuses = Counter()
+    started = time.perf_counter()
+    for i in range(n):
+        start = time.perf_counter()
+        status = call(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[str(status)] += 1
+    elapsed = time.perf_counter() - started
+    result = {
+        "n": n,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "mean_ms": round(sum(latencies) / n, 3),
+        "rps": round(n / elapsed, 1),
+        "statuses": dict(statuses),
+    }
+    print(f"{name:22s} p50 {result['p50_ms']:8.3f} ms  p95 {result['p95_ms']:8.3f}  "
+          f"p99 {result['p99_ms']:8.3f}  {result['rps']:9.1f}/s  {dict(statuses)}")
+    return result
+
+
+def scenarios(client):
+    """nom -> call(i) ; routes HTTP (client de test) puis fonctions appelées directement"""
+    quotes = price_quotes()
+    users = fitness_users()
+    messages = chat_messages()
+    filters = coach_filters()
+    bypass = {"X-Cache-Bypass": "1"}
+
+    def post(path, i, payloads, **kwargs):
+        return client.post(path, json=payloads[i % len(payloads)], **kwargs).status_code
+
+    compiled = gateway.price.get_compiled_model()
+    table = gateway.price.get_price_table()
+    scorer = registry.get("fitness.scorer")
+    parsed_quotes = [(q["type"], quote_features(parse_date(q["date_debut"]), parse_date(q["date_fin"])))
+                     for q in quotes]
+    vectors = [[float(u[f]) for f in FEATURES] for u in users]
+
+    def price_compiled(i):
+        subscription_type, features = parsed_quotes[i % len(parsed_quotes)]
+        return compiled.predict_one(subscription_type, features) is not None
+
+    def price_table(i):
+        subscription_type, features = parsed_quotes[i % len(parsed_quotes)]
+        return table.lookup(subscription_type, features) is not None
+
+    def chat_rules(i):
+        message = messages[i % len(messages)]
+        intentions, activite, jour = booking.intent_matcher.analyse(message)
+        return bool(extract_booking(message, booking.coach_gazetteer, activite))
+
+    def coachs_index(i):
+        activite, jour = filters[i % len(filters)]
+        return booking.availability_index.available(activite, jour) is not None
+
+    def coachs_http(i):
+        activite, jour = filters[i % len(filters)]
+        params = {k: v for k, v in (("activite", activite), ("jour", jour)) if v}
+        return client.get("/booking/coachs", query_string=params).status_code
+
+    def chat_http(i):
+        payload = {"message": messages[i % len(messages)], "client_name": CLIENTS[i % len(CLIENTS)]}
+        # Cache contourné : chaque message qui a besoin du modèle passe par le modèle simulé
+        return client.post("/booking/chat", json=payload, headers=bypass).status_code
+
+    return {
+        "price_predict": lambda i: post("/price/predict", i, quotes),
+        "price_compiled": price_compiled,
+        "price_table": price_table if table is not None else None,
+        "fitness_predict": lambda i: post("/fitness/predict", i, users),
+        "fitness_predict_one": lambda i: scorer.predict_one(vectors[i % len(vectors)]) is not None,
+        "chat": chat_http,
+        "chat_rules": chat_rules,
+        "coachs": coachs_http,
+        "coachs_index": coachs_index,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Bases hors ligne
+# ---------------------------------------------------------------------------
+def use_database(db, pool_size):
+    """Branche le chatbot sur `db` et vide ce qu'il a gardé en mémoire"""
+    booking.db_pool = ConnectionPool(db.connect, size=pool_size, max_overflow=0, validate=False)
+    booking.coach_resolver.invalidate()
+    booking.client_resolver.invalidate()
+    booking.availability_index.refresh()
+
+
+def booking_stress(workdir, threads, rounds, seed=7):
+    """Réservations simultanées sur des créneaux qui se chevauchent.
+
+    À chaque tour, `threads` réservations démarrent ensemble (barrière)
+    pour un même coach et un même jour : la moitié demande exactement le
+    même créneau, les autres des créneaux décalés, englobants ou accolés.
+    Invariant vérifié en base : aucun chevauchement entre séances d'un coach.
+    """
+    db = SQLiteDatabase(os.path.join(workdir, "stress.db")).seed(plannings=0)
+    use_database(db, pool_size=threads)
+    rng = random.Random(seed)
+    variants = [("10:00", "11:00"), ("09:30", "10:30"), ("10:30", "11:30"), ("09:00", "12:00"),
+                ("11:00", "12:00"), ("09:00", "10:00"), ("10:15", "10:45")]
+    outcomes = Counter()
+    same_slot_winners = []
+    latencies = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    for r in range(rounds):
+        coach = COACHS[r % len(COACHS)][0]
+        jour = JOURS[(r // len(COACHS)) % 7]
+        exact = [variants[0]] * (threads // 2)
+        slots = exact + [rng.choice(variants[1:]) for _ in range(threads - len(exact))]
+        rng.shuffle(slots)
+        barrier = threading.Barrier(threads)
+        winners = []
+
+        def attempt(k, slot):
+            parsed = {"coach": coach, "jour": jour, "heure_debut": slot[0], "heure_fin": slot[1],
+                      "titre": "Stress", "description": ""}
+            barrier.wait()
+            start = time.perf_counter()
+            try:
+                saved, error = booking.save_booking(parsed, CLIENTS[k % len(CLIENTS)])
+                outcome = "saved" if saved else f"db_error: {error}"
+            except booking.BookingError:
+                outcome = "conflict"
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+                outcomes[outcome] += 1
+                if outcome == "saved":
+                    winners.append(slot)
+
+        workers = [threading.Thread(target=attempt, args=(k, slot)) for k, slot in enumerate(slots)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        same_slot_winners.append(winners.count(variants[0]))
+
+    elapsed = time.perf_counter() - started
+    overlaps = db.overlapping_pairs()
+    result = {
+        "threads": threads,
+        "rounds": rounds,
+        "attempts": sum(outcomes.values()),
+        "outcomes": dict(outcomes),
+        "rows": db.count("plannings"),
+        "overlapping_pairs": overlaps,
+        "max_same_slot_winners": max(same_slot_winners),
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+        "bookings_per_s": round(sum(outcomes.values()) / elapsed, 1),
+        "ok": overlaps == 0 and max(same_slot_winners) <= 1 and outcomes["saved"] >= rounds,
+    }
+    print(f"{'booking_stress':22s} {threads} threads x {rounds} tours : {dict(outcomes)}, "
+          f"chevauchements {overlaps}, p99 {result['p99_ms']} ms  {'✅' if result['ok'] else '❌'}")
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Rapport
+# ---------------------------------------------------------------------------
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nÉcarts avec {previous_path} (commit {previous['meta'].get('commit')}) :")
+    for name, result in report["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p99_ms", "rps"):
+            if before.get(key):
+                deltas.append(f"{key} {(result[key] - before[key]) / before[key] * 100:+6.1f}%")
+        print(f"  {name:22s} " + "  ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=1000, help="appels mesurés par scénario")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--only", nargs="+", help="scénarios à lancer (dont booking_stress)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="délai du modèle simulé")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0,
+                        help="aller-retour simulé par requête SQL (scénarios HTTP)")
+    parser.add_argument("--stress-threads", type=int, default=16)
+    parser.add_argument("--stress-rounds", type=int, default=20)
+    parser.add_argument("--output", help="fichier JSON (défaut : benchmarks/results/endpoints-<commit>.json)")
+    parser.add_argument("--compare", help="résultats JSON d'un passage précédent")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="smartfit_bench_")
+    booking.llm._client = StubOllama(latency=args.llm_latency_ms / 1000)
+    database = SQLiteDatabase(os.path.join(workdir, "bench.db"), latency=args.db_latency_ms / 1000)
+    use_database(database.seed(), pool_size=5)
+    client = gateway.app.test_client()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "n": args.n,
+            "llm_latency_ms": args.llm_latency_ms,
+            "db_latency_ms": args.db_latency_ms,
+        },
+        "scenarios": {},
+    }
+    for name, call in scenarios(client).items():
+        if call is None or (args.only and name not in args.only):
+            continue
+        report["scenarios"][name] = measure(name, call, args.n, args.warmup)
+
+    if not args.only or "booking_stress" in args.only:
+        report["booking_stress"] = booking_stress(workdir, args.stress_threads, args.stress_rounds)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"endpoints-{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n📊 Résultats : {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+    stress = report.get("booking_stress")
+    return 1 if stress and not stress["ok"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Compare le détecteur d'intentions compilé (intent_matcher) à l'ancienne
+implémentation de detect_intention() sur un corpus de messages.
+
+    python benchmarks/bench_intent.py [corpus.txt] [--repeat N]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from intent_matcher import matcher  # noqa: E402
+
+
+def legacy_detect_intention(message):
+    """Ancienne version : plusieurs parcours du message (copie conforme)"""
+    message_lower = message.lower()
+
+    intentions = {
+        "recherche_coach": any(keyword in message_lower for keyword in [
+            "coach", "disponible", "dispo", "disponibilité", "qui est disponible",
+            "quels coachs", "liste des coachs", "coachs pour", "cherche coach"
+        ]),
+        "reservation": any(keyword in message_lower for keyword in [
+            "réserver", "reserver", "booking", "book", "prendre rendez-vous",
+            "planifier", "séance", "seance", "créneau"
+        ]),
+        "annulation": any(keyword in message_lower for keyword in [
+            "annuler", "supprimer", "cancel", "retirer"
+        ])
+    }
+
+    activites = {
+        "musculation": "musculation" in message_lower,
+        "yoga": "yoga" in message_lower,
+        "cardio": "cardio" in message_lower,
+        "crossfit": "crossfit" in message_lower,
+        "pilates": "pilates" in message_lower,
+        "Fitness": "Fitness" in message_lower
+
+    }
+
+    activite_demandee = None
+    for activite, present in activites.items():
+        if present:
+            activite_demandee = activite
+            break
+
+    # Le jour était extrait à part dans chat()
+    jour_match = re.search(r"\b(lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)\b", message_lower)
+    return intentions, activite_demandee, jour_match.group(1) if jour_match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=os.path.join(ROOT, "benchmarks", "chat_corpus.txt"))
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        messages = [line.rstrip("\n") for line in f if line.strip()]
+
+    differences = []
+    for message in messages:
+        old = legacy_detect_intention(message)
+        new = matcher.analyse(message)
+        if (old[0], old[1], old[2]) != (new.intentions, new.activite, new.jour):
+            differences.append((message, old, tuple(new)))
+
+    def run(fn):
+        return min(timeit.repeat(lambda: [fn(m) for m in messages], number=args.repeat, repeat=3))
+
+    legacy = run(legacy_detect_intention)
+    compiled = run(matcher.analyse)
+    per_message = 1e6 / (args.repeat * len(messages))
+
+    print(f"{len(messages)} messages x {args.repeat}")
+    print(f"ancienne version : {legacy * per_message:7.2f} µs/message")
+    print(f"version compilée : {compiled * per_message:7.2f} µs/message  (x{legacy / compiled:.2f})")
+    print(f"résultats différents : {len(differences)} (accents repliés, « fitness » reconnu)")
+    for message, old, new in differences:
+        print(f"  {message!r}\n    avant : {old}\n    après : {new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Débit de l'extraction de réservation avec et sans regroupement des appels
+au modèle (llm_batcher.LLMBatcher), pour 1, 8 et 32 utilisateurs simultanés.
+
+    python benchmarks/bench_llm_batcher.py
+    python benchmarks/bench_llm_batcher.py --users 1 8 32 --total 256 --call-ms 80
+    python benchmarks/bench_llm_batcher.py --check      # résultats identiques et repli, puis quitte
+
+Le modèle est le serveur Ollama simulé de benchmarks/ollama_stub_server.py,
+joint en HTTP par LLMClient comme en production, avec une seule place de
+génération (--parallel 1, modèle CPU) : coût fixe par appel (--call-ms),
+temps par jeton du prompt (--prompt-token-ms) et par jeton généré
+(--token-ms). Chaque utilisateur envoie ses phrases (benchmarks/chat_corpus.txt)
+l'une après l'autre ; --total phrases au total par niveau et par mode.
+Pour chaque niveau : requêtes/s, p50/p99 et taille moyenne des lots.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("MODEL_WATCH_SECONDS", "0")
+
+from benchmarks.bench_endpoints import RESULTS_DIR, _git_commit, _percentile, chat_messages  # noqa: E402
+from benchmarks.offline_backends import StubOllama  # noqa: E402
+from benchmarks.ollama_stub_server import OllamaStub, serve  # noqa: E402
+from chatbot import BOOKING_SCHEMA, RESERVATION_BATCH_PROMPT, RESERVATION_PROMPT, parse_llm_output  # noqa: E402
+from llm_batcher import LLMBatcher  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+
+
+def make_llm(url, max_concurrency):
+    # Attente illimitée : à 32 utilisateurs, les appels seuls font la queue
+    return LLMClient(host=url, keep_alive="30m", max_concurrency=max_concurrency, queue_timeout=600,
+                     options={"num_predict": 128, "temperature": 0})
+
+
+def run_level(extract, messages, users, total):
+    """`users` threads envoient chacun total/users phrases à la suite"""
+    per_user = max(1, total // users)
+    latencies = [[] for _ in range(users)]
+    errors = []
+    barrier = threading.Barrier(users)
+
+    def user(u):
+        barrier.wait()
+        for k in range(per_user):
+            message = messages[(u * per_user + k) % len(messages)]
+            start = time.perf_counter()
+            try:
+                parsed = parse_llm_output(extract(message))
+                if "error" in parsed:
+                    errors.append(parsed["error"])
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            latencies[u].append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=user, args=(u,)) for u in range(users)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    flat = [ms for per in latencies for ms in per]
+    return {
+        "users": users,
+        "requests": len(flat),
+        "rps": round(len(flat) / elapsed, 1),
+        "p50_ms": _percentile(flat, 50),
+        "p99_ms": _percentile(flat, 99),
+        "errors": len(errors),
+    }
+
+
+def bench(args, messages):
+    stub = OllamaStub(load_ms=0, token_ms=args.token_ms, prompt_token_ms=args.prompt_token_ms,
+                      call_ms=args.call_ms, parallel=args.parallel)
+    server, url = serve(stub)
+    results = {}
+    try:
+        for users in args.users:
+            # Appels seuls : autant de places côté client que côté serveur
+            llm = make_llm(url, max_concurrency=args.parallel)
+            single = run_level(lambda m: llm.chat(RESERVATION_PROMPT.format(message=m), format=BOOKING_SCHEMA),
+                               messages, users, args.total)
+
+            llm = make_llm(url, max_concurrency=args.parallel)
+            batcher = LLMBatcher(llm, RESERVATION_PROMPT, RESERVATION_BATCH_PROMPT, BOOKING_SCHEMA,
+                                 max_batch=args.max_batch, max_wait=args.wait_ms / 1000)
+            batched = run_level(batcher.extract, messages, users, args.total)
+            stats = batcher.stats()
+            batched.update(mean_batch_size=stats["mean_batch_size"], fallbacks=stats["fallbacks"])
+
+            results[str(users)] = {"single": single, "batch": batched,
+                                   "speedup": round(batched["rps"] / single["rps"], 2)}
+            print(f"{users:3d} utilisateurs   seul {single['rps']:7.1f}/s p50 {single['p50_ms']:8.1f} ms"
+                  f" p99 {single['p99_ms']:8.1f}   groupé {batched['rps']:7.1f}/s p50 {batched['p50_ms']:8.1f} ms"
+                  f" p99 {batched['p99_ms']:8.1f}  lots de {batched['mean_batch_size']}"
+                  f"   x{results[str(users)]['speedup']}")
+    finally:
+        server.shutdown()
+    return results
+
+
+class _BrokenBatchLLM:
+    """Modèle en mémoire dont la réponse groupée est tronquée (pour le repli) ;
+    l'appel seul échoue pour les phrases de `failing`"""
+
+    def __init__(self, failing=()):
+        self.options = {"num_predict": 128}
+        self.answers = StubOllama()
+        self.failing = failing
+
+    def chat(self, prompt, format=None, options=None):
+        if "Phrases :" not in prompt and any(m in prompt for m in self.failing):
+            raise RuntimeError("modèle indisponible")
+        answer = self.answers.answer(prompt)
+        return answer[:len(answer) // 2] if "Phrases :" in prompt else answer
+
+
+def check(messages):
+    """Mêmes extractions groupées ou non ; repli sur des appels seuls si le lot est illisible"""
+    results = []
+
+    def expect(label, condition, detail=""):
+        results.append(condition)
+        print(f"{'✅' if condition else '❌'} {label}" + (f" ({detail})" if detail else ""))
+
+    stub = OllamaStub(load_ms=0, token_ms=0.2, prompt_token_ms=0.05, call_ms=5, parallel=1)
+    server, url = serve(stub)
+    try:
+        llm = make_llm(url, max_concurrency=1)
+        expected = {m: parse_llm_output(llm.chat(RESERVATION_PROMPT.format(message=m), format=BOOKING_SCHEMA))
+                    for m in messages}
+        batcher = LLMBatcher(llm, RESERVATION_PROMPT, RESERVATION_BATCH_PROMPT, BOOKING_SCHEMA,
+                             max_batch=8, max_wait=0.02)
+        got = {}
+
+        def user(m):
+            got[m] = parse_llm_output(batcher.extract(m))
+
+        threads = [threading.Thread(target=user, args=(m,)) for m in messages]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = batcher.stats()
+        expect("chaque phrase reçoit sa propre réservation", got == expected,
+               f"{sum(got.get(m) == expected[m] for m in messages)}/{len(messages)}")
+        expect("appels regroupés", stats["batches"] < len(messages) and stats["fallbacks"] == 0,
+               f"{stats['batches']} lots, {stats['mean_batch_size']} phrases en moyenne")
+        batch_request = next(r for r in stub.requests if "Phrases :" in r["messages"][-1]["content"])
+        expect("schéma tableau et num_predict proportionnel au lot",
+               batch_request["format"]["properties"]["reservations"]["items"] == BOOKING_SCHEMA
+               and batch_request["options"]["num_predict"] % 128 == 0
+               and batch_request["options"]["num_predict"] > 128)
+    finally:
+        server.shutdown()
+
+    sample = messages[:4]
+
+    def run_broken(llm):
+        batcher = LLMBatcher(llm, RESERVATION_PROMPT, RESERVATION_BATCH_PROMPT, BOOKING_SCHEMA,
+                             max_batch=4, max_wait=0.05)
+        got = {}
+
+        def user(m):
+            try:
+                got[m] = parse_llm_output(batcher.extract(m))
+            except RuntimeError as e:
+                got[m] = e
+
+        threads = [threading.Thread(target=user, args=(m,)) for m in sample]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return got, batcher.stats()
+
+    got, stats = run_broken(_BrokenBatchLLM())
+    expect("réponse groupée illisible : chaque phrase refaite seule",
+           stats["fallbacks"] == 1 and stats["single_calls"] == len(sample)
+           and all(got[m] == expected[m] for m in sample), f"{stats}")
+    got, stats = run_broken(_BrokenBatchLLM(failing=sample[:1]))
+    expect("échec d'un appel seul limité à sa phrase",
+           isinstance(got[sample[0]], RuntimeError) and all(got[m] == expected[m] for m in sample[1:]))
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--total", type=int, default=128, help="phrases par niveau et par mode")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--wait-ms", type=float, default=10, help="attente maximale pour former un lot")
+    parser.add_argument("--call-ms", type=float, default=40, help="coût fixe d'un appel au modèle")
+    parser.add_argument("--prompt-token-ms", type=float, default=1.0)
+    parser.add_argument("--token-ms", type=float, default=1.0)
+    parser.add_argument("--parallel", type=int, default=1, help="places de génération du modèle")
+    parser.add_argument("--output", help="fichier JSON (défaut : benchmarks/results/llm-batcher-<commit>.json)")
+    parser.add_argument("--check", action="store_true", help="vérifie le regroupement et le repli puis quitte")
+    args = parser.parse_args()
+
+    messages = chat_messages()
+    if args.check:
+        return 0 if check(messages[:24]) else 1
+
+    report = {
+        "meta": {"commit": _git_commit(), "cpu_count": os.cpu_count(),
+                 **{k: v for k, v in vars(args).items() if k not in ("output", "check")}},
+        "levels": bench(args, messages),
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"llm-batcher-{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n📊 Résultats : {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
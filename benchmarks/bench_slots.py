@@ -0,0 +1,201 @@
+"""
+Benchmark de /booking/slots (prochaines séances libres des coachs) sur un
+planning chargé : des milliers de séances par semaine.
+
+    python benchmarks/bench_slots.py
+    python benchmarks/bench_slots.py --coachs 300 --occupancy 0.95 --weeks 4 -n 500
+
+La base SQLite temporaire (benchmarks/offline_backends.py) est remplie de
+--coachs coachs occupés pendant --weeks semaines : séances de 45 à 120
+minutes enchaînées dans les horaires d'ouverture, dont une part
+--occupancy est réservée (environ 9 000 séances par semaine avec les
+valeurs par défaut, quelques chevauchements). Scénarios : balayage sur
+l'index en mémoire (get_slots), même calcul sur les séances chargées par SQL
+(query_slots), route HTTP, et recherche naïve (chaque pas de chaque coach
+testé contre l'index, comme un membre qui essaie des horaires) en
+référence. Avant les mesures, les résultats du balayage sont comparés à
+ceux de la recherche naïve sur des requêtes tirées au hasard, et les
+paramètres invalides de la route (fuseau horaire, dates inversées...)
+doivent donner un 400.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("MODEL_WATCH_SECONDS", "0")
+
+import gateway  # noqa: E402
+from benchmarks.bench_endpoints import RESULTS_DIR, _git_commit, measure, use_database  # noqa: E402
+from benchmarks.offline_backends import SQLiteDatabase  # noqa: E402
+from slots import opening_windows  # noqa: E402
+
+booking = gateway.booking
+SPECIALITES = ["Musculation", "Yoga", "Cardio", "Crossfit", "Pilates", "Fitness", "Yoga, Pilates", "Cardio, Fitness"]
+ACTIVITES = [None, "yoga", "musculation", "cardio", "pilates", "crossfit"]
+
+
+def seed(database, coachs, occupancy, weeks, start, seed=42):
+    """Coachs aux plannings chargés : séances de 45 à 120 minutes enchaînées
+    dans les horaires d'ouverture, chacune gardée avec la probabilité
+    `occupancy` (quelques chevauchements) ; retourne le nombre de séances"""
+    rng = random.Random(seed)
+    windows = list(opening_windows(start, start + timedelta(weeks=weeks), booking.OPENING_HOURS))
+    rows = []
+    for coach_id in range(1, coachs + 1):
+        for window_start, window_end in windows:
+            debut = window_start.replace(minute=window_start.minute // 15 * 15)
+            while True:
+                duration = timedelta(minutes=rng.choice([45, 60, 60, 90, 120]))
+                if debut + duration > window_end:
+                    break
+                if rng.random() < occupancy:
+                    # Une séance sur 50 déborde sur la suivante (données réelles imparfaites)
+                    overlap = timedelta(minutes=15) if rng.random() < 0.02 else timedelta(0)
+                    rows.append((debut.isoformat(" "), (debut + duration + overlap).isoformat(" "),
+                                 "Séance", "", 1, coach_id))
+                debut += duration
+    raw = sqlite3.connect(database.path)
+    with raw:
+        raw.executemany("INSERT INTO coachs (id, nom, specialite, telephone) VALUES (?, ?, ?, ?)",
+                        [(i, f"Coach {i}", SPECIALITES[i % len(SPECIALITES)], f"06{i:08d}")
+                         for i in range(1, coachs + 1)])
+        raw.execute("INSERT INTO client (id, nom) VALUES (1, 'Alice Martin')")
+        raw.executemany("INSERT INTO plannings (date_debut, date_fin, titre, description, client_id, coach_id)"
+                        " VALUES (?, ?, ?, ?, ?, ?)", rows)
+    raw.close()
+    return len(rows)
+
+
+def naive_slots(activite, start, end, duration, hours, step, limit):
+    """Référence : chaque pas de chaque coach testé contre l'index (pas de balayage)"""
+    index = booking.availability_index
+    snapshot = index._current()
+    ids = index._coach_ids(snapshot, activite)
+    found = []
+    for window_start, window_end in opening_windows(start, end, hours):
+        midnight = datetime.combine(window_start.date(), datetime.min.time())
+        slot_start = midnight + -(-(window_start - midnight) // step) * step
+        while slot_start + duration <= window_end:
+            for coach_id in ids:
+                if index.conflict(coach_id, slot_start, slot_start + duration) is None:
+                    found.append((slot_start, slot_start + duration, snapshot.coachs[coach_id]))
+            if len(found) >= limit:
+                return found[:limit]
+            slot_start += step
+    return found[:limit]
+
+
+def _key(slots):
+    return [(s, e, coach["id"]) for s, e, coach in slots]
+
+
+def check(start, weeks, queries=200, seed=3):
+    """Balayage (index et SQL) identique à la recherche naïve ; retourne le nombre d'écarts"""
+    rng = random.Random(seed)
+    step = timedelta(minutes=booking.SLOT_STEP_MINUTES)
+    mismatches = 0
+    for _ in range(queries):
+        debut = start + timedelta(minutes=15 * rng.randrange(0, weeks * 7 * 96))
+        fin = debut + timedelta(days=rng.choice([1, 3, 7]))
+        duration = timedelta(minutes=rng.choice([30, 45, 60, 90]))
+        activite = rng.choice(ACTIVITES)
+        limit = rng.choice([1, 10, 50])
+        expected = _key(naive_slots(activite, debut, fin, duration, booking.OPENING_HOURS, step, limit))
+        swept = _key(booking.get_slots(activite, debut, fin, duration, limit=limit))
+        sql = _key(booking.query_slots(activite, debut, fin, duration, booking.OPENING_HOURS, step, limit))
+        if swept != expected or sql != expected:
+            mismatches += 1
+    print(f"{'✅' if not mismatches else '❌'} balayage = recherche naïve sur {queries} requêtes"
+          f" ({mismatches} écarts)")
+    return mismatches
+
+
+def check_route(client):
+    """Paramètres invalides de /slots : 400 avec un message, jamais 500 ; retourne le nombre d'échecs"""
+    failures = 0
+    for params in ({"debut": "2030-01-01T10:00+02:00"}, {"fin": "2030-01-08T00:00Z"},
+                   {"debut": "demain"}, {"duree": "0"}, {"jour": "jeudredi"},
+                   {"debut": "2030-01-08", "fin": "2030-01-01"}):
+        response = client.get("/booking/slots", query_string=params)
+        ok = response.status_code == 400 and "error" in response.get_json()
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} /slots {params} -> {response.status_code}")
+    return failures
+
+
+def scenarios(client, start):
+    step = timedelta(minutes=booking.SLOT_STEP_MINUTES)
+    hour = timedelta(hours=1)
+    week = timedelta(days=7)
+
+    def slots_index(i):
+        return len(booking.get_slots(ACTIVITES[i % len(ACTIVITES)], start, start + week, hour)) == 10
+
+    def slots_index_month(i):
+        # Séances de 2 h, rares dans des plannings chargés : le balayage va loin
+        return len(booking.get_slots(ACTIVITES[i % len(ACTIVITES)], start, start + 4 * week, 2 * hour,
+                                     limit=100)) == 100
+
+    def slots_sql(i):
+        return len(booking.query_slots(ACTIVITES[i % len(ACTIVITES)], start, start + week, hour,
+                                       booking.OPENING_HOURS, step, 10)) == 10
+
+    def slots_http(i):
+        activite = ACTIVITES[i % len(ACTIVITES)]
+        return client.get("/booking/slots", query_string={"activite": activite} if activite else {}).status_code
+
+    def naive(i):
+        return len(naive_slots(ACTIVITES[i % len(ACTIVITES)], start, start + 4 * week, 2 * hour,
+                               booking.OPENING_HOURS, step, 100)) == 100
+
+    return {"slots_index": slots_index, "slots_index_month": slots_index_month, "slots_sql": slots_sql,
+            "slots_http": slots_http, "naive_month": naive}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=200, help="appels mesurés par scénario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--coachs", type=int, default=150)
+    parser.add_argument("--occupancy", type=float, default=0.85, help="part des heures d'ouverture occupées")
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--output", help="fichier JSON (défaut : benchmarks/results/slots-<commit>.json)")
+    args = parser.parse_args()
+
+    # Période mesurée : à partir de maintenant, comme /slots
+    start = datetime.now().replace(second=0, microsecond=0)
+    database = SQLiteDatabase(os.path.join(tempfile.mkdtemp(prefix="smartfit_slots_"), "slots.db"))
+    plannings = seed(database, args.coachs, args.occupancy, args.weeks, start)
+    use_database(database, pool_size=2)
+    print(f"📅 {args.coachs} coachs, {plannings} séances sur {args.weeks} semaines"
+          f" ({plannings // args.weeks} par semaine, {booking.availability_index.stats()['plannings']} dans l'index)")
+
+    mismatches = check(start, args.weeks)
+    client = gateway.app.test_client()
+    mismatches += check_route(client)
+    report = {
+        "meta": {"commit": _git_commit(), "cpu_count": os.cpu_count(), "n": args.n,
+                 "coachs": args.coachs, "occupancy": args.occupancy, "weeks": args.weeks,
+                 "plannings": plannings, "mismatches": mismatches},
+        "scenarios": {},
+    }
+    for name, call in scenarios(client, start).items():
+        report["scenarios"][name] = measure(name, call, args.n, args.warmup)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"slots-{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n📊 Résultats : {output}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
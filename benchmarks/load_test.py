@@ -0,0 +1,136 @@
+"""
+Test de charge de /predict (prix et score de forme) servis par serve.py,
+pour plusieurs nombres de workers.
+
+    python benchmarks/load_test.py --workers 1 2 4 --clients 16 --duration 10
+
+Pour chaque nombre de workers, la passerelle est lancée avec serve.py,
+puis des processus clients (connexions HTTP persistantes) envoient des
+requêtes en boucle pendant `--duration` secondes sur chaque route. Le
+débit n'augmente avec les workers que s'il y a des cœurs libres : les
+clients tournent sur la même machine et consomment eux aussi du CPU.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Client"))
+
+from fitness_engine import FEATURES  # noqa: E402
+
+ROUTES = {
+    "price": ("/price/predict", {"type": "Premium Mensuel", "date_debut": "2025-03-01", "date_fin": "2025-04-01"}),
+    "fitness": ("/fitness/predict", dict({f: 1 for f in FEATURES}, age=34, height_cm=172, weight_kg=68,
+                                         bmi=0, daily_steps=8000, hours_sleep=7)),
+}
+
+
+def _client(args):
+    """Boucle d'un processus client : (requêtes réussies, erreurs, latences en ms)"""
+    host, port, path, body, deadline = args
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    payload = json.dumps(body)
+    headers = {"Content-Type": "application/json"}
+    ok = errors = 0
+    latencies = []
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("POST", path, payload, headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                ok += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+    conn.close()
+    return ok, errors, latencies
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q / 100 * len(values)))], 2)
+
+
+def _wait_ready(host, port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.3)
+    return False
+
+
+def run(workers, threads, clients, duration, host, port):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "serve.py"), "--bind", f"{host}:{port}",
+         "--workers", str(workers), "--threads", str(threads)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not _wait_ready(host, port):
+            raise RuntimeError("serve.py n'a pas démarré")
+        results = {}
+        with multiprocessing.Pool(clients) as pool:
+            for name, (path, body) in ROUTES.items():
+                deadline = time.time() + duration
+                runs = pool.map(_client, [(host, port, path, body, deadline)] * clients)
+                ok = sum(r[0] for r in runs)
+                latencies = [ms for r in runs for ms in r[2]]
+                results[name] = {
+                    "requests": ok,
+                    "errors": sum(r[1] for r in runs),
+                    "rps": round(ok / duration, 1),
+                    "p50_ms": _percentile(latencies, 50),
+                    "p99_ms": _percentile(latencies, 99),
+                }
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cœurs, {args.clients} clients, {args.duration:.0f}s par route")
+    report = {"cpu_count": os.cpu_count(), "clients": args.clients, "threads": args.threads, "runs": {}}
+    for workers in args.workers:
+        results = run(workers, args.threads, args.clients, args.duration, args.host, args.port)
+        report["runs"][workers] = results
+        for name, r in results.items():
+            print(f"workers={workers:2d}  {name:8s} {r['rps']:8.1f} req/s  "
+                  f"p50 {r['p50_ms']} ms  p99 {r['p99_ms']} ms  erreurs {r['errors']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Remplaçants hors ligne de MySQL et d'Ollama pour les benchmarks.
+
+SQLiteDatabase imite l'interface de mysql.connector utilisée par le
+chatbot (curseurs dictionary=True, commit/rollback, ping) et traduit le
+dialecte MySQL des requêtes : paramètres %s, NOW(), CURDATE(),
+DAYOFWEEK(), avec un aller-retour réseau simulé (`latency`) par
+requête. SELECT ... FOR UPDATE devient un BEGIN IMMEDIATE : le verrou
+d'écriture de SQLite (toute la base au lieu d'une ligne) sérialise les
+réservations concurrentes comme le verrou sur la ligne du coach.
+
+StubOllama remplace ollama.Client : il répond au prompt de réservation
+par un JSON plausible après un délai simulé, sans réseau (et au prompt
+groupé de plusieurs phrases numérotées par {"reservations": [...]}).
+"""
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+from booking_parser import JOURS, CoachGazetteer, extract_booking
+
+# Dates stockées en texte ISO, relues en datetime (colonnes TIMESTAMP)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+_DAYOFWEEK = re.compile(r"DAYOFWEEK\(([^)]*)\)", re.IGNORECASE)
+_WRITE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS coachs (
+    id INTEGER PRIMARY KEY, nom TEXT, specialite TEXT, telephone TEXT
+);
+CREATE TABLE IF NOT EXISTS client (
+    id INTEGER PRIMARY KEY, nom TEXT
+);
+CREATE TABLE IF NOT EXISTS plannings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_debut TIMESTAMP, date_fin TIMESTAMP, titre TEXT, description TEXT,
+    client_id INTEGER, coach_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS plannings_coach_debut ON plannings (coach_id, date_debut);
+"""
+
+COACHS = [
+    ("Karim", "Musculation"), ("Élodie", "Yoga"), ("Sam", "Cardio"), ("Yasmine", "Crossfit"),
+    ("Nadia", "Pilates"), ("Hugo", "Musculation"), ("Inès", "Yoga, Pilates"), ("Malik", "Cardio, Fitness"),
+    ("Léa", "Crossfit"), ("Thomas", "Fitness"), ("Sofia", "Musculation, Cardio"), ("Amine", "Yoga"),
+]
+CLIENTS = ["Alice Martin", "Bob Dupont", "Chloé Bernard", "David Petit", "Emma Robert",
+           "Farid Haddad", "Gaëlle Moreau", "Hamza Benali", "Julie Laurent", "Lucas Simon"]
+
+
+def translate(query):
+    """Requête MySQL -> (requête SQLite, verrouillante ou non)"""
+    locking = bool(_FOR_UPDATE.search(query))
+    query = _FOR_UPDATE.sub("", query).replace("%s", "?")
+    query = query.replace("NOW()", "datetime('now', 'localtime')")
+    query = query.replace("CURDATE()", "date('now', 'localtime')")
+    # MySQL : 1 = dimanche ; SQLite %w : 0 = dimanche
+    query = _DAYOFWEEK.sub(r"(CAST(strftime('%w', \1) AS INTEGER) + 1)", query)
+    return query, locking
+
+
+class SQLiteCursor:
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self.dictionary = dictionary
+
+    def execute(self, query, params=()):
+        query, locking = translate(query)
+        if self._connection.latency:
+            # Aller-retour réseau simulé vers le serveur MySQL
+            time.sleep(self._connection.latency)
+        try:
+            if (locking or _WRITE.match(query)) and not self._connection.raw.in_transaction:
+                self._cursor.execute("BEGIN IMMEDIATE")
+            self._cursor.execute(query, tuple(params or ()))
+        except sqlite3.Error as e:
+            # Le chatbot n'intercepte que les erreurs mysql.connector
+            raise mysql.connector.Error(msg=f"{type(e).__name__}: {e}") from e
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Connexion SQLite avec l'interface de mysql.connector utilisée par le chatbot"""
+
+    def __init__(self, path, busy_timeout=30.0, latency=0.0):
+        self.latency = latency
+        # Transactions gérées à la main (BEGIN IMMEDIATE avant la première écriture)
+        self.raw = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None,
+                                   detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self, dictionary)
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.execute("COMMIT")
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        self.raw.execute("SELECT 1")
+
+    def close(self):
+        self.raw.close()
+
+
+class SQLiteDatabase:
+    """Base SQLite (fichier) remplie avec des coachs, des clients et des séances à venir"""
+
+    def __init__(self, path, latency=0.0):
+        self.path = path
+        self.latency = latency
+        self.connections = 0
+        raw = sqlite3.connect(path)
+        raw.execute("PRAGMA journal_mode=WAL")
+        raw.executescript(SCHEMA)
+        raw.close()
+
+    def connect(self):
+        self.connections += 1
+        return SQLiteConnection(self.path, latency=self.latency)
+
+    def seed(self, plannings=300, seed=42, now=None):
+        rng = random.Random(seed)
+        now = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+        raw = sqlite3.connect(self.path)
+        with raw:
+            raw.executemany("INSERT INTO coachs (id, nom, specialite, telephone) VALUES (?, ?, ?, ?)",
+                            [(i, nom, specialite, f"06{i:08d}") for i, (nom, specialite) in enumerate(COACHS, 1)])
+            raw.executemany("INSERT INTO client (id, nom) VALUES (?, ?)", list(enumerate(CLIENTS, 1)))
+            rows = []
+            for _ in range(plannings):
+                start = now + timedelta(days=rng.randrange(0, 21), hours=rng.randrange(-6, 10))
+                rows.append((start.isoformat(" "), (start + timedelta(hours=1)).isoformat(" "),
+                             "Séance", "", rng.randrange(1, len(CLIENTS) + 1), rng.randrange(1, len(COACHS) + 1)))
+            raw.executemany("INSERT INTO plannings (date_debut, date_fin, titre, description, client_id, coach_id)"
+                            " VALUES (?, ?, ?, ?, ?, ?)", rows)
+        raw.close()
+        return self
+
+    def overlapping_pairs(self):
+        """Paires de séances d'un même coach qui se chevauchent (doit rester 0)"""
+        raw = sqlite3.connect(self.path)
+        try:
+            return raw.execute("""
+                SELECT COUNT(*) FROM plannings a JOIN plannings b
+                ON a.coach_id = b.coach_id AND a.id < b.id
+                AND a.date_debut < b.date_fin AND a.date_fin > b.date_debut
+            """).fetchone()[0]
+        finally:
+            raw.close()
+
+    def count(self, table):
+        raw = sqlite3.connect(self.path)
+        try:
+            return raw.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            raw.close()
+
+
+class StubOllama:
+    """Remplace ollama.Client : réponse JSON construite à partir de la phrase
+    du prompt, après `latency` secondes (plus `per_token` par morceau en flux)"""
+
+    _PHRASE = re.compile(r'Phrase\s*:\s*"(.*)"', re.DOTALL)
+    _NUMBERED = re.compile(r'^\d+\.\s*"(.*)"\s*$', re.MULTILINE)
+
+    def __init__(self, latency=0.0, per_token=0.0, coachs=None):
+        self.latency = latency
+        self.per_token = per_token
+        self.coachs = [nom for nom, _ in COACHS] if coachs is None else coachs
+        self.gazetteer = CoachGazetteer(lambda: self.coachs)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _booking(self, message):
+        data = extract_booking(message, self.gazetteer)
+        key = zlib.crc32(message.encode())
+        return {
+            "coach": data.get("coach") or self.coachs[key % len(self.coachs)],
+            "jour": data.get("jour") or JOURS[key % 7],
+            "heure_debut": data.get("heure_debut") or "10:00",
+            "heure_fin": data.get("heure_fin") or "11:00",
+            "titre": "Séance",
+            "description": "Réservation via le chatbot",
+        }
+
+    def answer(self, prompt):
+        """Même phrase, même réponse ; les champs absents sont complétés
+        d'après un hachage stable de la phrase"""
+        with self._lock:
+            self.calls += 1
+        match = self._PHRASE.search(prompt)
+        if not match and "Phrases :" in prompt:
+            messages = self._NUMBERED.findall(prompt)
+            return json.dumps({"reservations": [self._booking(m) for m in messages]}, ensure_ascii=False)
+        return json.dumps(self._booking(match.group(1) if match else prompt), ensure_ascii=False)
+
+    def chat(self, model=None, messages=(), stream=False, **options):
+        prompt = messages[-1]["content"] if messages else ""
+        if self.latency:
+            time.sleep(self.latency)
+        answer = self.answer(prompt)
+        if not stream:
+            return {"model": model, "message": {"role": "assistant", "content": answer}, "done": True}
+        return self._stream(model, answer)
+
+    def _stream(self, model, answer):
+        for token in re.findall(r"\S+\s*", answer):
+            if self.per_token:
+                time.sleep(self.per_token)
+            yield {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+        yield {"model": model, "message": {"role": "assistant", "content": ""}, "done": True}
@@ -0,0 +1,245 @@
+"""
+Serveur HTTP qui imite l'API d'Ollama (/api/chat, /api/generate), pour
+faire tourner le chatbot ou vérifier LLMClient sans modèle.
+
+    python benchmarks/ollama_stub_server.py --port 11434            # puis OLLAMA_HOST=http://127.0.0.1:11434
+    python benchmarks/ollama_stub_server.py --check                 # vérifie llm_client.LLMClient contre le stub
+
+Le stub simule ce qui compte pour la latence : le chargement du modèle
+(--load-ms) quand il n'est plus en mémoire, la durée de conservation
+(`keep_alive`, 5 minutes par défaut comme Ollama), un coût fixe par
+appel (--call-ms), un temps par jeton généré (--token-ms), le nombre de
+générations menées de front (--parallel, comme OLLAMA_NUM_PARALLEL ;
+les suivantes attendent) et la limite `options.num_predict` (done_reason
+"length"). Les réponses portent les mêmes compteurs qu'Ollama
+(prompt_eval_count, eval_count, durées en nanosecondes). Chaque requête
+reçue est gardée pour les vérifications (format, options, keep_alive).
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.offline_backends import StubOllama  # noqa: E402
+
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m|h)$")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+DEFAULT_KEEP_ALIVE = 300
+
+
+def keep_alive_seconds(value):
+    """keep_alive d'Ollama en secondes (None = défaut, négatif = toujours)"""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    match = _DURATION.match(str(value).strip())
+    if not match:
+        return DEFAULT_KEEP_ALIVE
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+class OllamaStub:
+    """État du faux serveur : modèle chargé ou non, requêtes reçues"""
+
+    def __init__(self, load_ms=2000.0, token_ms=20.0, prompt_token_ms=1.0, call_ms=0.0, parallel=None):
+        self.load_s = load_ms / 1000
+        self.call_s = call_ms / 1000
+        self._slots = threading.BoundedSemaphore(parallel) if parallel else None
+        self.token_s = token_ms / 1000
+        self.prompt_token_s = prompt_token_ms / 1000
+        self.answers = StubOllama()
+        self.requests = []
+        self._lock = threading.Lock()
+        self._loaded_until = 0.0
+
+    def _load(self, keep_alive):
+        """Durée de chargement payée par cette requête (0 si le modèle est en mémoire)"""
+        with self._lock:
+            now = time.monotonic()
+            cold = now >= self._loaded_until
+            self._loaded_until = now + keep_alive_seconds(keep_alive)
+        if cold:
+            time.sleep(self.load_s)
+            return self.load_s
+        return 0.0
+
+    def generate(self, body):
+        """Réponses à /api/chat ou /api/generate : liste des objets à renvoyer"""
+        with self._lock:
+            self.requests.append(body)
+        if self._slots is None:
+            return self._generate(body)
+        with self._slots:
+            return self._generate(body)
+
+    def _generate(self, body):
+        started = time.perf_counter()
+        load_s = self._load(body.get("keep_alive"))
+        chat = "messages" in body
+        prompt = body["messages"][-1]["content"] if chat and body["messages"] else body.get("prompt") or ""
+        base = {"model": body.get("model"), "created_at": datetime.now(timezone.utc).isoformat()}
+
+        if not prompt:
+            # Prompt vide : Ollama charge seulement le modèle
+            return [dict(base, response="", done=True, done_reason="load",
+                         load_duration=int(load_s * 1e9), total_duration=int((time.perf_counter() - started) * 1e9))]
+
+        prompt_tokens = len(prompt.split())
+        time.sleep(self.call_s + prompt_tokens * self.prompt_token_s)
+        tokens = re.findall(r"\S+\s*", self.answers.answer(prompt))
+        limit = (body.get("options") or {}).get("num_predict")
+        done_reason = "stop"
+        if limit is not None and 0 <= limit < len(tokens):
+            tokens, done_reason = tokens[:limit], "length"
+
+        chunks = []
+        eval_started = time.perf_counter()
+        for token in tokens:
+            time.sleep(self.token_s)
+            chunks.append(dict(base, message={"role": "assistant", "content": token}, done=False)
+                          if chat else dict(base, response=token, done=False))
+        eval_ns = int((time.perf_counter() - eval_started) * 1e9)
+        final = dict(base, done=True, done_reason=done_reason,
+                     total_duration=int((time.perf_counter() - started) * 1e9),
+                     load_duration=int(load_s * 1e9),
+                     prompt_eval_count=prompt_tokens, prompt_eval_duration=int(prompt_tokens * self.prompt_token_s * 1e9),
+                     eval_count=len(tokens), eval_duration=eval_ns)
+        if chat:
+            final["message"] = {"role": "assistant", "content": ""}
+        else:
+            final["response"] = ""
+        if body.get("stream", True):
+            return chunks + [final]
+        # Réponse complète : le texte entier dans l'objet final
+        text = "".join(c["message"]["content"] if chat else c["response"] for c in chunks)
+        if chat:
+            final["message"]["content"] = text
+        else:
+            final["response"] = text
+        return [final]
+
+
+def make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, objects, stream):
+            payload = "".join(json.dumps(o) + "\n" for o in objects) if stream else json.dumps(objects[-1])
+            data = payload.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/x-ndjson" if stream else "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                return self._send(200, [{"models": [{"name": "llama3"}]}], stream=False)
+            self._send(404, [{"error": "not found"}], stream=False)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path not in ("/api/chat", "/api/generate"):
+                return self._send(404, [{"error": "not found"}], stream=False)
+            self._send(200, stub.generate(body), stream=body.get("stream", True))
+
+    return Handler
+
+
+def serve(stub, host="127.0.0.1", port=0):
+    """Démarre le serveur dans un thread ; retourne (serveur, URL)"""
+    server = ThreadingHTTPServer((host, port), make_handler(stub))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def check():
+    """Vérifie LLMClient et le format de réservation du chatbot contre le stub"""
+    from chatbot import BOOKING_SCHEMA, PROMPT_VERSION, RESERVATION_PROMPT, parse_llm_output
+    from llm_client import LLMClient
+
+    stub = OllamaStub(load_ms=600, token_ms=1)
+    server, url = serve(stub)
+    results = []
+
+    def expect(label, condition, detail=""):
+        results.append(condition)
+        print(f"{'✅' if condition else '❌'} {label}" + (f" ({detail})" if detail else ""))
+
+    try:
+        llm = LLMClient(host=url, keep_alive="2s", options={"num_predict": 128, "temperature": 0})
+        prompt = RESERVATION_PROMPT.format(message="Réserver avec Karim mardi de 9h à 10h")
+
+        warm = llm.warm_up()
+        expect("warm_up charge le modèle (prompt vide, keep_alive)",
+               warm is not None and warm >= 0.5 and stub.requests[-1].get("keep_alive") == "2s"
+               and stub.requests[-1].get("prompt") == "", f"{warm}s")
+
+        raw = llm.chat(prompt, format=BOOKING_SCHEMA)
+        request = stub.requests[-1]
+        call = llm.stats()["recent"][-1]
+        expect("chat envoie format, options et keep_alive",
+               request.get("format") == BOOKING_SCHEMA and request.get("options") == llm.options
+               and request.get("keep_alive") == "2s")
+        expect("pas de chargement après warm_up", call["load_ms"] == 0, f"{call}")
+        parsed = parse_llm_output(raw)
+        expect("réponse JSON lue directement", parsed.get("coach") == "Karim" and parsed.get("jour") == "mardi",
+               raw)
+        expect("jetons relevés", call["prompt_tokens"] > 0 and call["eval_tokens"] > 0,
+               f"{call['prompt_tokens']} + {call['eval_tokens']} jetons, prompt {PROMPT_VERSION}")
+
+        streamed = "".join(llm.stream(prompt, format=BOOKING_SCHEMA))
+        expect("flux identique et compteurs du dernier morceau", streamed == raw
+               and llm.stats()["recent"][-1]["eval_tokens"] == call["eval_tokens"])
+
+        short = LLMClient(host=url, keep_alive="2s", options={"num_predict": 4})
+        short.chat(prompt, format="json")
+        expect("num_predict borne la génération", short.stats()["truncated"] == 1
+               and short.stats()["recent"][-1]["eval_tokens"] == 4)
+
+        time.sleep(2.2)
+        llm.chat(prompt, format=BOOKING_SCHEMA)
+        expect("rechargement compté après expiration de keep_alive", llm.stats()["cold_starts"] == 1)
+    finally:
+        server.shutdown()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--load-ms", type=float, default=2000, help="chargement du modèle")
+    parser.add_argument("--token-ms", type=float, default=20, help="génération, par jeton")
+    parser.add_argument("--call-ms", type=float, default=0, help="coût fixe de chaque appel")
+    parser.add_argument("--parallel", type=int, default=None, help="générations menées de front")
+    parser.add_argument("--check", action="store_true", help="vérifie LLMClient contre le stub puis quitte")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check() else 1)
+
+    stub = OllamaStub(load_ms=args.load_ms, token_ms=args.token_ms, call_ms=args.call_ms, parallel=args.parallel)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(stub))
+    print(f"🤖 Ollama simulé sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import re
+import time
+import threading
+import unicodedata
+
+JOURS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+# Par ordre de priorité quand plusieurs activités sont citées
+ACTIVITES = ["musculation", "yoga", "cardio", "crossfit", "pilates", "fitness"]
+CHAMPS_OBLIGATOIRES = ("coach", "jour", "heure_debut", "heure_fin")
+PLAGE_HORAIRE = ("heure_debut", "heure_fin")
+
+_JOUR_PATTERN = re.compile(r"\b(" + "|".join(JOURS) + r")\b")
+# "9h", "9 h", "9h30", "09:00", "18:00"
+_HEURE = r"\b([01]?\d|2[0-3])\s*(?:h|:)\s*([0-5]\d)?(?![\d:])"
+# Une durée et non un horaire : « 1h de yoga », « 1h30 de cardio », « 2 heures »
+_PAS_UNE_DUREE = (r"(?!eures?\b)(?!\s*de\s+(?:" + "|".join(ACTIVITES + ["sport", "seance", "cours", "entrainement"])
+                  + r")\b)")
+# "18:00" seul : jamais une durée, retenu même sans mot d'introduction
+_HEURE_HORLOGE_PATTERN = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)(?![\d:])")
+# "de 9h à 10h", "entre 9h et 10h", "9h-10h", "de 9h jusqu'à 10h" (texte sans accents)
+_PLAGE_PATTERN = re.compile(_HEURE + r"\s*(?:-|a|et|au|jusqu'a|jusqu a)\s*" + _HEURE)
+# "à 18h", "vers 9h30", "pour 10:00", "dès 7h"
+_HEURE_CONTEXTE_PATTERN = re.compile(r"\b(?:a|vers|pour|des)\s+" + _HEURE + _PAS_UNE_DUREE)
+
+
+def _fold_slow(text):
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+# Lettres latines accentuées (à-ſ) précalculées : le cas courant évite NFKD
+_FOLD_TABLE = {}
+for _code in range(0xC0, 0x180):
+    _folded = _fold_slow(chr(_code))
+    if chr(_code) == chr(_code).lower() and _folded.isascii():
+        _FOLD_TABLE[chr(_code)] = _folded
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+
+def fold(text):
+    """Minuscules sans accents, pour comparer « Réserver » et « reserver »"""
+    lowered = text.lower()
+    if lowered.isascii():
+        return lowered
+    folded = _NON_ASCII.sub(lambda m: _FOLD_TABLE.get(m.group(), m.group()), lowered)
+    return folded if folded.isascii() else _fold_slow(text)
+
+
+class CoachGazetteer:
+    """Noms des coachs chargés depuis la base, rafraîchis toutes les `ttl` secondes"""
+
+    def __init__(self, loader, ttl=300):
+        self._loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._names = {}       # nom replié -> nom tel qu'en base
+        self._pattern = None
+
+    def set_names(self, names):
+        folded = {fold(name).strip(): name for name in names if name and name.strip()}
+        pattern = None
+        if folded:
+            alternatives = sorted(folded, key=len, reverse=True)
+            pattern = re.compile(r"\b(" + "|".join(re.escape(n) for n in alternatives) + r")\b")
+        with self._lock:
+            self._names = folded
+            self._pattern = pattern
+            self._loaded_at = time.monotonic()
+
+    def _refresh_if_stale(self):
+        if time.monotonic() - self._loaded_at < self.ttl:
+            return
+        names = self._loader()
+        if names is None:
+            # Base indisponible : on garde la liste précédente et on réessaiera plus tard
+            with self._lock:
+                self._loaded_at = time.monotonic() - self.ttl + min(self.ttl, 30)
+            return
+        self.set_names(names)
+
+    def find(self, folded_message):
+        self._refresh_if_stale()
+        with self._lock:
+            pattern, names = self._pattern, self._names
+        if pattern is None:
+            return None
+        match = pattern.search(folded_message)
+        return names[match.group(1)] if match else None
+
+
+def _format_heure(heures, minutes):
+    return f"{int(heures):02d}:{int(minutes or 0):02d}"
+
+
+def extract_booking(message, gazetteer=None, activite=None):
+    """Extraction déterministe des champs de réservation.
+
+    Retourne un dict au même format que la réponse du modèle IA ; les
+    champs non reconnus valent None.
+    """
+    folded = fold(message)
+    data = {
+        "coach": None,
+        "jour": None,
+        "heure_debut": None,
+        "heure_fin": None,
+        "titre": None,
+        "description": None,
+    }
+
+    if gazetteer is not None:
+        data["coach"] = gazetteer.find(folded)
+
+    jour_match = _JOUR_PATTERN.search(folded)
+    if jour_match:
+        data["jour"] = jour_match.group(1)
+
+    # Une heure de fin n'est retenue que dans une plage explicite,
+    # pour ne pas confondre une durée (« 1h de yoga ») avec un horaire
+    plage = _PLAGE_PATTERN.search(folded)
+    if plage:
+        debut = _format_heure(plage.group(1), plage.group(2))
+        fin = _format_heure(plage.group(3), plage.group(4))
+        if fin > debut:
+            data["heure_debut"], data["heure_fin"] = debut, fin
+    if data["heure_debut"] is None:
+        # Sinon une heure introduite (« à 18h », « vers 9h30 ») ou écrite HH:MM ;
+        # un « 9h » isolé est laissé au modèle IA
+        heure = _HEURE_CONTEXTE_PATTERN.search(folded) or _HEURE_HORLOGE_PATTERN.search(folded)
+        if heure:
+            data["heure_debut"] = _format_heure(heure.group(1), heure.group(2))
+
+    if activite:
+        data["titre"] = activite.capitalize()
+        data["description"] = f"Séance de {activite}"
+        if data["coach"]:
+            data["description"] += f" avec {data['coach']}"
+
+    return data
+
+
+def is_complete(data):
+    return all(data.get(k) for k in CHAMPS_OBLIGATOIRES)
+
+
+def merge_booking(base, override):
+    """Champs de `base` complétés par ceux renseignés dans `override`, qui priment.
+
+    Début et fin forment une paire : une plage de `override` remplace celle
+    de `base`. Une seule heure donnée ne garde l'autre que si elle est égale
+    à celle de `base` (« plutôt à 18h » après « de 9h à 10h » oublie 10h
+    et la fin sera redemandée, au lieu d'une séance de 18h à 10h).
+    """
+    merged = dict(base)
+    merged.update({k: v for k, v in override.items() if v and k not in PLAGE_HORAIRE})
+    if any(override.get(k) for k in PLAGE_HORAIRE):
+        debut, fin = override.get("heure_debut"), override.get("heure_fin")
+        if debut and not fin and debut == base.get("heure_debut"):
+            fin = base.get("heure_fin")
+        elif fin and not debut and fin == base.get("heure_fin"):
+            debut = base.get("heure_debut")
+        merged["heure_debut"], merged["heure_fin"] = debut, fin
+    return merged
+
+
+class ExtractionStats:
+    """Compteurs : combien de réservations ont pu éviter l'appel au modèle IA"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rules = 0      # extraction complète sans le modèle
+        self.session = 0    # complétée avec les messages précédents, sans le modèle
+        self.partial = 0    # règles incomplètes, complétées par le modèle
+        self.llm = 0        # aucune information trouvée par les règles
+
+    def record(self, source):
+        with self._lock:
+            setattr(self, source, getattr(self, source) + 1)
+
+    def stats(self):
+        with self._lock:
+            total = self.rules + self.session + self.partial + self.llm
+            return {
+                "rules": self.rules,
+                "session": self.session,
+                "partial": self.partial,
+                "llm": self.llm,
+                "llm_avoided_rate": round((self.rules + self.session) / total, 4) if total else None,
+            }
+
+
+if __name__ == "__main__":
+    # Vérifications rapides : python booking_parser.py
+    import sys
+
+    CAS = [
+        ("réserver 1h de yoga mardi avec Karim", {"jour": "mardi", "heure_debut": None, "heure_fin": None}),
+        ("je veux 2h de cardio jeudi", {"jour": "jeudi", "heure_debut": None, "heure_fin": None}),
+        ("pour 1h30 de musculation lundi", {"heure_debut": None}),
+        ("séance de 2 heures vendredi", {"heure_debut": None}),
+        ("réserver mardi 9h", {"heure_debut": None}),
+        ("réserver musculation lundi 18:00", {"jour": "lundi", "heure_debut": "18:00", "heure_fin": None}),
+        ("yoga jeudi à 18h", {"heure_debut": "18:00"}),
+        ("vers 9h30 mercredi", {"heure_debut": "09:30"}),
+        ("Réserver avec Karim mardi de 9h à 10h", {"heure_debut": "09:00", "heure_fin": "10:00"}),
+        ("1h de yoga mardi de 9h à 10h", {"heure_debut": "09:00", "heure_fin": "10:00"}),
+    ]
+    echecs = 0
+    for message, attendu in CAS:
+        obtenu = extract_booking(message)
+        ok = all(obtenu[k] == v for k, v in attendu.items())
+        echecs += not ok
+        print(f"{'✅' if ok else '❌'} {message!r} -> " + ", ".join(f"{k}={obtenu[k]!r}" for k in attendu))
+
+    plage = {"coach": "Karim", "jour": "mardi", "heure_debut": "09:00", "heure_fin": "10:00"}
+    FUSIONS = [
+        ({"heure_debut": "18:00", "heure_fin": None}, ("18:00", None)),
+        ({"heure_debut": "09:00", "heure_fin": None}, ("09:00", "10:00")),
+        ({"heure_debut": "18:00", "heure_fin": "19:00"}, ("18:00", "19:00")),
+        ({"jour": "jeudi", "heure_debut": None, "heure_fin": None}, ("09:00", "10:00")),
+    ]
+    for override, attendu in FUSIONS:
+        fusion = merge_booking(plage, override)
+        obtenu = (fusion["heure_debut"], fusion["heure_fin"])
+        echecs += obtenu != attendu
+        print(f"{'✅' if obtenu == attendu else '❌'} 09:00-10:00 + {override} -> {obtenu}")
+    sys.exit(1 if echecs else 0)
@@ -1,70 +1,104 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, current_app, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import ollama
 import json
+import os
 import re
+import time
 import mysql.connector
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-app = Flask(__name__)
-CORS(app)
+from db_pool import pool_from_env
+from llm_cache import cache_from_env, normalize_message
+from llm_batcher import batcher_from_env
+from llm_client import LLMBusyError, LLMTimeoutError, client_from_env
+from availability import AvailabilityIndex
+from name_resolver import NameResolver
+from intent_matcher import matcher as intent_matcher
+from task_graph import TaskGraph
+from sessions import sessions_from_env
+from slots import HORAIRES_DEFAUT, next_slots, parse_opening_hours
+from booking_parser import (CHAMPS_OBLIGATOIRES, JOURS, CoachGazetteer, ExtractionStats,
+                            extract_booking, is_complete, merge_booking)
+
+# Routes montées telles quelles par la passerelle (gateway.py)
+bp = Blueprint('booking', __name__)
+
+
+# ⚙️ Configuration MySQL
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "",  # ton mot de passe MySQL ici
+    "database": "smartfitdb"
+}
+
+
+def _open_connection():
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+# 🔁 Pool de connexions partagé par toutes les routes
+db_pool = pool_from_env(_open_connection)
 
 
-# ⚙️ Configuration MySQL avec gestion d'erreur
 def get_db_connection():
+    """Emprunte une connexion au pool ; db.close() la rend au pool"""
     try:
-        db = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",  # ton mot de passe MySQL ici
-            database="smartfitdb"
-        )
-        return db
+        return db_pool.acquire()
     except mysql.connector.Error as err:
         print(f"Erreur de connexion à la base de données: {err}")
         return None
 
 
 def detect_intention(message):
-    """Détecte l'intention de l'utilisateur"""
-    message_lower = message.lower()
-
-    intentions = {
-        "recherche_coach": any(keyword in message_lower for keyword in [
-            "coach", "disponible", "dispo", "disponibilité", "qui est disponible",
-            "quels coachs", "liste des coachs", "coachs pour", "cherche coach"
-        ]),
-        "reservation": any(keyword in message_lower for keyword in [
-            "réserver", "reserver", "booking", "book", "prendre rendez-vous",
-            "planifier", "séance", "seance", "créneau"
-        ]),
-        "annulation": any(keyword in message_lower for keyword in [
-            "annuler", "supprimer", "cancel", "retirer"
-        ])
-    }
+    """Détecte l'intention de l'utilisateur et l'activité demandée"""
+    analysis = intent_matcher.analyse(message)
+    return analysis.intentions, analysis.activite
 
-    # Détection du type d'activité
-    activites = {
-        "musculation": "musculation" in message_lower,
-        "yoga": "yoga" in message_lower,
-        "cardio": "cardio" in message_lower,
-        "crossfit": "crossfit" in message_lower,
-        "pilates": "pilates" in message_lower,
-        "Fitness": "Fitness" in message_lower
 
-    }
+def load_availability():
+    """Coachs et séances à venir pour l'index de disponibilité ; None si la base est indisponible"""
+    db = get_db_connection()
+    if not db:
+        return None
+    try:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("SELECT id, nom, specialite, telephone FROM coachs")
+        coachs = cursor.fetchall()
+        cursor.execute("""
+            SELECT coach_id, date_debut, date_fin
+            FROM plannings
+            WHERE date_fin >= CURDATE()
+        """)
+        plannings = [(p["coach_id"], p["date_debut"], p["date_fin"]) for p in cursor.fetchall()]
+        return coachs, plannings
+    except mysql.connector.Error as err:
+        print(f"Erreur lors du chargement des disponibilités: {err}")
+        return None
+    finally:
+        cursor.close()
+        db.close()
 
-    activite_demandee = None
-    for activite, present in activites.items():
-        if present:
-            activite_demandee = activite
-            break
 
-    return intentions, activite_demandee
+# 🗂️ Disponibilités des coachs gardées en mémoire, réconciliées avec MySQL
+availability_index = AvailabilityIndex(
+    load_availability,
+    reconcile_interval=float(os.environ.get("AVAILABILITY_RECONCILE_SECONDS", 60))
+)
 
 
 def get_available_coachs(activite=None, jour=None):
     """Récupère les coachs disponibles selon l'activité et le jour"""
+    coachs = availability_index.available(activite, jour)
+    if coachs is not None:
+        return coachs
+    # Index pas encore chargé : on interroge directement la base
+    return query_available_coachs(activite, jour)
+
+
+def query_available_coachs(activite=None, jour=None):
+    """Version SQL de get_available_coachs, utilisée tant que l'index n'est pas chargé"""
     db = get_db_connection()
     if not db:
         return {"error": "Erreur de connexion à la base de données"}
@@ -121,7 +155,471 @@ def get_available_coachs(activite=None, jour=None):
         db.close()
 
 
-@app.route('/chat', methods=['POST'])
+# 🕘 Horaires d'ouverture et séances proposées par /slots
+OPENING_HOURS = parse_opening_hours(os.environ.get("OPENING_HOURS", HORAIRES_DEFAUT))
+SLOT_MINUTES = int(os.environ.get("SLOT_MINUTES", 60))
+SLOT_STEP_MINUTES = int(os.environ.get("SLOT_STEP_MINUTES", 30))
+SLOTS_MAX_DAYS = int(os.environ.get("SLOTS_MAX_DAYS", 31))
+
+
+def get_slots(activite, start, end, duration, hours=OPENING_HOURS, limit=10):
+    """Prochaines séances libres (début, fin, coach) des coachs de l'activité"""
+    step = timedelta(minutes=SLOT_STEP_MINUTES)
+    slots = availability_index.slots(activite, start, end, duration, hours, step, limit)
+    if slots is not None:
+        return slots
+    # Index pas encore chargé : on interroge directement la base
+    return query_slots(activite, start, end, duration, hours, step, limit)
+
+
+def query_slots(activite, start, end, duration, hours, step, limit):
+    """Version SQL de get_slots : coachs et séances de la période chargés en une fois"""
+    db = get_db_connection()
+    if not db:
+        return {"error": "Erreur de connexion à la base de données"}
+
+    cursor = None
+    try:
+        cursor = db.cursor(dictionary=True)
+        query = "SELECT id, nom, specialite, telephone FROM coachs"
+        params = []
+        if activite:
+            query += " WHERE specialite LIKE %s"
+            params.append(f"%{activite}%")
+        cursor.execute(query, params)
+        coachs = {c["id"]: c for c in cursor.fetchall()}
+
+        busy = {coach_id: [] for coach_id in coachs}
+        if coachs:
+            placeholders = ", ".join(["%s"] * len(coachs))
+            cursor.execute(f"""
+                SELECT coach_id, date_debut, date_fin
+                FROM plannings
+                WHERE coach_id IN ({placeholders})
+                AND date_debut < %s
+                AND date_fin > %s
+                ORDER BY coach_id, date_debut
+            """, [*coachs, end, start])
+            for p in cursor.fetchall():
+                busy[p["coach_id"]].append((p["date_debut"], p["date_fin"]))
+
+        return [(slot_start, slot_end, coachs[coach_id])
+                for slot_start, slot_end, coach_id in next_slots(busy, start, end, duration, hours, step, limit)]
+
+    except mysql.connector.Error as err:
+        return {"error": f"Erreur base de données: {err}"}
+    finally:
+        if cursor is not None:
+            cursor.close()
+        db.close()
+
+
+def load_names(table):
+    """Paires (id, nom) d'une table de personnes ; None si la base est indisponible"""
+    db = get_db_connection()
+    if not db:
+        return None
+    try:
+        cursor = db.cursor()
+        cursor.execute(f"SELECT id, nom FROM {table}")
+        return cursor.fetchall()
+    except mysql.connector.Error as err:
+        print(f"Erreur lors du chargement de la table {table}: {err}")
+        return None
+    finally:
+        cursor.close()
+        db.close()
+
+
+# 🪪 Résolution nom -> id sans requête SQL à chaque réservation
+# (correspondance approchée pour les coachs seulement : un client mal reconnu
+# se verrait attribuer la séance d'un autre membre)
+NAMES_TTL = float(os.environ.get("NAMES_CACHE_TTL", 300))
+coach_resolver = NameResolver(lambda: load_names("coachs"), ttl=NAMES_TTL, fuzzy_cutoff=0.85)
+client_resolver = NameResolver(lambda: load_names("client"), ttl=NAMES_TTL)
+
+
+# 📇 Noms des coachs reconnus sans passer par le modèle IA
+coach_gazetteer = CoachGazetteer(coach_resolver.names)
+extraction_stats = ExtractionStats()
+
+
+# 🔹 Prompt pour l'IA pour les réservations
+# Incrémenter PROMPT_VERSION à chaque modification du prompt ou du schéma pour invalider le cache
+PROMPT_VERSION = "reservation-v2"
+# Court : le format de la réponse est imposé par BOOKING_SCHEMA, pas décrit dans le prompt
+RESERVATION_PROMPT = """Extrais la réservation de séance de sport de la phrase (SmartFit).
+Champs : coach, jour (lundi..dimanche), heure_debut et heure_fin (HH:MM), titre, description courte ; null si absent.
+Phrase : "{message}"
+"""
+# Même consigne pour plusieurs phrases à la fois (LLM_BATCH=1), une réservation par phrase
+RESERVATION_BATCH_PROMPT = """Extrais la réservation de séance de sport de chacune des {count} phrases (SmartFit).
+Champs : coach, jour (lundi..dimanche), heure_debut et heure_fin (HH:MM), titre, description courte ; null si absent.
+Réponds avec "reservations" : une réservation par phrase, dans le même ordre.
+Phrases :
+{messages}
+"""
+
+_TEXTE_OU_NULL = {"type": ["string", "null"]}
+_HEURE_OU_NULL = {"type": ["string", "null"], "pattern": "^([01][0-9]|2[0-3]):[0-5][0-9]$"}
+
+# 🧾 Schéma JSON imposé à la génération (sortie structurée d'Ollama)
+BOOKING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "coach": _TEXTE_OU_NULL,
+        "jour": {"enum": JOURS + [None]},
+        "heure_debut": _HEURE_OU_NULL,
+        "heure_fin": _HEURE_OU_NULL,
+        "titre": _TEXTE_OU_NULL,
+        "description": _TEXTE_OU_NULL,
+    },
+    "required": ["coach", "jour", "heure_debut", "heure_fin", "titre", "description"],
+}
+# "schema" (Ollama >= 0.5), "json" (mode JSON simple des versions plus anciennes) ou "none"
+LLM_OUTPUT_FORMAT = os.environ.get("LLM_OUTPUT_FORMAT", "schema")
+BOOKING_FORMAT = {"schema": BOOKING_SCHEMA, "json": "json"}.get(LLM_OUTPUT_FORMAT)
+
+# 🧠 Cache des extractions déjà faites par le modèle
+llm_cache = cache_from_env()
+
+# 🧩 Réservations en cours par client (champs donnés dans les messages précédents)
+booking_sessions = sessions_from_env()
+
+# 🤖 Client du modèle IA (générations simultanées limitées, délai maximal)
+llm = client_from_env()
+
+# 📦 Extractions simultanées groupées en un seul appel (optionnel, LLM_BATCH=1)
+llm_batcher = batcher_from_env(llm, RESERVATION_PROMPT, RESERVATION_BATCH_PROMPT, BOOKING_FORMAT)
+
+
+def parse_llm_output(raw_output):
+    """Extraction JSON propre depuis la réponse du modèle"""
+    # Sortie structurée : la réponse est directement l'objet JSON
+    try:
+        parsed = json.loads(raw_output)
+        if isinstance(parsed, dict):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+    # Sinon (ancien mode texte libre), on cherche un objet JSON dans le texte
+    json_match = re.search(r'\{.*\}', raw_output, re.DOTALL)
+    if json_match:
+        try:
+            return json.loads(json_match.group())
+        except json.JSONDecodeError:
+            return {"error": "Erreur d'analyse du JSON"}
+    return {"error": "Aucun JSON trouvé dans la réponse"}
+
+
+def _extract_reservation(user_message, bypass_cache, stream):
+    """Générateur : produit les morceaux de texte du modèle si `stream`,
+    puis retourne (parsed_data, raw_output, statut du cache)"""
+    # Le prompt groupé ne donne pas forcément le même JSON que le prompt
+    # seul : ses réponses ont leur propre clé et ne servent pas un appel seul
+    batched = llm_batcher is not None and not stream
+    cache_key = f"{PROMPT_VERSION}:{'batch' if batched else 'single'}:{normalize_message(user_message)}"
+    if bypass_cache:
+        llm_cache.record_bypass()
+    else:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached["parsed"]), cached["raw"], "hit"
+
+    # Appel modèle IA local
+    prompt = RESERVATION_PROMPT.format(message=user_message)
+    if stream:
+        chunks = []
+        for chunk in llm.stream(prompt, format=BOOKING_FORMAT):
+            chunks.append(chunk)
+            yield chunk
+        raw_output = "".join(chunks)
+    elif batched:
+        raw_output = llm_batcher.extract(user_message)
+    else:
+        raw_output = llm.chat(prompt, format=BOOKING_FORMAT)
+    parsed_data = parse_llm_output(raw_output)
+
+    # On ne met en cache que les extractions exploitables
+    if "error" not in parsed_data:
+        llm_cache.set(cache_key, {"parsed": parsed_data, "raw": raw_output})
+    return parsed_data, raw_output, "bypass" if bypass_cache else "miss"
+
+
+def extract_reservation(user_message, bypass_cache=False):
+    """Retourne (parsed_data, raw_output, statut du cache) ; lève une exception si le modèle échoue"""
+    extraction = _extract_reservation(user_message, bypass_cache, stream=False)
+    try:
+        while True:
+            next(extraction)
+    except StopIteration as done:
+        return done.value
+
+
+def llm_error_response(error):
+    """Message et code HTTP pour une erreur du modèle IA"""
+    if isinstance(error, LLMBusyError):
+        return {"error": str(error)}, 503
+    if isinstance(error, LLMTimeoutError):
+        return {"error": "Le modèle IA n'a pas répondu à temps"}, 504
+    return {"error": f"Erreur avec le modèle IA: {str(error)}"}, 500
+
+
+class BookingError(Exception):
+    """Réservation refusée (coach ou client inconnu, créneau déjà pris)"""
+
+    def __init__(self, message, champ=None):
+        super().__init__(message)
+        self.champ = champ  # champ refusé ("coach", "client") ou None
+
+
+def reserve_slot(db, cursor, coach_id, client_id, date_debut, date_fin, titre, description):
+    """Vérifie le créneau et insère la séance de façon atomique ; False si déjà pris.
+
+    Le verrou sur la ligne du coach sérialise les réservations concurrentes
+    pour ce coach (y compris entre processus) jusqu'au commit. La recherche
+    de chevauchement est en intervalles semi-ouverts et reste indexable
+    avec un index (coach_id, date_debut) sur plannings.
+    """
+    cursor.execute("SELECT id FROM coachs WHERE id = %s FOR UPDATE", (coach_id,))
+    cursor.fetchall()
+
+    cursor.execute("""
+        SELECT id FROM plannings
+        WHERE coach_id = %s
+        AND date_debut < %s
+        AND date_fin > %s
+        LIMIT 1
+        FOR UPDATE
+    """, (coach_id, date_fin, date_debut))
+    if cursor.fetchall():
+        db.rollback()
+        return False
+
+    cursor.execute("""
+        INSERT INTO plannings (date_debut, date_fin, titre, description, client_id, coach_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (date_debut, date_fin, titre, description, client_id, coach_id))
+    db.commit()
+    return True
+
+
+def lookup_client(client_name):
+    """client_id depuis le nom du client ; lève BookingError s'il est inconnu"""
+    client = client_resolver.resolve(client_name)
+    if not client:
+        raise BookingError(f"Client '{client_name}' non trouvé", champ="client")
+    return client[0]
+
+
+def lookup_coach(coach_name):
+    """(coach_id, nom tel qu'en base) ; lève BookingError s'il est inconnu"""
+    coach = coach_resolver.resolve(coach_name)
+    if not coach:
+        raise BookingError(f"Coach '{coach_name}' non trouvé", champ="coach")
+    return coach
+
+
+def prefetch_coachs():
+    """Noms des coachs et index de disponibilité chargés (ou réconciliés) d'avance"""
+    coach_resolver.names()
+    availability_index.warm()
+
+
+def session_bounds(parsed_data):
+    """Jour + heures extraits -> (date_debut, date_fin) de la prochaine occurrence du jour.
+    Lève BookingError si la fin n'est pas après le début"""
+    jours = {
+        "lundi": 0, "mardi": 1, "mercredi": 2, "jeudi": 3,
+        "vendredi": 4, "samedi": 5, "dimanche": 6
+    }
+
+    today = datetime.today()
+    jour_lower = parsed_data["jour"].lower()
+    target_weekday = jours.get(jour_lower, today.weekday())
+
+    days_ahead = target_weekday - today.weekday()
+    if days_ahead < 0:
+        days_ahead += 7
+
+    date_of_session = today + timedelta(days=days_ahead)
+
+    date_debut = datetime.combine(
+        date_of_session.date(),
+        datetime.strptime(parsed_data["heure_debut"], "%H:%M").time()
+    )
+    date_fin = datetime.combine(
+        date_of_session.date(),
+        datetime.strptime(parsed_data["heure_fin"], "%H:%M").time()
+    )
+    if date_fin <= date_debut:
+        raise BookingError(
+            f"L'heure de fin ({parsed_data['heure_fin']}) doit être après l'heure de début"
+            f" ({parsed_data['heure_debut']})", champ="heure_fin"
+        )
+    return date_debut, date_fin
+
+
+def check_slot(coach, bounds):
+    """Refus immédiat si l'index en mémoire connaît déjà une séance sur ce créneau"""
+    coach_id, coach_name = coach
+    if availability_index.conflict(coach_id, *bounds):
+        raise BookingError(f"Le coach {coach_name} n'est pas disponible à ce créneau")
+
+
+def insert_session(parsed_data, coach, client_id, bounds, _slot_free):
+    """Vérification définitive et insertion dans la même transaction (seul aller-retour
+    vers la base du chemin de réservation) ; retourne (saved_to_db, db_error)"""
+    db = get_db_connection()
+    if not db:
+        return False, "Impossible de se connecter à la base de données"
+    cursor = None
+    try:
+        cursor = db.cursor(dictionary=True)
+        coach_id, coach_name = coach
+        date_debut, date_fin = bounds
+        saved_to_db = reserve_slot(
+            db, cursor, coach_id, client_id, date_debut, date_fin,
+            parsed_data.get("titre") or "Séance",
+            parsed_data.get("description") or ""
+        )
+        if not saved_to_db:
+            raise BookingError(f"Le coach {coach_name} n'est pas disponible à ce créneau")
+        availability_index.add_planning(coach_id, date_debut, date_fin)
+        return True, None
+    except mysql.connector.Error as err:
+        return False, f"Erreur base de données: {err}"
+    finally:
+        if cursor is not None:
+            cursor.close()
+        db.close()
+
+
+# 🧵 Étapes de réservation indépendantes exécutées en parallèle (pendant l'appel au modèle)
+booking_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("BOOKING_WORKERS", 8)), thread_name_prefix="booking"
+)
+# Durée de chaque étape dans la réponse de /chat (toujours en mode debug Flask)
+DEBUG_TIMINGS = os.environ.get("BOOKING_DEBUG_TIMINGS", "0") == "1"
+
+
+def start_booking(graph, client_name, coach_hint=None):
+    """Étapes qui ne dépendent pas de l'extraction, lancées avant l'appel au modèle :
+    client, liste des coachs et, s'il est déjà reconnu par les règles, le coach"""
+    graph.add("client", lookup_client, args=(client_name,))
+    graph.add("coachs", prefetch_coachs)
+    if coach_hint:
+        graph.add(f"coach:{coach_hint}", lookup_coach, args=(coach_hint,), after=("coachs",))
+
+
+def save_booking(parsed_data, client_name, graph=None):
+    """Enregistre la séance extraite ; retourne (saved_to_db, db_error).
+    Lève BookingError si la réservation est refusée.
+
+    Graphe de dépendances : client ∥ coach -> créneau libre en mémoire ->
+    insertion. Sans `graph`, les étapes s'exécutent dans ce thread, dans
+    l'ordre ; les refus gardent la priorité coach, client, format, créneau.
+    """
+    if graph is None:
+        graph = TaskGraph()
+    if "client" not in graph:
+        start_booking(graph, client_name)
+
+    if not all(k in parsed_data for k in ("coach", "jour", "heure_debut", "heure_fin")):
+        return False, None
+
+    # Coach déjà cherché pendant l'appel au modèle s'il venait des règles
+    coach = f"coach:{parsed_data['coach']}"
+    if coach not in graph:
+        graph.add(coach, lookup_coach, args=(parsed_data["coach"],), after=("coachs",))
+    graph.add("slot", session_bounds, args=(parsed_data,))
+    graph.add("free", check_slot, deps=(coach, "slot"))
+    graph.add("reserve", insert_session, deps=(coach, "client", "slot", "free"), args=(parsed_data,))
+
+    try:
+        # 🔹 Nom du coach tel qu'en base dans la réponse
+        parsed_data["coach"] = graph.result(coach)[1]
+        return graph.result("reserve")
+    except ValueError as e:
+        return False, f"Erreur de format de date/heure: {e}"
+    except mysql.connector.Error as err:
+        return False, f"Erreur base de données: {err}"
+
+
+def booking_reply(parsed_data, raw_output, cache_status, extraction_source, client_name, graph=None):
+    """Enregistre la réservation et construit la réponse de /chat ; retourne (corps, code HTTP).
+    Une réservation incomplète est gardée dans la session du client pour son prochain message"""
+    if graph is None:
+        graph = TaskGraph()
+    body = {
+        "reply": parsed_data,
+        "saved": False,
+        "raw": raw_output,
+        "cache": cache_status,
+        "extraction": extraction_source
+    }
+    status = 200
+    if "error" not in parsed_data and not is_complete(parsed_data):
+        # 🧩 Il manque des champs : on les demandera sans faire tout redonner
+        booking_sessions.update(client_name, parsed_data)
+        body["missing"] = [k for k in CHAMPS_OBLIGATOIRES if not parsed_data.get(k)]
+        body["message"] = f"Réservation en attente, il manque : {', '.join(body['missing'])}"
+    else:
+        try:
+            saved_to_db, db_error = save_booking(parsed_data, client_name, graph)
+        except BookingError as e:
+            body, status = {"error": str(e), "saved": False}, 400
+            if e.champ == "client":
+                booking_sessions.clear(client_name)
+            else:
+                # Le client corrige un champ (autre heure, autre coach) sans tout redonner
+                booking_sessions.update(client_name, parsed_data)
+                booking_sessions.forget(client_name, *([e.champ] if e.champ else []))
+        else:
+            if saved_to_db:
+                booking_sessions.clear(client_name, completed=True)
+            else:
+                booking_sessions.update(client_name, parsed_data)
+            body.update(saved=saved_to_db, db_error=db_error)
+
+    if DEBUG_TIMINGS or current_app.debug:
+        body["timings"] = graph.timings()
+    return body, status
+
+
+def stream_booking(user_message, client_name, known, bypass_cache, extraction_source, graph):
+    """Réponse NDJSON : les morceaux de texte du modèle puis le résultat final"""
+    def line(payload):
+        return json.dumps(payload, ensure_ascii=False) + "\n"
+
+    if is_complete(known):
+        parsed_data, raw_output, cache_status = known, None, None
+    else:
+        started = time.perf_counter()
+        extraction = _extract_reservation(user_message, bypass_cache, stream=True)
+        try:
+            while True:
+                yield line({"type": "token", "content": next(extraction)})
+        except StopIteration as done:
+            parsed_data, raw_output, cache_status = done.value
+        except Exception as e:
+            body, status = llm_error_response(e)
+            yield line({"type": "error", "status": status, **body})
+            return
+        graph.provide("extraction", started=started)
+
+        if "error" in parsed_data:
+            # Réponse du modèle illisible : les champs déjà connus restent pour le prochain message
+            booking_sessions.update(client_name, known)
+        else:
+            parsed_data = merge_booking(parsed_data, known)
+    extraction_stats.record(extraction_source)
+
+    body, status = booking_reply(parsed_data, raw_output, cache_status, extraction_source, client_name, graph)
+    yield line({"type": "result" if status == 200 else "error", "status": status, **body})
+
+
+@bp.route('/chat', methods=['POST'])
 def chat():
     data = request.get_json()
     user_message = data.get('message', '')
@@ -132,16 +630,11 @@ def chat():
     if not client_name:
         return jsonify({"error": "Nom du client non fourni"}), 400
 
-    # 🔍 Détection de l'intention
-    intentions, activite_demandee = detect_intention(user_message)
+    # 🔍 Détection de l'intention, de l'activité et du jour en un seul passage
+    intentions, activite_demandee, jour_demande = intent_matcher.analyse(user_message)
 
     # Si l'utilisateur cherche des coachs disponibles
     if intentions["recherche_coach"]:
-        # Extraction du jour depuis le message si mentionné
-        jours_pattern = r"\b(lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)\b"
-        jour_match = re.search(jours_pattern, user_message.lower())
-        jour_demande = jour_match.group(1) if jour_match else None
-
         # Recherche des coachs disponibles
         coachs_disponibles = get_available_coachs(activite_demandee, jour_demande)
 
@@ -181,150 +674,57 @@ def chat():
             "saved": False
         })
 
-    # 🔹 Prompt pour l'IA pour les réservations
-    prompt = f"""
-    Tu es un assistant de réservation sportif pour l'application SmartFit.
-    Analyse la phrase suivante et retourne UNIQUEMENT un JSON au format :
-    {{
-        "coach": "nom du coach si mentionné sinon null",
-        "jour": "jour mentionné sinon null",
-        "heure_debut": "heure de début (ex: 09:00) sinon null",
-        "heure_fin": "heure de fin (ex: 10:00) sinon null",
-        "titre": "titre de la séance, exemple: Musculation",
-        "description": "description courte de la séance"
-    }}
-
-    Phrase : "{user_message}"
-    """
-
-    try:
-        # Appel modèle IA local
-        response = ollama.chat(
-            model='llama3',
-            messages=[{'role': 'user', 'content': prompt}]
+    # 🔹 Extraction par règles d'abord, le modèle IA seulement s'il manque des champs
+    rule_data = extract_booking(user_message, coach_gazetteer, activite_demandee)
+    # 🧩 Champs des messages précédents du client ; ceux de ce message priment
+    session = booking_sessions.get(client_name)
+    known = merge_booking({k: session.get(k) for k in rule_data}, rule_data)
+    extraction_source = "rules" if is_complete(rule_data) else (
+        "session" if is_complete(known) else
+        "partial" if any(known[k] for k in CHAMPS_OBLIGATOIRES) else "llm"
+    )
+    bypass_cache = request.headers.get("X-Cache-Bypass", "").lower() in ("1", "true", "yes")
+
+    # 🔹 Client et coachs cherchés pendant que le modèle génère (dans ce thread si pas de modèle)
+    graph = TaskGraph(None if is_complete(known) else booking_executor)
+    start_booking(graph, client_name, known["coach"])
+
+    # 🔹 Mode flux : les morceaux de texte du modèle sont envoyés au fil de l'eau
+    if data.get("stream") is True or "application/x-ndjson" in request.headers.get("Accept", ""):
+        return Response(
+            stream_with_context(stream_booking(
+                user_message, client_name, known, bypass_cache, extraction_source, graph
+            )),
+            mimetype="application/x-ndjson"
         )
-        raw_output = response['message']['content']
-    except Exception as e:
-        return jsonify({"error": f"Erreur avec le modèle IA: {str(e)}"}), 500
 
-    # Extraction JSON propre
-    json_match = re.search(r'\{.*\}', raw_output, re.DOTALL)
-    parsed_data = {}
-    if json_match:
-        try:
-            parsed_data = json.loads(json_match.group())
-        except json.JSONDecodeError:
-            parsed_data = {"error": "Erreur d'analyse du JSON"}
+    if is_complete(known):
+        parsed_data, raw_output, cache_status = known, None, None
     else:
-        parsed_data = {"error": "Aucun JSON trouvé dans la réponse"}
-
-    saved_to_db = False
-    db_error = None
-
-    if all(k in parsed_data for k in ("coach", "jour", "heure_debut", "heure_fin")):
-        db = get_db_connection()
-        if db:
-            try:
-                cursor = db.cursor(dictionary=True)
-
-                # 🔹 Récupérer coach_id depuis le nom du coach
-                cursor.execute("SELECT id FROM coachs WHERE nom = %s", (parsed_data["coach"],))
-                coach_row = cursor.fetchone()
-                if coach_row:
-                    coach_id = coach_row["id"]
-                else:
-                    return jsonify({
-                        "error": f"Coach '{parsed_data['coach']}' non trouvé",
-                        "saved": False
-                    }), 400
-
-                # 🔹 Récupérer client_id depuis le nom du client
-                cursor.execute("SELECT id FROM client WHERE nom = %s", (client_name,))
-                client_row = cursor.fetchone()
-                if client_row:
-                    client_id = client_row["id"]
-                else:
-                    return jsonify({
-                        "error": f"Client '{client_name}' non trouvé",
-                        "saved": False
-                    }), 400
-
-                # 🔹 Conversion jour + heure en datetime
-                jours = {
-                    "lundi": 0, "mardi": 1, "mercredi": 2, "jeudi": 3,
-                    "vendredi": 4, "samedi": 5, "dimanche": 6
-                }
-
-                today = datetime.today()
-                jour_lower = parsed_data["jour"].lower()
-                target_weekday = jours.get(jour_lower, today.weekday())
-
-                days_ahead = target_weekday - today.weekday()
-                if days_ahead < 0:
-                    days_ahead += 7
-
-                date_of_session = today + timedelta(days=days_ahead)
-
-                date_debut = datetime.combine(
-                    date_of_session.date(),
-                    datetime.strptime(parsed_data["heure_debut"], "%H:%M").time()
-                )
-                date_fin = datetime.combine(
-                    date_of_session.date(),
-                    datetime.strptime(parsed_data["heure_fin"], "%H:%M").time()
-                )
-
-                # 🔹 Vérifier si le coach est disponible à ce créneau
-                cursor.execute("""
-                    SELECT id FROM plannings 
-                    WHERE coach_id = %s 
-                    AND ((date_debut BETWEEN %s AND %s) OR (date_fin BETWEEN %s AND %s))
-                """, (coach_id, date_debut, date_fin, date_debut, date_fin))
-
-                if cursor.fetchone():
-                    return jsonify({
-                        "error": f"Le coach {parsed_data['coach']} n'est pas disponible à ce créneau",
-                        "saved": False
-                    }), 400
-
-                # 🔹 Insertion dans la table plannings
-                sql = """
-                    INSERT INTO plannings (date_debut, date_fin, titre, description, client_id, coach_id)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """
-                values = (
-                    date_debut,
-                    date_fin,
-                    parsed_data.get("titre", "Séance"),
-                    parsed_data.get("description", ""),
-                    client_id,
-                    coach_id
-                )
-                cursor.execute(sql, values)
-                db.commit()
-                saved_to_db = True
-
-            except mysql.connector.Error as err:
-                db_error = f"Erreur base de données: {err}"
-                saved_to_db = False
-            except ValueError as e:
-                db_error = f"Erreur de format de date/heure: {e}"
-                saved_to_db = False
-            finally:
-                cursor.close()
-                db.close()
+        started = time.perf_counter()
+        try:
+            parsed_data, raw_output, cache_status = extract_reservation(user_message, bypass_cache)
+        except Exception as e:
+            body, status = llm_error_response(e)
+            return jsonify(body), status
+        graph.provide("extraction", started=started)
+
+        # Le modèle ne remplit que les champs manquants : ceux des règles
+        # (nom exact du coach, jour, plage) et de la session priment. Les
+        # heures vont par paire : une heure de début des règles ne garde
+        # pas la fin du modèle si leurs débuts diffèrent (fin redemandée)
+        if "error" in parsed_data:
+            # Réponse du modèle illisible : les champs déjà connus restent pour le prochain message
+            booking_sessions.update(client_name, known)
         else:
-            db_error = "Impossible de se connecter à la base de données"
+            parsed_data = merge_booking(parsed_data, known)
+    extraction_stats.record(extraction_source)
 
-    return jsonify({
-        "reply": parsed_data,
-        "saved": saved_to_db,
-        "db_error": db_error,
-        "raw": raw_output
-    })
+    body, status = booking_reply(parsed_data, raw_output, cache_status, extraction_source, client_name, graph)
+    return jsonify(body), status
 
 
-@app.route('/coachs', methods=['GET'])
+@bp.route('/coachs', methods=['GET'])
 def get_coachs():
     """Endpoint pour récupérer tous les coachs avec filtres"""
     activite = request.args.get('activite')
@@ -345,7 +745,77 @@ def get_coachs():
     })
 
 
-@app.route('/health', methods=['GET'])
+def _parse_moment(value, end_of_day=False):
+    """Date (AAAA-MM-JJ) ou date et heure ISO ; une date seule en fin de période
+    couvre toute la journée. Lève ValueError si le format est invalide ou si
+    un fuseau horaire est donné (les plannings sont en heure locale, sans fuseau)"""
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        raise ValueError(f"fuseau horaire non accepté ({value}), heure locale attendue")
+    if end_of_day and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+
+@bp.route('/slots', methods=['GET'])
+def get_free_slots():
+    """Prochaines séances réservables : ?activite=yoga&jour=mardi&debut=2025-06-02&fin=2025-06-08&duree=60&limit=10"""
+    activite = request.args.get('activite')
+    jour = request.args.get('jour')
+    now = datetime.now().replace(second=0, microsecond=0)
+    try:
+        debut = max(_parse_moment(request.args.get('debut')) or now, now)
+        fin = _parse_moment(request.args.get('fin'), end_of_day=True) or debut + timedelta(days=7)
+        duree = int(request.args.get('duree', SLOT_MINUTES))
+        limit = int(request.args.get('limit', 10))
+    except ValueError as e:
+        return jsonify({"error": f"Paramètre invalide: {e}"}), 400
+
+    if not 0 < duree <= 240 or not 0 < limit <= 100:
+        return jsonify({"error": "duree doit être entre 1 et 240 minutes et limit entre 1 et 100"}), 400
+    if fin <= debut:
+        return jsonify({"error": "La fin de la période doit être après son début"}), 400
+    if fin - debut > timedelta(days=SLOTS_MAX_DAYS):
+        return jsonify({"error": f"Période limitée à {SLOTS_MAX_DAYS} jours"}), 400
+
+    hours = OPENING_HOURS
+    if jour:
+        if jour.lower() not in JOURS:
+            return jsonify({"error": f"Jour inconnu: {jour}"}), 400
+        weekday = JOURS.index(jour.lower())
+        hours = {weekday: OPENING_HOURS.get(weekday, [])}
+
+    slots = get_slots(activite, debut, fin, timedelta(minutes=duree), hours, limit)
+    if "error" in slots:
+        return jsonify({"error": slots["error"]}), 500
+
+    return jsonify({
+        "slots": [
+            {
+                "coach_id": coach["id"],
+                "coach": coach["nom"],
+                "specialite": coach["specialite"],
+                "jour": JOURS[slot_start.weekday()],
+                "debut": slot_start.isoformat(timespec="minutes"),
+                "fin": slot_end.isoformat(timespec="minutes")
+            }
+            for slot_start, slot_end, coach in slots
+        ],
+        "count": len(slots),
+        "filters": {
+            "activite": activite,
+            "jour": jour,
+            "debut": debut.isoformat(timespec="minutes"),
+            "fin": fin.isoformat(timespec="minutes"),
+            "duree": duree,
+            "limit": limit
+        }
+    })
+
+
+@bp.route('/health', methods=['GET'])
 def health_check():
     """Endpoint pour vérifier que l'API fonctionne"""
     db = get_db_connection()
@@ -355,9 +825,25 @@ def health_check():
     return jsonify({
         "status": "running",
         "database": db_status,
+        "pool": db_pool.stats(),
+        "llm_cache": llm_cache.stats(),
+        "sessions": booking_sessions.stats(),
+        "extraction": extraction_stats.stats(),
+        "llm": llm.stats(),
+        "llm_batch": llm_batcher.stats() if llm_batcher else None,
+        "availability": availability_index.stats(),
+        "names": {"coachs": coach_resolver.stats(), "clients": client_resolver.stats()},
         "timestamp": datetime.now().isoformat()
     })
 
 
+# 🚀 Application autonome (la passerelle monte directement le blueprint)
+app = Flask(__name__)
+CORS(app)
+app.register_blueprint(bp)
+
+
 if __name__ == '__main__':
+    # Modèle chargé dans Ollama pendant le démarrage, pas à la première réservation
+    llm.warm_up_in_background()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+
+class PoolTimeoutError(mysql.connector.Error):
+    """Levée quand aucune connexion ne se libère avant le délai d'attente"""
+
+
+class PooledConnection:
+    """Connexion empruntée au pool : close() la rend au pool au lieu de la fermer"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Pool de connexions borné (taille fixe + débordement), avec recyclage
+    des connexions inactives et validation au moment de l'emprunt."""
+
+    def __init__(self, connect, size=5, max_overflow=5, recycle=1800,
+                 timeout=10.0, validate=True):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.timeout = timeout
+        self.validate = validate
+
+        self._idle = deque()  # (connexion, instant de retour au pool)
+        self._cond = threading.Condition()
+        self._total = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._invalidated = 0
+
+    # ------------------------------------------------------------------
+    # Emprunt / restitution
+    # ------------------------------------------------------------------
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        wait_start = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, returned_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._total < self.size + self.max_overflow:
+                    # Réservation d'une place, la connexion est ouverte hors verrou
+                    raw, returned_at = None, None
+                    self._total += 1
+                    self._in_use += 1
+                    break
+
+                if not waited:
+                    waited = True
+                    wait_start = time.monotonic()
+                    self._waits += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._wait_time += time.monotonic() - wait_start
+                    raise PoolTimeoutError(
+                        msg=f"Aucune connexion disponible après {self.timeout}s"
+                    )
+                self._cond.wait(remaining)
+
+            if waited:
+                self._wait_time += time.monotonic() - wait_start
+            self._checkouts += 1
+
+        try:
+            raw = self._prepare(raw, returned_at)
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw)
+
+    def _prepare(self, raw, returned_at):
+        if raw is not None and self.recycle and time.monotonic() - returned_at > self.recycle:
+            self._discard(raw)
+            with self._cond:
+                self._recycled += 1
+            raw = None
+
+        if raw is not None and self.validate and not self._is_alive(raw):
+            self._discard(raw)
+            with self._cond:
+                self._invalidated += 1
+            raw = None
+
+        if raw is None:
+            raw = self._connect()
+        return raw
+
+    def release(self, raw):
+        try:
+            # On ne rend jamais au pool une transaction entamée
+            raw.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy and len(self._idle) < self.size:
+                self._idle.append((raw, time.monotonic()))
+                raw = None
+            else:
+                self._total -= 1
+            self._cond.notify()
+
+        if raw is not None:
+            self._discard(raw)
+
+    @staticmethod
+    def _is_alive(raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # Métriques
+    # ------------------------------------------------------------------
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._total,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_ms": round(self._wait_time * 1000, 2),
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "invalidated": self._invalidated,
+            }
+
+    def dispose(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+        for raw, _ in idle:
+            self._discard(raw)
+
+
+def pool_from_env(connect):
+    """Construit un pool paramétré par les variables d'environnement DB_POOL_*"""
+    return ConnectionPool(
+        connect,
+        size=int(os.environ.get("DB_POOL_SIZE", 5)),
+        max_overflow=int(os.environ.get("DB_POOL_MAX_OVERFLOW", 5)),
+        recycle=float(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        timeout=float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        validate=os.environ.get("DB_POOL_VALIDATE", "1") != "0",
+    )
@@ -0,0 +1,83 @@
+"""
+Passerelle unique : le chatbot de réservation, le score de forme et le
+prix des abonnements servis par un seul processus, au-dessus d'un même
+registre de modèles (model_registry.py) chargés à la première utilisation.
+
+    python gateway.py
+
+    /booking/...       chatbot de réservation (chatbot.py)
+    /fitness/...       score de forme (Client/chatbot.py)
+    /fitness/raw/...   prédiction brute (Client/api.py)
+    /price/...         prix des abonnements (Abonnements/app.py)
+    /health            état des services et des modèles chargés
+
+Chaque service reste utilisable seul, avec ses URL d'origine.
+"""
+import importlib.util
+import os
+import sys
+from datetime import datetime
+
+from flask import Flask, jsonify
+from flask_cors import CORS
+
+import chatbot as booking
+from model_registry import registry
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_service(name, relative_path):
+    """Importe le module d'un service par son chemin, sous un nom unique
+    (Client/chatbot.py porte le même nom que le chatbot de réservation)"""
+    path = os.path.join(HERE, relative_path)
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        # Pour ses imports voisins (fitness_engine, fast_predictor...)
+        sys.path.append(directory)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+fitness = _load_service("fitness_service", os.path.join("Client", "chatbot.py"))
+fitness_raw = _load_service("fitness_raw_service", os.path.join("Client", "api.py"))
+price = _load_service("price_service", os.path.join("Abonnements", "app.py"))
+
+SERVICES = {
+    "/booking": booking.bp,
+    "/fitness": fitness.bp,
+    "/fitness/raw": fitness_raw.bp,
+    "/price": price.bp,
+}
+
+
+def create_app():
+    app = Flask(__name__)
+    CORS(app)
+    for prefix, blueprint in SERVICES.items():
+        app.register_blueprint(blueprint, url_prefix=prefix)
+
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        """Services montés et, pour chaque modèle : chargé ou non, temps de chargement, mémoire"""
+        return jsonify({
+            "status": "running",
+            "services": list(SERVICES),
+            "registry": registry.stats(),
+            "timestamp": datetime.now().isoformat()
+        })
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    if os.environ.get("GATEWAY_PRELOAD", "0") == "1":
+        registry.preload()
+    booking.llm.warm_up_in_background()
+    app.run(host=os.environ.get("GATEWAY_HOST", "127.0.0.1"), port=int(os.environ.get("GATEWAY_PORT", 8000)))
@@ -0,0 +1,136 @@
+import re
+from collections import namedtuple
+
+from booking_parser import ACTIVITES, JOURS, fold
+
+INTENTIONS = {
+    "recherche_coach": [
+        "coach", "disponible", "dispo", "disponibilité", "qui est disponible",
+        "quels coachs", "liste des coachs", "coachs pour", "cherche coach"
+    ],
+    "reservation": [
+        "réserver", "reserver", "booking", "book", "prendre rendez-vous",
+        "planifier", "séance", "seance", "créneau"
+    ],
+    "annulation": [
+        "annuler", "supprimer", "cancel", "retirer"
+    ]
+}
+
+MessageAnalysis = namedtuple("MessageAnalysis", ["intentions", "activite", "jour"])
+
+
+def _trie_pattern(words):
+    """Alternative regex en forme d'arbre de préfixes : à chaque position le
+    moteur ne suit qu'une branche, et la correspondance la plus longue gagne."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if end else "")
+
+    return build(trie)
+
+
+def _glued(keywords):
+    """Chaînes où deux mots-clés se recouvrent partiellement (« annuleretirer ») :
+    seul cas où la recherche gloutonne en un passage peut manquer un mot-clé"""
+    glued = set()
+    for a in keywords:
+        for b in keywords:
+            for i in range(1, len(a)):
+                if b.startswith(a[i:]) and len(b) > len(a) - i:
+                    glued.add(a[:i] + b)
+    return glued
+
+
+class IntentMatcher:
+    """Détection des intentions, activités et jour en un seul passage sur le message.
+
+    Tous les mots-clés (repliés sans accents) sont compilés une fois dans une
+    seule regex en arbre de préfixes ; chaque mot-clé correspond à un masque
+    de bits qui inclut ceux des mots-clés qu'il contient (« coachs pour »
+    contient « coach »). Le résultat est le même qu'avec une recherche de
+    chaque mot-clé séparément : les chaînes où deux mots-clés collés se
+    recouvrent font aussi partie de l'arbre, et dans ce cas rare on repasse
+    avec une regex qui teste chaque position.
+    """
+
+    def __init__(self, intentions=INTENTIONS, activites=ACTIVITES, jours=JOURS):
+        self.intention_names = list(intentions)
+        self.activites = list(activites)
+
+        # Un bit par étiquette : intentions, puis activités, puis « un jour est cité »
+        self._labels = [("intention", name) for name in self.intention_names]
+        self._labels += [("activite", activite) for activite in self.activites]
+        self._jour_bit = 1 << len(self._labels)
+
+        substrings = {}   # mot-clé replié -> masque
+        for bit, (kind, name) in enumerate(self._labels):
+            keywords = intentions[name] if kind == "intention" else [name]
+            for keyword in keywords:
+                folded = fold(keyword)
+                substrings[folded] = substrings.get(folded, 0) | (1 << bit)
+        folded_jours = [fold(jour) for jour in jours]
+
+        keywords = set(substrings) | set(folded_jours)
+        self._masks = {}
+        for keyword in keywords:
+            mask = self._jour_bit if keyword in folded_jours else 0
+            for other, other_mask in substrings.items():
+                if other in keyword:
+                    mask |= other_mask
+            self._masks[keyword] = mask
+
+        self._every_position = re.compile("(?=(" + _trie_pattern(keywords) + "))")
+        # Masque None : mots-clés recouverts, à reprendre position par position
+        for glued in _glued(keywords):
+            self._masks.setdefault(glued, None)
+        self._pattern = re.compile(_trie_pattern(self._masks))
+        self._jours = re.compile(r"\b(" + _trie_pattern(folded_jours) + r")\b")
+        self._results = {}
+
+    def _result(self, mask):
+        """(intentions, activité) pour un masque, mémorisé : il y en a peu de distincts"""
+        result = self._results.get(mask)
+        if result is None:
+            present = {name for bit, (_, name) in enumerate(self._labels) if mask >> bit & 1}
+            intentions = {name: name in present for name in self.intention_names}
+            activite = next((a for a in self.activites if a in present), None)
+            result = self._results[mask] = (intentions, activite)
+        return result
+
+    def analyse(self, message):
+        text = fold(message)
+        masks = self._masks
+        mask = 0
+        for keyword in self._pattern.findall(text):
+            keyword_mask = masks[keyword]
+            if keyword_mask is None:
+                mask = 0
+                for keyword in self._every_position.findall(text):
+                    mask |= masks[keyword]
+                break
+            mask |= keyword_mask
+
+        jour = None
+        if mask & self._jour_bit:
+            # Les jours sont des mots entiers (« lundis » ne compte pas)
+            match = self._jours.search(text)
+            jour = match.group(1) if match else None
+
+        intentions, activite = self._result(mask & ~self._jour_bit)
+        return MessageAnalysis(dict(intentions), activite, jour)
+
+
+matcher = IntentMatcher()
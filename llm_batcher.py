@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchSplitError(ValueError):
+    """La réponse groupée ne contient pas un résultat exploitable par phrase"""
+
+
+class _Pending:
+    __slots__ = ("message", "future", "taken")
+
+    def __init__(self, message):
+        self.message = message
+        self.future = Future()
+        self.taken = False
+
+
+class LLMBatcher:
+    """Regroupe les extractions simultanées en un seul appel au modèle.
+
+    La première requête arrivée attend au plus `max_wait` secondes (ou que
+    `max_batch` requêtes soient là), puis envoie toutes les phrases dans un
+    seul prompt numéroté (`batch_prompt`, champs {count} et {messages}) avec
+    un schéma « tableau de `item_format` de taille fixe ». Les autres
+    requêtes attendent leur part du résultat. Une requête seule passe par
+    le prompt habituel (`prompt`, champ {message}). Si la réponse groupée
+    est illisible ou n'a pas le bon nombre d'éléments, chaque phrase du
+    lot est refaite par un appel seul, et une erreur de cet appel ne
+    touche que sa requête. Sur un modèle CPU à une seule place de
+    génération, le lot paie une fois le coût fixe d'un appel (consignes,
+    aller-retour, ordonnancement) au lieu d'une fois par membre.
+
+    Avec un serveur Ollama à plusieurs places (OLLAMA_NUM_PARALLEL > 1),
+    l'autre option est de garder les appels séparés et de monter
+    LLM_MAX_CONCURRENCY au même nombre : le serveur groupe alors lui-même.
+    """
+
+    def __init__(self, llm, prompt, batch_prompt, item_format, max_batch=8, max_wait=0.01):
+        self.llm = llm
+        self.prompt = prompt
+        self.batch_prompt = batch_prompt
+        self.item_format = item_format
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._pending = []
+        self._leader = False
+        self.requests = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.single_calls = 0
+        self.fallbacks = 0
+
+    # --- Prompts ---
+
+    @staticmethod
+    def _sentence(message):
+        # Une phrase par ligne, sans guillemets qui fermeraient la citation
+        return " ".join(message.split()).replace('"', "'")
+
+    def batch_format(self, count):
+        if not isinstance(self.item_format, dict):
+            return self.item_format
+        return {
+            "type": "object",
+            "properties": {
+                "reservations": {"type": "array", "items": self.item_format,
+                                 "minItems": count, "maxItems": count},
+            },
+            "required": ["reservations"],
+        }
+
+    def split(self, raw_output, count):
+        """Réponse groupée -> un texte JSON par phrase, dans l'ordre"""
+        try:
+            items = json.loads(raw_output)["reservations"]
+        except (json.JSONDecodeError, TypeError, KeyError) as e:
+            raise BatchSplitError(f"réponse groupée illisible : {e}") from e
+        if not isinstance(items, list) or len(items) != count or not all(isinstance(i, dict) for i in items):
+            raise BatchSplitError(f"{count} réservations attendues")
+        return [json.dumps(item, ensure_ascii=False) for item in items]
+
+    # --- Appels ---
+
+    def _single(self, message):
+        with self._cond:
+            self.single_calls += 1
+        return self.llm.chat(self.prompt.format(message=message), format=self.item_format)
+
+    def _run_single(self, pending):
+        try:
+            pending.future.set_result(self._single(pending.message))
+        except Exception as e:
+            pending.future.set_exception(e)
+
+    def _run_batch(self, batch):
+        messages = "\n".join(f'{i}. "{self._sentence(p.message)}"' for i, p in enumerate(batch, 1))
+        prompt = self.batch_prompt.format(count=len(batch), messages=messages)
+        options = None
+        if "num_predict" in self.llm.options:
+            options = {"num_predict": self.llm.options["num_predict"] * len(batch)}
+        try:
+            raw_output = self.llm.chat(prompt, format=self.batch_format(len(batch)), options=options)
+        except Exception as e:
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+        try:
+            results = self.split(raw_output, len(batch))
+        except BatchSplitError as e:
+            print(f"⚠️ Lot de {len(batch)} extractions refait une par une : {e}")
+            with self._cond:
+                self.fallbacks += 1
+            for pending in batch:
+                self._run_single(pending)
+            return
+        for pending, result in zip(batch, results):
+            pending.future.set_result(result)
+
+    def _lead(self, own):
+        """Rassemble le lot (au plus max_wait) puis l'envoie ; `own` en fait partie"""
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            others = [p for p in self._pending if p is not own][:self.max_batch - 1]
+            batch = [own] + others
+            for pending in batch:
+                pending.taken = True
+            self._pending = [p for p in self._pending if not p.taken]
+            self._leader = False
+            self.batches += 1
+            self.batched_requests += len(batch)
+            # Requêtes restantes : l'une d'elles prend la tête du lot suivant
+            self._cond.notify_all()
+
+        if len(batch) == 1:
+            self._run_single(own)
+        else:
+            self._run_batch(batch)
+
+    def extract(self, message):
+        """Texte JSON produit par le modèle pour `message` (comme llm.chat)"""
+        pending = _Pending(message)
+        with self._cond:
+            self.requests += 1
+            self._pending.append(pending)
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+            while self._leader and not pending.taken:
+                self._cond.wait()
+            lead = not pending.taken
+            if lead:
+                self._leader = True
+
+        if lead:
+            self._lead(pending)
+        return pending.future.result()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": round(self.batched_requests / self.batches, 2) if self.batches else None,
+                "single_calls": self.single_calls,
+                "fallbacks": self.fallbacks,
+                "waiting": len(self._pending),
+            }
+
+
+def batcher_from_env(llm, prompt, batch_prompt, item_format):
+    """Regroupement activé par LLM_BATCH=1 (None sinon), réglé par LLM_BATCH_*"""
+    if os.environ.get("LLM_BATCH", "0") != "1":
+        return None
+    return LLMBatcher(
+        llm, prompt, batch_prompt, item_format,
+        max_batch=int(os.environ.get("LLM_BATCH_MAX", 8)),
+        max_wait=float(os.environ.get("LLM_BATCH_WAIT_MS", 10)) / 1000,
+    )
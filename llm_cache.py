@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_message(message):
+    """Normalise un message pour la clé de cache : casse, espaces et forme Unicode"""
+    message = unicodedata.normalize("NFC", message)
+    return _WHITESPACE.sub(" ", message).strip().lower()
+
+
+class ResponseCache:
+    """Cache LRU borné avec expiration (TTL), éventuellement persisté dans SQLite.
+
+    Les valeurs doivent être sérialisables en JSON ; on y stocke le JSON
+    déjà analysé renvoyé par le modèle, pas seulement le texte brut.
+
+    La connexion SQLite est propre à chaque processus : celle qui charge le
+    cache à la création est refermée aussitôt, et chaque processus ouvre la
+    sienne à sa première écriture. Les workers de serve.py, créés par fork
+    après l'import de la passerelle, n'utilisent jamais celle du parent.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # clé -> (valeur, expiration)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypasses = 0
+
+        self._db = None
+        self._db_pid = None
+        self._inherited = []  # connexions d'un processus parent : jamais utilisées ni fermées ici
+        if path:
+            db = sqlite3.connect(path)
+            try:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                db.commit()
+                self._load(db)
+            finally:
+                db.close()
+
+    def _load(self, db):
+        now = time.time()
+        db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        rows = db.execute(
+            "SELECT key, value, expires_at FROM llm_cache ORDER BY expires_at DESC LIMIT ?",
+            (self.maxsize,)
+        ).fetchall()
+        db.commit()
+        # Les plus récentes en fin de liste (= les plus récemment utilisées)
+        for key, value, expires_at in reversed(rows):
+            self._entries[key] = (json.loads(value), expires_at)
+
+    def _connection(self):
+        """Connexion SQLite de ce processus, ouverte au premier usage (appelé sous self._lock)"""
+        if self._db_pid != os.getpid():
+            if self._db is not None:
+                # Héritée par fork : la fermer ici toucherait aux fichiers du parent
+                self._inherited.append(self._db)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            if self.path:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at)
+                )
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            if self.path:
+                self._connection().commit()
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        if self.path:
+            self._connection().execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                db = self._connection()
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "persistent": bool(self.path),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "bypasses": self.bypasses,
+            }
+
+
+def cache_from_env():
+    """Construit le cache paramétré par les variables d'environnement LLM_CACHE_*"""
+    return ResponseCache(
+        maxsize=int(os.environ.get("LLM_CACHE_SIZE", 1024)),
+        ttl=float(os.environ.get("LLM_CACHE_TTL", 24 * 3600)),
+        path=os.environ.get("LLM_CACHE_PATH") or None,
+    )
@@ -0,0 +1,251 @@
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+import ollama
+
+# Au-delà de ce temps de chargement, l'appel a payé le chargement du modèle
+COLD_START_NS = 500_000_000
+
+
+class LLMBusyError(Exception):
+    """Toutes les places de génération sont occupées au-delà du délai d'attente"""
+
+
+class LLMTimeoutError(Exception):
+    """Le modèle n'a pas répondu dans le délai imparti"""
+
+
+class LLMClient:
+    """Client Ollama partagé : limite le nombre de générations simultanées
+    et applique un délai maximal à chaque requête HTTP vers le modèle.
+
+    Le modèle est gardé en mémoire par Ollama `keep_alive` après chaque
+    appel (et chargé dès le démarrage avec warm_up()) ; `options` est
+    envoyé à chaque génération (num_predict pour borner la longueur,
+    temperature...). Les compteurs de jetons et les durées renvoyés par
+    Ollama sont relevés pour chaque appel.
+    """
+
+    def __init__(self, model="llama3", host=None, timeout=60.0,
+                 max_concurrency=2, queue_timeout=10.0, keep_alive=None,
+                 options=None, warm_up_on_start=False, history=100):
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.keep_alive = keep_alive
+        self.options = dict(options or {})
+        self.warm_up_on_start = warm_up_on_start
+        self._client = ollama.Client(host=host, timeout=timeout)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.rejected = 0
+        self.failures = 0
+        # Mesures renvoyées par Ollama (jetons, durées en nanosecondes)
+        self._recent = deque(maxlen=history)
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+        self.prompt_eval_ns = 0
+        self.eval_ns = 0
+        self.cold_starts = 0
+        self.truncated = 0
+        self.warm_up_s = None
+        self.warm_up_error = None
+
+    def _acquire(self):
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+                self.calls += 1
+        if not acquired:
+            raise LLMBusyError(
+                f"Le modèle IA est occupé ({self.max_concurrency} générations en cours)"
+            )
+
+    def _release(self, failed=False):
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.failures += 1
+        self._slots.release()
+
+    def _messages(self, prompt):
+        return [{'role': 'user', 'content': prompt}]
+
+    def _request(self, prompt, format, options=None):
+        request = {'model': self.model, 'messages': self._messages(prompt)}
+        if format is not None:
+            request['format'] = format
+        options = {**self.options, **(options or {})}
+        if options:
+            request['options'] = options
+        if self.keep_alive is not None:
+            request['keep_alive'] = self.keep_alive
+        return request
+
+    def _record(self, response, started):
+        """Relève les compteurs de la réponse finale (dernier morceau en flux)"""
+        def field(name):
+            return response.get(name) or 0
+
+        load_ns = field('load_duration')
+        call = {
+            "prompt_tokens": field('prompt_eval_count'),
+            "eval_tokens": field('eval_count'),
+            "load_ms": round(load_ns / 1e6, 1),
+            "prompt_eval_ms": round(field('prompt_eval_duration') / 1e6, 1),
+            "eval_ms": round(field('eval_duration') / 1e6, 1),
+            "total_ms": round(field('total_duration') / 1e6, 1),
+            "wall_ms": round((time.perf_counter() - started) * 1000, 1),
+            "done_reason": response.get('done_reason'),
+        }
+        with self._lock:
+            self._recent.append(call)
+            self.prompt_tokens += call["prompt_tokens"]
+            self.eval_tokens += call["eval_tokens"]
+            self.prompt_eval_ns += field('prompt_eval_duration')
+            self.eval_ns += field('eval_duration')
+            if load_ns > COLD_START_NS:
+                self.cold_starts += 1
+            if call["done_reason"] == "length":
+                self.truncated += 1
+        return call
+
+    def chat(self, prompt, format=None, options=None):
+        """Génération complète ; retourne le texte produit par le modèle.
+        `format` : "json" ou un schéma JSON (sortie structurée d'Ollama) ;
+        `options` complète ou remplace les options du client pour cet appel"""
+        self._acquire()
+        failed = True
+        started = time.perf_counter()
+        try:
+            response = self._client.chat(**self._request(prompt, format, options))
+            failed = False
+            self._record(response, started)
+            return response['message']['content']
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError(str(e)) from e
+        finally:
+            self._release(failed)
+
+    def stream(self, prompt, format=None):
+        """Génération en flux : produit les morceaux de texte au fil de l'eau.
+
+        La place de génération est conservée jusqu'à la fin du flux (ou
+        jusqu'à la fermeture du générateur si le client se déconnecte).
+        """
+        self._acquire()
+        failed = True
+        started = time.perf_counter()
+        try:
+            for chunk in self._client.chat(stream=True, **self._request(prompt, format)):
+                content = chunk['message']['content']
+                if content:
+                    yield content
+                if chunk.get('done'):
+                    self._record(chunk, started)
+            failed = False
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError(str(e)) from e
+        except GeneratorExit:
+            failed = False
+            raise
+        finally:
+            self._release(failed)
+
+    def warm_up(self):
+        """Charge le modèle dans Ollama sans rien générer (prompt vide) et le
+        garde en mémoire `keep_alive` ; retourne la durée en secondes, ou
+        None si Ollama est injoignable (le premier appel le chargera)"""
+        started = time.perf_counter()
+        try:
+            request = {'model': self.model, 'prompt': ''}
+            if self.keep_alive is not None:
+                request['keep_alive'] = self.keep_alive
+            self._client.generate(**request)
+        except Exception as e:
+            self.warm_up_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Préchargement du modèle {self.model} impossible : {e}")
+            return None
+        self.warm_up_s = round(time.perf_counter() - started, 2)
+        self.warm_up_error = None
+        print(f"✅ Modèle {self.model} chargé dans Ollama en {self.warm_up_s}s")
+        return self.warm_up_s
+
+    def warm_up_in_background(self):
+        """warm_up() dans un thread, si activé (LLM_WARMUP) ; à appeler dans
+        le processus qui sert les requêtes (pas dans un parent avant fork)"""
+        if not self.warm_up_on_start:
+            return None
+        thread = threading.Thread(target=self.warm_up, name="llm-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            recent = list(self._recent)
+            evaluated = self.eval_ns / 1e9
+            return {
+                "model": self.model,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "calls": self.calls,
+                "rejected": self.rejected,
+                "failures": self.failures,
+                "keep_alive": self.keep_alive,
+                "options": self.options,
+                "warm_up_s": self.warm_up_s,
+                "warm_up_error": self.warm_up_error,
+                "cold_starts": self.cold_starts,
+                "truncated": self.truncated,
+                "prompt_tokens": self.prompt_tokens,
+                "eval_tokens": self.eval_tokens,
+                "prompt_eval_s": round(self.prompt_eval_ns / 1e9, 2),
+                "eval_s": round(evaluated, 2),
+                "eval_tokens_per_s": round(self.eval_tokens / evaluated, 1) if evaluated else None,
+                "recent": recent[-10:],
+            }
+
+
+def _keep_alive(value):
+    """LLM_KEEP_ALIVE : durée ("30m", "1h") ou nombre de secondes (-1 : toujours en mémoire)"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value) if "." in value else int(value)
+    except ValueError:
+        return value
+
+
+def client_from_env():
+    """Construit le client paramétré par les variables d'environnement LLM_*"""
+    options = {
+        # La réponse attendue (JSON de réservation) tient en moins de 100 jetons
+        "num_predict": int(os.environ.get("LLM_NUM_PREDICT", 128)),
+        "temperature": float(os.environ.get("LLM_TEMPERATURE", 0)),
+    }
+    if os.environ.get("LLM_NUM_CTX"):
+        options["num_ctx"] = int(os.environ["LLM_NUM_CTX"])
+    return LLMClient(
+        model=os.environ.get("LLM_MODEL", "llama3"),
+        host=os.environ.get("OLLAMA_HOST") or None,
+        timeout=float(os.environ.get("LLM_TIMEOUT", 60)),
+        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 2)),
+        queue_timeout=float(os.environ.get("LLM_QUEUE_TIMEOUT", 10)),
+        keep_alive=_keep_alive(os.environ.get("LLM_KEEP_ALIVE", "30m")),
+        options=options,
+        warm_up_on_start=os.environ.get("LLM_WARMUP", "1") != "0",
+    )
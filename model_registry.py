@@ -0,0 +1,329 @@
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+
+def _rss_bytes():
+    """Mémoire résidente du processus (Linux), ou None si indisponible"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _stat(paths):
+    """(mtime, taille) de chaque fichier ; None pour un fichier absent"""
+    result = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            result.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            result.append(None)
+    return tuple(result)
+
+
+def _fingerprint(paths):
+    """Empreinte sha256 du contenu des fichiers, ou None si l'un d'eux manque"""
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except OSError:
+            return None
+    return digest.hexdigest()
+
+
+def load_joblib(path):
+    """joblib.load entièrement en mémoire. Pas de projection (mmap_mode) : les
+    artefacts ne font que quelques centaines de Ko, et un modèle projeté lirait
+    les octets d'un fichier réécrit sur place avant le rechargement à chaud
+    (voire SIGBUS si le fichier est tronqué)."""
+    return joblib.load(path)
+
+
+class ModelValidationError(Exception):
+    """La nouvelle version d'un modèle a été refusée par sa validation"""
+
+
+class _Entry:
+    def __init__(self, name, loader, paths, depends_on, validate):
+        self.name = name
+        self.loader = loader
+        self.paths = paths
+        self.depends_on = depends_on
+        self.validate = validate
+        self.lock = threading.Lock()
+        self.value = None
+        self.loaded = False
+        self.error = None
+        self.retry_at = 0.0
+        self.load_time_s = None
+        self.rss_delta_bytes = None
+        self.loaded_at = None
+        self.hits = 0
+        # Suivi des fichiers pour le rechargement à chaud
+        self.stat = None
+        self.pending_stat = None
+        self.fingerprint = None
+        self.version = 0
+        self.reloads = 0
+        self.rejected = 0
+        self.reload_error = None
+
+
+class ModelRegistry:
+    """Registre des modèles partagé par tous les services d'un processus.
+
+    Chaque artefact est déclaré par un nom et une fonction de chargement
+    (qui peut elle-même demander d'autres artefacts au registre) ; il n'est
+    chargé qu'à la première utilisation, une seule fois même si plusieurs
+    requêtes arrivent en même temps. Après un échec, le chargement n'est
+    retenté qu'au bout de `retry_interval` secondes. Le temps de chargement
+    et la mémoire résidente gagnée pendant le chargement (y compris les
+    artefacts dont il dépend, chargés au passage) sont conservés pour /health.
+
+    Rechargement à chaud : avec `watch_interval` > 0, un thread surveille
+    les fichiers (`paths`) des artefacts déjà chargés. Quand un fichier a
+    changé (mtime/taille stables sur deux passages, puis empreinte sha256
+    différente), la nouvelle version est chargée en arrière-plan avec les
+    artefacts qui en dépendent (`depends_on`), validée (`validate`), puis
+    mise en service d'un bloc ; en cas d'échec l'ancienne version reste
+    en place. Les requêtes en cours gardent la version qu'elles ont obtenue.
+    """
+
+    def __init__(self, retry_interval=30.0, watch_interval=0.0):
+        self.retry_interval = retry_interval
+        self.watch_interval = watch_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._staged = threading.local()
+        self._watcher = None
+        # Après un fork (workers), le thread de surveillance n'existe plus
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._forget_watcher)
+
+    def _forget_watcher(self):
+        self._watcher = None
+
+    def register(self, name, loader, paths=(), depends_on=(), validate=None):
+        """Déclare un artefact ; sans effet s'il l'est déjà (plusieurs services
+        peuvent déclarer le même modèle).
+
+        `depends_on` : artefacts que `loader` demande au registre, reconstruits
+        avec lui. `validate(candidat, actuel)` lève une exception pour refuser
+        une nouvelle version au rechargement.
+        """
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(name, loader, tuple(paths), tuple(depends_on), validate)
+            return self._entries[name]
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def is_loaded(self, name):
+        entry = self._entries.get(name)
+        return entry is not None and entry.loaded
+
+    def get(self, name):
+        """Artefact chargé ; lève l'erreur de chargement s'il n'a pas pu l'être"""
+        staged = getattr(self._staged, "values", None)
+        if staged is not None and name in staged:
+            # Reconstruction en cours : les dépendances voient la nouvelle version
+            return staged[name]
+        entry = self._entries[name]
+        if not entry.loaded:
+            self._load(entry)
+        if self._watcher is None and self.watch_interval > 0:
+            self._start_watcher()
+        entry.hits += 1
+        return entry.value
+
+    def try_get(self, name):
+        """Comme get(), mais None si l'artefact n'a pas pu être chargé"""
+        try:
+            return self.get(name)
+        except Exception:
+            return None
+
+    def _load(self, entry):
+        with entry.lock:
+            if entry.loaded:
+                return
+            if entry.error is not None and time.monotonic() < entry.retry_at:
+                raise entry.error
+            # Relevé avant lecture : une modification pendant le chargement sera vue ensuite
+            entry.stat = _stat(entry.paths)
+            entry.fingerprint = _fingerprint(entry.paths) if entry.paths else None
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            try:
+                value = entry.loader()
+            except Exception as e:
+                entry.error = e
+                entry.retry_at = time.monotonic() + self.retry_interval
+                print(f"❌ Chargement de '{entry.name}' impossible : {e}")
+                raise
+            entry.load_time_s = time.perf_counter() - start
+            rss_after = _rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                entry.rss_delta_bytes = rss_after - rss_before
+            entry.value = value
+            entry.error = None
+            entry.loaded_at = time.time()
+            entry.version = 1
+            entry.loaded = True
+            print(f"✅ '{entry.name}' chargé en {entry.load_time_s:.2f}s")
+
+    # --- Rechargement à chaud ---
+
+    def _dependents(self, names):
+        """`names` et tous les artefacts chargés qui en dépendent, dans l'ordre de déclaration"""
+        selected = set(names)
+        ordered = []
+        for name, entry in self._entries.items():
+            if name in selected or selected.intersection(entry.depends_on):
+                if entry.loaded:
+                    selected.add(name)
+                    ordered.append(name)
+        return ordered
+
+    def reload(self, names):
+        """Recharge `names` (et leurs dépendants) hors ligne, valide puis remplace
+        d'un bloc. Retourne True si la nouvelle version est en service."""
+        if isinstance(names, str):
+            names = [names]
+        with self._reload_lock:
+            order = self._dependents(names)
+            stats = {}
+            for name in order:
+                paths = self._entries[name].paths
+                stats[name] = (_stat(paths), _fingerprint(paths) if paths else None)
+            staged = {}
+            self._staged.values = staged
+            try:
+                for name in order:
+                    entry = self._entries[name]
+                    start = time.perf_counter()
+                    value = entry.loader()
+                    if entry.validate is not None:
+                        entry.validate(value, entry.value)
+                    staged[name] = value
+                    print(f"🔄 nouvelle version de '{name}' prête en {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                entry.rejected += 1
+                entry.reload_error = f"{type(e).__name__}: {e}"
+                # On ne retente pas tant que les fichiers ne changent pas de nouveau
+                for other, (stat, _) in stats.items():
+                    self._entries[other].stat = stat
+                print(f"⚠️ Rechargement de '{entry.name}' refusé, ancienne version conservée : {e}")
+                return False
+            finally:
+                self._staged.values = None
+
+            with self._swap_lock:
+                now = time.time()
+                for name, value in staged.items():
+                    entry = self._entries[name]
+                    entry.value = value
+                    entry.stat, entry.fingerprint = stats[name]
+                    entry.pending_stat = None
+                    entry.loaded_at = now
+                    entry.version += 1
+                    entry.reloads += 1
+                    entry.reload_error = None
+            return True
+
+    def check_for_updates(self):
+        """Un passage de surveillance ; retourne les artefacts dont les fichiers ont changé"""
+        changed = []
+        for name, entry in list(self._entries.items()):
+            if not entry.loaded or not entry.paths:
+                continue
+            stat = _stat(entry.paths)
+            if stat == entry.stat:
+                entry.pending_stat = None
+                continue
+            if stat != entry.pending_stat or None in stat:
+                # Copie peut-être en cours : on attend que le fichier ne bouge plus
+                entry.pending_stat = stat
+                continue
+            entry.pending_stat = None
+            fingerprint = _fingerprint(entry.paths)
+            if fingerprint == entry.fingerprint:
+                entry.stat = stat   # simple « touch », contenu identique
+            else:
+                changed.append(name)
+        if changed:
+            self.reload(changed)
+        return changed
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch_loop, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                self.check_for_updates()
+            except Exception as e:
+                print(f"⚠️ Surveillance des modèles : {e}")
+
+    def preload(self, names=None, watch=True):
+        """Charge tout de suite les artefacts (tous par défaut) ; retourne ceux en échec.
+        Avec watch=False (parent avant un fork), la surveillance ne démarre pas ici :
+        elle démarrera dans chaque worker à sa première requête."""
+        interval = self.watch_interval
+        if not watch:
+            self.watch_interval = 0
+        try:
+            failed = []
+            for name in names or list(self._entries):
+                if self.try_get(name) is None and self._entries[name].error is not None:
+                    failed.append(name)
+            return failed
+        finally:
+            self.watch_interval = interval
+
+    def stats(self):
+        models = {}
+        for name, entry in sorted(self._entries.items()):
+            models[name] = {
+                "loaded": entry.loaded,
+                "load_time_s": round(entry.load_time_s, 3) if entry.load_time_s is not None else None,
+                "rss_delta_mb": round(entry.rss_delta_bytes / 1e6, 1) if entry.rss_delta_bytes is not None else None,
+                "hits": entry.hits,
+                "error": str(entry.error) if entry.error is not None else None,
+                "paths": list(entry.paths),
+                "version": entry.version,
+                "fingerprint": entry.fingerprint[:12] if entry.fingerprint else None,
+                "reloads": entry.reloads,
+                "rejected_reloads": entry.rejected,
+                "reload_error": entry.reload_error,
+            }
+        rss = _rss_bytes()
+        return {
+            "rss_mb": round(rss / 1e6, 1) if rss is not None else None,
+            "watch_interval_s": self.watch_interval,
+            "models": models,
+        }
+
+
+# Registre unique du processus (passerelle ou service lancé seul)
+registry = ModelRegistry(
+    retry_interval=float(os.environ.get("MODEL_RETRY_SECONDS", 30)),
+    watch_interval=float(os.environ.get("MODEL_WATCH_SECONDS", 5)),
+)
@@ -0,0 +1,120 @@
+import difflib
+import threading
+import time
+
+from booking_parser import fold
+
+
+class NameResolver:
+    """Correspondance nom -> id gardée en mémoire.
+
+    `loader()` retourne une liste de (id, nom) depuis la base, ou None si
+    elle est indisponible. La comparaison ignore accents, casse et espaces
+    superflus ; avec `fuzzy_cutoff`, un nom mal orthographié est rattaché
+    au nom connu le plus proche (difflib) au-delà de ce score. Un nom
+    inconnu provoque au plus un rechargement toutes les `miss_reload`
+    secondes, pour voir apparaître un coach ou un client tout juste créé.
+    """
+
+    def __init__(self, loader, ttl=300, fuzzy_cutoff=None, miss_reload=10):
+        self._loader = loader
+        self.ttl = ttl
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.miss_reload = miss_reload
+        self._lock = threading.Lock()
+        self._ids = {}          # nom replié -> (id, nom tel qu'en base)
+        self._loaded_at = None
+        self._retry_at = 0.0    # après un échec de chargement, on patiente avant de réessayer
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @staticmethod
+    def _key(name):
+        return " ".join(fold(name).split())
+
+    def reload(self):
+        if time.monotonic() < self._retry_at:
+            return False
+        rows = self._loader()
+        if rows is None:
+            self._retry_at = time.monotonic() + self.miss_reload
+            return False
+        ids = {}
+        for row_id, nom in sorted(rows):
+            if nom:
+                ids.setdefault(self._key(nom), (row_id, nom))
+        with self._lock:
+            self._ids = ids
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+        return True
+
+    def invalidate(self):
+        """Force un rechargement à la prochaine résolution"""
+        with self._lock:
+            self._loaded_at = None
+
+    def _age(self):
+        return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    def _lookup(self, key):
+        with self._lock:
+            ids = self._ids
+        if key in ids:
+            return ids[key], False
+        if self.fuzzy_cutoff is not None and ids:
+            close = difflib.get_close_matches(key, list(ids), n=1, cutoff=self.fuzzy_cutoff)
+            if close:
+                return ids[close[0]], True
+        return None, False
+
+    def resolve(self, name):
+        """(id, nom tel qu'en base) pour `name`, ou None s'il est inconnu"""
+        if not isinstance(name, str) or not name.strip():
+            self.misses += 1
+            return None
+
+        age = self._age()
+        if age is None or age >= self.ttl:
+            self.reload()
+
+        key = self._key(name)
+        found, fuzzy = self._lookup(key)
+        if found is None:
+            age = self._age()
+            if age is None or age >= self.miss_reload:
+                self.reload()
+                found, fuzzy = self._lookup(key)
+
+        if found is None:
+            self.misses += 1
+        elif fuzzy:
+            self.fuzzy_hits += 1
+        else:
+            self.hits += 1
+        return found
+
+    def names(self):
+        """Noms connus tels qu'en base ; None si la liste n'a jamais pu être chargée"""
+        age = self._age()
+        if age is None or age >= self.ttl:
+            self.reload()
+        with self._lock:
+            if self._loaded_at is None:
+                return None
+            return [nom for _, nom in self._ids.values()]
+
+    def stats(self):
+        with self._lock:
+            size = len(self._ids)
+        age = self._age()
+        return {
+            "size": size,
+            "age_s": round(age, 1) if age is not None else None,
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+        }
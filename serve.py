@@ -0,0 +1,94 @@
+"""
+Lancement en production de la passerelle (gateway.py) avec gunicorn.
+
+    python serve.py --workers 4 --threads 2 --bind 0.0.0.0:8000
+
+Le processus parent importe la passerelle et charge tous les modèles du
+registre avant de créer les workers : ceux-ci partagent ces pages mémoire
+en copie sur écriture au lieu de recharger chacun les modèles. SIGTERM
+(ou Ctrl+C) arrête proprement : plus de nouvelles connexions, les
+requêtes en cours ont `--graceful-timeout` secondes pour se terminer.
+
+Avec LLM_CACHE_PATH, le cache des réponses du modèle (llm_cache.py) est
+chargé par le parent mais chaque worker ouvre sa propre connexion SQLite
+à sa première écriture : aucune connexion n'est partagée par le fork.
+
+Variables d'environnement équivalentes : SERVE_BIND, SERVE_WORKERS,
+SERVE_THREADS, SERVE_GRACEFUL_TIMEOUT.
+"""
+import argparse
+import gc
+import os
+import time
+
+from gunicorn.app.base import BaseApplication
+
+
+class GatewayServer(BaseApplication):
+    """Application gunicorn : la passerelle, préchargée dans le processus parent"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Appelé une seule fois dans le parent (preload_app) : tout ce qui est
+        # chargé ici est partagé par les workers après le fork
+        start = time.perf_counter()
+        from gateway import app
+        from model_registry import registry
+
+        # Pas de thread dans le parent avant le fork : chaque worker lance sa surveillance
+        failed = registry.preload(watch=False)
+        if failed:
+            print(f"⚠️ Modèles non chargés (nouvel essai à la première requête) : {failed}")
+        # Objets du parent sortis du ramasse-miettes : ses passages dans les
+        # workers ne touchent plus ces pages, qui restent partagées
+        gc.collect()
+        gc.freeze()
+        print(f"✅ Passerelle préchargée en {time.perf_counter() - start:.1f}s "
+              f"({gc.get_freeze_count()} objets gelés)")
+        return app
+
+
+def _post_fork(server, worker):
+    # Les modèles sont déjà là ; le thread de surveillance des fichiers
+    # redémarre tout seul dans chaque worker à la première requête
+    from chatbot import llm
+
+    # Modèle IA chargé dans Ollama (une seule fois côté Ollama, même à plusieurs workers)
+    llm.warm_up_in_background()
+    server.log.info(f"worker {worker.pid} prêt")
+
+
+def options_from_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bind", default=os.environ.get("SERVE_BIND", "127.0.0.1:8000"))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("SERVE_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SERVE_THREADS", 2)),
+                        help="threads par worker (le chatbot attend le LLM et la base)")
+    parser.add_argument("--graceful-timeout", type=int,
+                        default=int(os.environ.get("SERVE_GRACEFUL_TIMEOUT", 30)))
+    args = parser.parse_args(argv)
+    return {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "preload_app": True,
+        "graceful_timeout": args.graceful_timeout,
+        # Une génération LLM peut être longue : on ne tue pas le worker trop tôt
+        "timeout": max(120, args.graceful_timeout),
+        "keepalive": 5,
+        "post_fork": _post_fork,
+        "accesslog": os.environ.get("SERVE_ACCESS_LOG"),
+    }
+
+
+if __name__ == "__main__":
+    GatewayServer(options_from_args()).run()
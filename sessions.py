@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from booking_parser import merge_booking
+
+# Champs de réservation gardés d'un message à l'autre
+CHAMPS_SESSION = ("coach", "jour", "heure_debut", "heure_fin", "titre", "description")
+
+
+def session_key(client_name):
+    """Clé de session : nom du client sans casse ni espaces superflus"""
+    return " ".join(client_name.split()).lower()
+
+
+class BookingSessions:
+    """Réservations en cours, par client : champs déjà donnés dans les
+    messages précédents (« réserver avec Karim mardi » puis « de 9h à 10h »).
+
+    Nombre de sessions borné (les moins récemment modifiées sont évincées)
+    et expiration après `ttl` secondes sans nouveau message. Seuls les
+    champs de CHAMPS_SESSION sont gardés, chacun tronqué à `max_value_len`
+    caractères : la mémoire d'une session est bornée quel que soit le
+    message. L'ordre de l'OrderedDict est celui des modifications, donc
+    aussi celui des expirations : les sessions expirées sont en tête.
+    """
+
+    def __init__(self, maxsize=10000, ttl=900, max_value_len=100):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_value_len = max_value_len
+        self._sessions = OrderedDict()  # clé -> (champs, expiration)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.completed = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def _purge(self, now):
+        while self._sessions:
+            key, (_, expires_at) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[key]
+            self.expirations += 1
+
+    def get(self, client_name):
+        """Champs connus pour ce client (dict vide si aucune session en cours)"""
+        key = session_key(client_name)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._sessions[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return {}
+            self.hits += 1
+            return dict(entry[0])
+
+    def update(self, client_name, data):
+        """Ajoute les champs renseignés de `data` à la session (les nouveaux priment,
+        début et fin ensemble : voir booking_parser.merge_booking)"""
+        fields = {k: str(data[k])[:self.max_value_len] for k in CHAMPS_SESSION if data.get(k)}
+        if not fields:
+            return
+        key = session_key(client_name)
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            entry = self._sessions.pop(key, None)
+            merged = merge_booking(entry[0] if entry is not None else {}, fields)
+            merged = {k: v for k, v in merged.items() if v}
+            self._sessions[key] = (merged, now + self.ttl)
+            self.updates += 1
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def forget(self, client_name, *champs):
+        """Retire des champs refusés (coach inconnu...) sans toucher au reste"""
+        key = session_key(client_name)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                for champ in champs:
+                    entry[0].pop(champ, None)
+
+    def clear(self, client_name, completed=False):
+        """Fin de la session (réservation enregistrée si `completed`)"""
+        with self._lock:
+            if self._sessions.pop(session_key(client_name), None) is not None and completed:
+                self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            self._purge(time.monotonic())
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._sessions),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "updates": self.updates,
+                "completed": self.completed,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+
+def sessions_from_env():
+    """Construit le magasin de sessions paramétré par les variables BOOKING_SESSION_*"""
+    return BookingSessions(
+        maxsize=int(os.environ.get("BOOKING_SESSION_SIZE", 10000)),
+        ttl=float(os.environ.get("BOOKING_SESSION_TTL", 900)),
+    )
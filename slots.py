@@ -0,0 +1,110 @@
+import heapq
+import re
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from booking_parser import JOURS, fold
+
+# Horaires d'ouverture de la salle, remplaçables par OPENING_HOURS (même syntaxe)
+HORAIRES_DEFAUT = "lundi-vendredi 07:00-22:00, samedi 08:00-20:00, dimanche 09:00-13:00"
+
+_PLAGE_JOURS = re.compile(r"^([a-z]+)(?:-([a-z]+))?\s+(.+)$")
+_PLAGE_HEURES = re.compile(r"^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$")
+
+
+def parse_opening_hours(spec):
+    """« lundi-vendredi 07:00-12:00 14:00-22:00, samedi 08:00-20:00 » ->
+    {jour de la semaine (0 = lundi): [(ouverture, fermeture), ...] triées}.
+    Un jour absent est un jour de fermeture. Lève ValueError si la syntaxe est invalide."""
+    hours = {}
+    for part in filter(None, (p.strip() for p in fold(spec).split(","))):
+        match = _PLAGE_JOURS.match(part)
+        if not match or match.group(1) not in JOURS or (match.group(2) or match.group(1)) not in JOURS:
+            raise ValueError(f"horaires invalides : {part!r}")
+        first, last = JOURS.index(match.group(1)), JOURS.index(match.group(2) or match.group(1))
+        windows = []
+        for plage in match.group(3).split():
+            heures = _PLAGE_HEURES.match(plage)
+            if not heures:
+                raise ValueError(f"plage horaire invalide : {plage!r}")
+            h1, m1, h2, m2 = map(int, heures.groups())
+            opening, closing = time(h1, m1), time(h2, m2)
+            if closing <= opening:
+                raise ValueError(f"plage horaire vide : {plage!r}")
+            windows.append((opening, closing))
+        for weekday in range(first, last + 1):
+            hours[weekday] = sorted(hours.get(weekday, []) + windows)
+    return hours
+
+
+def opening_windows(start, end, hours):
+    """Plages d'ouverture [début, fin) entre `start` et `end`, dans l'ordre"""
+    day = start.date()
+    while day <= end.date():
+        for opening, closing in hours.get(day.weekday(), ()):
+            window_start = max(datetime.combine(day, opening), start)
+            window_end = min(datetime.combine(day, closing), end)
+            if window_start < window_end:
+                yield window_start, window_end
+        day += timedelta(days=1)
+
+
+def free_intervals(busy, windows):
+    """Balayage : parties des plages `windows` non couvertes par les créneaux
+    `busy` (itérable trié par début, éventuellement chevauchants), dans
+    l'ordre. `busy` n'est parcouru qu'une fois, et seulement jusqu'où
+    le consommateur s'arrête."""
+    busy = iter(busy)
+    current = next(busy, None)
+    for window_start, window_end in windows:
+        cursor = window_start
+        while current is not None and current[0] < window_end:
+            busy_start, busy_end = current
+            if busy_start > cursor:
+                yield cursor, busy_start
+            cursor = max(cursor, busy_end)
+            if cursor >= window_end:
+                # Ce créneau peut encore couvrir le début de la plage suivante
+                break
+            current = next(busy, None)
+        if cursor < window_end:
+            yield cursor, window_end
+
+
+def _align(moment, step):
+    """Premier multiple de `step` (depuis minuit) à partir de `moment`"""
+    midnight = datetime.combine(moment.date(), time())
+    steps = -(-(moment - midnight) // step)
+    return midnight + steps * step
+
+
+def bookable_slots(free, duration, step):
+    """Séances de `duration` commençant sur un multiple de `step` dans les intervalles libres"""
+    for free_start, free_end in free:
+        slot_start = _align(free_start, step)
+        while slot_start + duration <= free_end:
+            yield slot_start, slot_start + duration
+            slot_start += step
+
+
+def next_slots(busy_by_coach, start, end, duration, hours, step=None, limit=10):
+    """Les `limit` prochaines séances réservables, tous coachs confondus.
+
+    `busy_by_coach` : {coach_id: itérable de (début, fin) triés par début}.
+    Chaque coach est balayé paresseusement et les flux sont fusionnés par
+    heure de début (puis coach_id) : le travail est proportionnel à
+    `limit` et aux créneaux occupés parcourus, pas à toute la période.
+    Retourne une liste de (début, fin, coach_id).
+    """
+    step = step or duration
+    streams = [_coach_slots(coach_id, busy, start, end, duration, hours, step)
+               for coach_id, busy in sorted(busy_by_coach.items())]
+    return [(slot_start, slot_end, coach_id)
+            for slot_start, coach_id, slot_end in islice(heapq.merge(*streams), limit)]
+
+
+def _coach_slots(coach_id, busy, start, end, duration, hours, step):
+    """Séances libres d'un coach, triées par début, au format de fusion (début, coach_id, fin)"""
+    free = free_intervals(busy, opening_windows(start, end, hours))
+    for slot_start, slot_end in bookable_slots(free, duration, step):
+        yield slot_start, coach_id, slot_end
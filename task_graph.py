@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class TaskGraph:
+    """Petit graphe d'étapes dépendantes pour une requête.
+
+    Chaque étape est lancée sur `executor` dès que ses dépendances sont
+    terminées (sans bloquer de thread en attendant), ou dans le thread
+    appelant si `executor` est None. Une étape dont une dépendance a
+    échoué échoue avec la même exception (celle de la première
+    dépendance en échec, dans l'ordre déclaré). Les étapes faites hors
+    du graphe (appel au modèle en flux...) y entrent avec provide().
+    """
+
+    def __init__(self, executor=None):
+        self.executor = executor
+        self._futures = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def _elapsed_ms(self, since=None):
+        return round((time.perf_counter() - (since or self._started)) * 1000, 2)
+
+    def __contains__(self, name):
+        return name in self._futures
+
+    def _record(self, name, start):
+        with self._lock:
+            self._timings[name] = {
+                "start_ms": round((start - self._started) * 1000, 2),
+                "ms": self._elapsed_ms(start),
+                "thread": threading.current_thread().name,
+            }
+
+    def add(self, name, fn, deps=(), args=(), after=()):
+        """Déclare l'étape `name` : fn(*args, *résultats des dépendances `deps`).
+        `after` : étapes attendues (et dont l'échec se propage) sans passer leur résultat"""
+        future = Future()
+        self._futures[name] = future
+        value_futures = [self._futures[d] for d in deps]
+        dep_futures = value_futures + [self._futures[d] for d in after]
+        remaining = [len(dep_futures)]
+
+        def run():
+            start = time.perf_counter()
+            error = result = None
+            try:
+                result = fn(*args, *[f.result() for f in value_futures])
+            except Exception as e:
+                error = e
+            # Relevé avant de débloquer la suite : timings() est complet dès le résultat connu
+            self._record(name, start)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        def launch():
+            failed = next((f for f in dep_futures if f.exception() is not None), None)
+            if failed is not None:
+                future.set_exception(failed.exception())
+            elif self.executor is None:
+                run()
+            else:
+                self.executor.submit(run)
+
+        def on_dep_done(_):
+            with self._lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                launch()
+
+        if not dep_futures:
+            launch()
+        for f in dep_futures:
+            f.add_done_callback(on_dep_done)
+        return future
+
+    def provide(self, name, value=None, error=None, started=None):
+        """Étape exécutée par l'appelant : son résultat (ou son erreur) débloque la suite"""
+        future = self._futures.setdefault(name, Future())
+        self._record(name, started or self._started)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+        return future
+
+    def result(self, name, timeout=None):
+        """Résultat de l'étape (attend si besoin) ; relève son exception"""
+        return self._futures[name].result(timeout)
+
+    def timings(self):
+        """Début et durée de chaque étape terminée, en ms depuis la création du graphe"""
+        with self._lock:
+            stages = dict(sorted(self._timings.items(), key=lambda item: item[1]["start_ms"]))
+        return {"total_ms": self._elapsed_ms(), "stages": stages}